@@ -0,0 +1,566 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# Benchmarks for the wikidict pipeline.
+#
+# Usage:
+#   python benchmarks.py read_dump [dump_file]
+#   python benchmarks.py codec [count]
+#   python benchmarks.py treemap [count]
+#   python benchmarks.py word_memory [count]
+#   python benchmarks.py shared [labels]
+#   python benchmarks.py iter_json [count]
+#   python benchmarks.py sqlite [count]
+#   python benchmarks.py labels [count]
+#   python benchmarks.py fuzzy [count]
+#   python benchmarks.py contains [count]
+#   python benchmarks.py server [count] [clients]
+#   python benchmarks.py lookup_many [count]
+#   python benchmarks.py bloom [count] [error_rate]
+#   python benchmarks.py shared_store [count] [processes]
+#
+# Without 'dump_file' synthetic dump created in the TEST_FOLDER.
+
+
+import os
+import sys
+import time
+import json
+import pickle
+import random
+import asyncio
+import tracemalloc
+import multiprocessing
+
+import wikidict
+import treemaps
+import dictionary
+import server
+
+
+def timeit(fn, *args, **kwargs):
+    """
+    Call 'fn' and return (seconds, result).
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - start, result)
+
+
+async def timeit_async(awaitable):
+    """
+    Await 'awaitable' and return (seconds, result).
+    """
+    start = time.perf_counter()
+    result = await awaitable
+    return (time.perf_counter() - start, result)
+
+
+def get_bench_dump(pages=20000):
+    """
+    Create synthetic dump with 'pages' pages in the TEST_FOLDER. Return file name.
+    """
+    dump_file = os.path.join(wikidict.TEST_FOLDER, "bench-dump-%d.xml.bz2" % pages)
+
+    if not os.path.exists(dump_file):
+        text = wikidict.text * 20
+        wikidict.create_test_dump(dump_file, [ ("word%d" % i, text) for i in range(pages) ])
+
+    return dump_file
+
+
+def bench_read_dump(dump_file=None, parse=False):
+    """
+    Compare read_dump() throughput with and without background decompression.
+
+    In:
+        dump_file - .bz2 dump. None for synthetic dump.
+        parse     - True for run wikoo parser on each page, like a parse_dump() do.
+    """
+    dump_file = dump_file or get_bench_dump()
+
+    def run(threaded):
+        stat = { "pages": 0, "bytes": 0 }
+
+        def callback(label, text):
+            stat["pages"] += 1
+            stat["bytes"] += len(text)
+
+            if parse:
+                wikidict.get_words(label, text)
+
+        (secs, _) = timeit(wikidict.read_dump, dump_file, callback, threaded=threaded)
+        return (secs, stat)
+
+    for threaded in (False, True):
+        (secs, stat) = run(threaded)
+        print("read_dump threaded=%-5s: %8.3f s, %10.1f pages/s, %8.2f MB/s text" % (
+            threaded, secs, stat["pages"] / secs, stat["bytes"] / secs / 1024 / 1024))
+
+
+def make_words(count=1000000):
+    """
+    Create 'count' synthetic words, like a parsed from dump.
+    """
+    words = []
+
+    for i in range(count):
+        word = wikidict.Word()
+        word.LabelName = "word%d" % (i // 4)
+        word.LanguageCode = "en"
+        word.Type = wikidict.WORD_TYPES.NOUN if i % 2 else wikidict.WORD_TYPES.VERB
+        word.TypeLabelName = "Noun" if i % 2 else "Verb"
+        word.ExplainationExample = [ {"cln": "explaination %d" % i, "raw": "# [[explaination]] %d" % i} ]
+        word.AlternativeFormsOther = [ "alt%d" % i ]
+        word.Translation_FR = [ "fr%d" % i ]
+        word.Translation_DE = [ "de%d" % i ]
+        words.append(word)
+
+    return words
+
+
+def bench_codec(count=1000000):
+    """
+    Compare WordsEncoder / object_hook (dict per Word) with WordCodec (packed tuple per Word).
+    """
+    count = int(count)
+    words = make_words(count)
+    codec = wikidict.word_codec
+
+    def report(name, secs):
+        print("%-28s: %8.3f s, %10.1f words/s" % (name, secs, count / secs))
+
+    # json, dict per Word
+    (secs, text) = timeit(json.dumps, words, cls=wikidict.WordsEncoder, ensure_ascii=False, separators=(",", ":"))
+    report("json dict encode", secs)
+    (secs, _) = timeit(json.loads, text, object_hook=wikidict.decode_word)
+    report("json dict decode", secs)
+
+    # json, packed
+    (secs, text) = timeit(lambda: json.dumps(codec.encode_words(words), ensure_ascii=False, separators=(",", ":")))
+    report("json packed encode", secs)
+    (secs, _) = timeit(lambda: codec.decode_words(json.loads(text)))
+    report("json packed decode", secs)
+
+    # pickle, packed
+    (secs, data) = timeit(pickle.dumps, words, pickle.HIGHEST_PROTOCOL)
+    report("pickle packed dump (%d MB)" % (len(data) // 2**20), secs)
+    (secs, _) = timeit(pickle.loads, data)
+    report("pickle packed load", secs)
+
+
+def bench_treemap(count=1000000):
+    """
+    Compare treemap backends: build by one insert per label, iteration in the sorted order.
+    """
+    count = int(count)
+    labels = [ "word%d" % i for i in range(count) ]
+    random.seed(1)
+    random.shuffle(labels)
+
+    for backend in treemaps.BACKENDS:
+        def build():
+            treemap = treemaps.make_treemap(backend)
+
+            for label in labels:
+                treemap[label] = None
+
+            return treemap
+
+        def iterate():
+            for (label, words) in treemap.items():
+                pass
+
+        (build_secs, treemap) = timeit(build)
+        (first_secs, _) = timeit(iterate)
+        (next_secs, _) = timeit(iterate)
+
+        print("treemap %-6s: build %8.3f s, first iteration %8.3f s, next iteration %8.3f s" % (
+            backend, build_secs, first_secs, next_secs))
+
+
+def bench_word_memory(count=1000000):
+    """
+    Memory of 'count' words, loaded from the packed JSON, like a consumer process do.
+    """
+    count = int(count)
+    codec = wikidict.word_codec
+    text = json.dumps(codec.encode_words(make_words(count)), separators=(",", ":"))
+
+    tracemalloc.start()
+    words = codec.decode_words(json.loads(text))
+    (current, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print("words: %d, memory: %.1f MB, per million words: %.1f MB" % (
+        len(words), current / 2**20, current / 2**20 / count * 1000000))
+
+
+def bench_shared(labels=100000):
+    """
+    Compare packed and shared JSON layouts: file size and load time.
+    Labels with 4 words. Alternatives and translations common for all words of the label, like a get_words() do.
+    """
+    labels = int(labels)
+    treemap = treemaps.make_treemap()
+    
+    for i in range(labels):
+        label = "word%d" % i
+        alternatives = [ "alt%d-%d" % (i, j) for j in range(3) ]
+        translations = { lang: [ "%s%d-%d" % (lang, i, j) for j in range(5) ] for lang in ("en", "fr", "de", "es", "ru", "pt") }
+        words = []
+        
+        for t in (wikidict.WORD_TYPES.NOUN, wikidict.WORD_TYPES.VERB, wikidict.WORD_TYPES.ADJECTIVE, wikidict.WORD_TYPES.ADVERB):
+            word = wikidict.Word()
+            word.LabelName = label
+            word.LanguageCode = "en"
+            word.Type = t
+            word.ExplainationExample = [ {"cln": "explaination %s %d" % (t, i), "raw": "# [[explaination]] %d" % i} ]
+            word.AlternativeFormsOther = alternatives
+            word.Translation_EN = translations["en"]
+            word.Translation_FR = translations["fr"]
+            word.Translation_DE = translations["de"]
+            word.Translation_ES = translations["es"]
+            word.Translation_RU = translations["ru"]
+            word.Translation_PT = translations["pt"]
+            words.append(word)
+            
+        treemap[label] = words
+        
+    for shared in (False, True):
+        filename = os.path.join(wikidict.TEST_FOLDER, "bench-shared.json")
+        (save_secs, _) = timeit(wikidict.save_to_json, treemap, filename, packed=True, shared=shared)
+        (load_secs, _) = timeit(wikidict.load_from_json, filename)
+        
+        print("shared=%-5s: %8.1f MB, save %8.3f s, load %8.3f s" % (
+            shared, os.path.getsize(filename) / 2**20, save_secs, load_secs))
+
+
+def bench_iter_json(count=200000):
+    """
+    Load one label from the JSON export: load_from_json() vs iter_json(). Time and peak memory.
+    """
+    count = int(count)
+    treemap = treemaps.make_treemap()
+    
+    for word in make_words(count):
+        treemap.setdefault(word.LabelName, []).append(word)
+        
+    label = "word%d" % (count // 8)
+    
+    def run(name, fn):
+        tracemalloc.start()
+        (secs, _) = timeit(fn)
+        (current, peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("%-32s: %8.3f s, peak %8.1f MB" % (name, secs, peak / 2**20))
+        
+    for packed in (False, True):
+        filename = os.path.join(wikidict.TEST_FOLDER, "bench-iter.json")
+        wikidict.save_to_json(treemap, filename, packed=packed)
+        print("packed=%s: %.1f MB" % (packed, os.path.getsize(filename) / 2**20))
+        
+        run("load_from_json", lambda: wikidict.load_from_json(filename)[label])
+        run("iter_json(labels=[label])", lambda: list(wikidict.iter_json(filename, labels=[label])))
+        run("iter_json() all", lambda: sum(1 for _ in wikidict.iter_json(filename)))
+
+
+def bench_sqlite(count=200000):
+    """
+    save_to_sqlite() throughput and SQLiteLoader.get() latency.
+    """
+    count = int(count)
+    treemap = treemaps.make_treemap()
+    
+    for word in make_words(count):
+        treemap.setdefault(word.LabelName, []).append(word)
+        
+    filename = os.path.join(wikidict.TEST_FOLDER, "bench.sqlite")
+    (secs, _) = timeit(wikidict.save_to_sqlite, treemap, filename)
+    print("save_to_sqlite: %8.3f s, %10.1f words/s, %.1f MB" % (secs, count / secs, os.path.getsize(filename) / 2**20))
+    
+    labels = random.Random(1).sample(list(treemap.keys()), 10000)
+    
+    with wikidict.SQLiteLoader(filename) as db:
+        (secs, _) = timeit(lambda: [ db.get(label) for label in labels ])
+        
+    print("SQLiteLoader.get: %8.1f us per label" % (secs / len(labels) * 1e6))
+
+
+def get_bench_store(count=1000000):
+    """
+    Create store with 'count' synthetic labels in the TEST_FOLDER, one Word per label. Return file name.
+    """
+    filename = os.path.join(wikidict.TEST_FOLDER, "bench-%d.store" % count)
+    
+    if not os.path.exists(filename):
+        rnd = random.Random(1)
+        syllables = [ "ca", "t", "do", "g", "ho", "rse", "ze", "bra", "an", "ing", "ed", "s", "ol", "ogy", "é" ]
+        labels = set()
+        
+        while len(labels) < count:
+            labels.add( "".join( rnd.choice(syllables) for i in range(rnd.randint(1, 7)) ) )
+            
+        dictionary.save_to_store(dictionary.create_test_words(sorted(labels)), filename)
+        
+    return filename
+
+
+def bench_labels(count=1000000):
+    """
+    Label index: size, prefix and range query time.
+    """
+    count = int(count)
+    filename = get_bench_store(count)
+    
+    with dictionary.Dictionary(filename) as d:
+        raw = sum( len(label.encode("UTF-8")) for label in d.keys() )
+        print("labels: %d, utf-8: %.1f MB, store keys + offsets: %.1f MB, trie: %.1f MB" % (
+            len(d), raw / 2**20, (raw + 8 * len(d)) / 2**20, os.path.getsize(filename + ".trie") / 2**20))
+        
+        prefixes = [ label[:3] for label in random.Random(2).sample(list(d.keys()), 1000) ]
+        (secs, results) = timeit(lambda: [ d.prefix(p, 10) for p in prefixes ])
+        print("prefix(p, 10): %8.1f us per query" % (secs / len(prefixes) * 1e6))
+        
+        (secs, _) = timeit(lambda: [ d.range(p, None, limit=100) for p in prefixes ])
+        print("range page 100: %8.1f us per query" % (secs / len(prefixes) * 1e6))
+        
+        (secs, _) = timeit(lambda: [ [ label for label in d.keys() if label.startswith(p) ][:10] for p in prefixes[:5] ])
+        print("full scan: %8.1f us per query" % (secs / 5 * 1e6))
+
+
+def bench_fuzzy(count=1000000):
+    """
+    Dictionary.fuzzy() with the symmetric deletion index vs brute force scan with edit_distance().
+    """
+    count = int(count)
+    filename = get_bench_store(count)
+    
+    if os.path.exists(filename + dictionary.FuzzyIndex.SUFFIX):
+        os.remove(filename + dictionary.FuzzyIndex.SUFFIX)
+    
+    with dictionary.Dictionary(filename) as d:
+        (secs, _) = timeit(d.get_index, dictionary.FuzzyIndex)
+        print("build: %8.3f s, index: %.1f MB" % (secs, os.path.getsize(filename + dictionary.FuzzyIndex.SUFFIX) / 2**20))
+        
+        # misspelled: one char replaced
+        rnd = random.Random(3)
+        queries = []
+        
+        for label in rnd.sample(list(d.keys()), 100):
+            i = rnd.randrange(len(label))
+            queries.append(label[:i] + rnd.choice("aeiou") + label[i+1:])
+            
+        for max_distance in (1, 2):
+            (secs, results) = timeit(lambda: [ d.fuzzy(q, max_distance) for q in queries ])
+            print("fuzzy(q, %d): %8.2f ms per query, %.1f candidates" % (
+                max_distance, secs / len(queries) * 1000, sum(map(len, results)) / len(queries)))
+            
+        labels = list(d.keys())
+        edit_distance = dictionary.edit_distance
+        (secs, _) = timeit(lambda: [ [ label for label in labels if edit_distance(q, label, 2) <= 2 ] for q in queries[:3] ])
+        print("brute force, distance 2: %8.2f ms per query" % (secs / 3 * 1000))
+
+
+def bench_contains(count=1000000):
+    """
+    Dictionary.contains() with the trigram index vs scan of all labels.
+    """
+    count = int(count)
+    filename = get_bench_store(count)
+    
+    if os.path.exists(filename + dictionary.NGramIndex.SUFFIX):
+        os.remove(filename + dictionary.NGramIndex.SUFFIX)
+    
+    with dictionary.Dictionary(filename) as d:
+        (secs, _) = timeit(d.get_index, dictionary.NGramIndex)
+        print("build: %8.3f s, index: %.1f MB" % (secs, os.path.getsize(filename + dictionary.NGramIndex.SUFFIX) / 2**20))
+        
+        rnd = random.Random(4)
+        fragments = []
+        
+        for label in rnd.sample(list(d.keys()), 100):
+            i = rnd.randrange(len(label))
+            fragments.append(label[i : i + rnd.randint(3, 8)])
+            
+        for limit in (10, None):
+            (secs, results) = timeit(lambda: [ d.contains(f, limit) for f in fragments ])
+            print("contains(f, %s): %8.2f ms per query, %.1f labels" % (limit, secs / len(fragments) * 1000, sum(map(len, results)) / len(fragments)))
+            
+        labels = list(d.keys())
+        (secs, _) = timeit(lambda: [ [ label for label in labels if f in label ] for f in fragments[:10] ])
+        print("scan: %8.2f ms per query" % (secs / 10 * 1000))
+
+
+def bench_server(count=1000000, clients=8):
+    """
+    LookupServer: 'clients' connections, get requests with zipf-like repeated labels, then batches.
+    """
+    count = int(count)
+    clients = int(clients)
+    filename = get_bench_store(count)
+    
+    with dictionary.Dictionary(filename) as d:
+        labels = random.Random(5).sample(list(d.keys()), 20000)
+        
+    rnd = random.Random(6)
+    queries = [ labels[int(len(labels) * rnd.random() ** 3)] for i in range(20000) ]
+    
+    async def run():
+        lookup_server = server.LookupServer(filename, cache_size=10000)
+        port = await lookup_server.start(port=0)
+        
+        async def client(part):
+            async with server.LookupClient(port=port) as c:
+                for label in part:
+                    await c.request("get", label=label)
+                    
+        (secs, _) = await timeit_async(asyncio.gather(*[ client(queries[i::clients]) for i in range(clients) ]))
+        stats = lookup_server.get_stats()
+        print("get: %d clients, %8.0f requests/s, p50: %.3f ms, p99: %.3f ms, hit rate: %.2f" % (
+            clients, len(queries) / secs, stats["p50_ms"], stats["p99_ms"], stats["hit_rate"]))
+        
+        async with server.LookupClient(port=port) as c:
+            start = time.perf_counter()
+            await asyncio.gather(*[ c.request("batch", labels=queries[i : i + 1000]) for i in range(0, len(queries), 1000) ])
+            secs = time.perf_counter() - start
+            
+        print("batch 1000: %8.0f labels/s" % (len(queries) / secs))
+        await lookup_server.close()
+        
+    asyncio.run(run())
+
+
+def bench_lookup_many(count=1000000):
+    """
+    Dictionary.lookup_many() vs get() per label, at batch sizes 1 to 10k.
+    Batches like a text tokens: repeated labels, 20% of missed.
+    """
+    count = int(count)
+    filename = get_bench_store(count)
+    
+    with dictionary.Dictionary(filename) as d:
+        rnd = random.Random(7)
+        labels = rnd.sample(list(d.keys()), 20000)
+        labels += [ label + "#" for label in labels[:5000] ]
+        
+        for size in (1, 10, 100, 1000, 10000):
+            # zipf-like: label k repeated ~1/k times
+            batches = [ [ labels[int(len(labels) ** rnd.random()) - 1] for i in range(size) ] for j in range(max(1, 20000 // size)) ]
+            total = size * len(batches)
+            unique = sum( len(set(batch)) for batch in batches )
+            secs_get = secs_many = float("inf")
+            
+            for repeat in range(3):
+                d.missing.clear()
+                secs_get = min(secs_get, timeit(lambda: [ [ d.get(label) for label in batch ] for batch in batches ])[0])
+                d.missing.clear()
+                secs_many = min(secs_many, timeit(lambda: [ d.lookup_many(batch) for batch in batches ])[0])
+                
+            print("batch %5d (%3.0f%% unique): get %6.2f us per label, lookup_many %6.2f us per label, x%.1f" % (
+                size, unique / total * 100, secs_get / total * 1e6, secs_many / total * 1e6, secs_get / secs_many))
+            
+            
+def bench_bloom(count=1000000, error_rate=0.01):
+    """
+    Bloom filter of labels: build time, size, get() of missed labels with and without filter.
+    """
+    count = int(count)
+    error_rate = float(error_rate)
+    filename = get_bench_store(count)
+    
+    with dictionary.Dictionary(filename, bloom=False) as d:
+        (secs, bloom) = timeit(wikidict.BloomFilter.build, d.keys(), len(d), error_rate)
+        print("build: %8.3f s, filter: %.1f MB, hashes: %d" % (secs, len(bloom.bits) / 2**20, bloom.hashes))
+        bloom.save(filename + ".bloom")
+        
+        labels = random.Random(8).sample(list(d.keys()), 10000)
+        missed = [ label + "#" for label in labels ]
+        (secs, _) = timeit(lambda: [ d.get(label) for label in missed ])
+        print("without filter: missed %6.2f us per label" % (secs / len(missed) * 1e6))
+        (secs, _) = timeit(lambda: [ d.get(label) for label in labels ])
+        print("without filter: found  %6.2f us per label" % (secs / len(labels) * 1e6))
+        
+    with dictionary.Dictionary(filename) as d:
+        (secs, _) = timeit(lambda: [ d.get(label) for label in missed ])
+        print("with filter:    missed %6.2f us per label" % (secs / len(missed) * 1e6))
+        
+        (secs, _) = timeit(lambda: [ d.get(label) for label in labels ])
+        print("with filter:    found  %6.2f us per label" % (secs / len(labels) * 1e6))
+        print(d.bloom.get_stats())
+        
+        
+def get_process_memory():
+    """
+    Get memory of the current process, MB: {"Rss", "Pss", "Private"}. Linux only.
+    """
+    memory = {}
+    
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            
+            if parts[0] in ("Rss:", "Pss:", "Private_Clean:", "Private_Dirty:"):
+                memory[parts[0][:-1]] = int(parts[1]) / 1024
+                
+    memory["Private"] = memory.pop("Private_Clean") + memory.pop("Private_Dirty")
+    
+    return memory
+    
+    
+def shared_store_worker(mode, filename, labels, barrier, results):
+    """
+    Process of the bench_shared_store(). Open dictionary, look up 'labels', report memory, when all processes opened.
+    """
+    if mode == "store":
+        d = dictionary.Dictionary(filename)
+    else:
+        d = wikidict.load_from_pickle(filename)
+        
+    for label in labels:
+        d.get(label)
+        
+    barrier.wait()
+    results.put(get_process_memory())
+    barrier.wait()
+    
+    
+def bench_shared_store(count=200000, processes=4):
+    """
+    Memory of 'processes' workers: each with own treemap from load_from_pickle() vs the shared mmap store.
+    """
+    count = int(count)
+    processes = int(processes)
+    filename = get_bench_store(count)
+    pickle_file = os.path.join(wikidict.TEST_FOLDER, "bench-%d.pickled" % count)
+    
+    with dictionary.Dictionary(filename) as d:
+        if not os.path.exists(pickle_file):
+            wikidict.save_to_pickle(treemaps.make_treemap(None, d.items()), pickle_file)
+            
+        labels = random.Random(9).sample(list(d.keys()), 10000)
+        
+    ctx = multiprocessing.get_context("spawn")
+    
+    for (mode, source) in (("pickle", pickle_file), ("store", filename)):
+        barrier = ctx.Barrier(processes)
+        results = ctx.Queue()
+        workers = [ ctx.Process(target=shared_store_worker, args=(mode, source, labels, barrier, results)) for i in range(processes) ]
+        
+        for worker in workers:
+            worker.start()
+            
+        memory = [ results.get() for worker in workers ]
+        
+        for worker in workers:
+            worker.join()
+            
+        print("%-6s: %d processes, per process: rss %7.1f MB, pss %7.1f MB, private %7.1f MB" % (
+            mode, processes, *( sum( m[key] for m in memory ) / processes for key in ("Rss", "Pss", "Private") )))
+        
+        
+if __name__ == "__main__":
+    name = sys.argv[1] if len(sys.argv) > 1 else "read_dump"
+    args = sys.argv[2:]
+
+    globals()["bench_" + name](*args)
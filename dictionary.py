@@ -0,0 +1,2036 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# Memory-mapped dictionary store.
+#
+# Store is the binary file with sorted label index and per-label records.
+# File opened through the mmap, so opening take constant time, and the OS page cache
+# shared across processes. Words of the label decoded only when the label requested.
+#
+# Usage:
+#   import wikidict, dictionary
+#   wd = wikidict.Wikidict()
+#   wd.parse_dump(dump_file)
+#   dictionary.save_to_store(wd.treemap, "test/data.store")
+#
+#   d = dictionary.Dictionary("test/data.store")
+#   words = d["cat"]
+#   labels = d.prefix("ca", 10)
+#   (labels, cursor) = d.range("cat", "dog")
+#   results = d.lookup_many(["the", "cat", "sat", "the"])
+#   stats = d.bloom.get_stats()
+#
+# Indexes built in the same pass with the parse_dump(), and saved next to the store:
+#   wd.add_index(dictionary.ReverseTranslationIndex())
+#   wd.parse_dump(dump_file)
+#   dictionary.save_to_store(wd.items(), "test/data.store", wd.indexes, error_rate=wd.bloom_error_rate)
+#
+#   words = d.reverse_translate("fr", "chat")
+#   lemmas = d.lemmatize("took")
+#   candidates = d.fuzzy("catt", 2)
+#   labels = d.contains("olog", 10)
+#   results = d.search("domestic animal", 10)
+#
+# Shared by many processes: versions published behind the pointer file, and replaced atomically:
+#   dictionary.publish_store(wd.treemap, "test/data.store")
+#   d = dictionary.Dictionary("test/data.store")
+#   d.reload()      # switch to the new version, if published
+
+
+import os
+import re
+import sys
+import math
+import heapq
+import mmap
+import json
+import pickle
+import struct
+import array
+import operator
+import itertools
+import unittest
+
+import wikidict
+
+
+# File:
+#   header
+#   values          - records, one per key
+#   keys            - utf-8 keys, sorted
+#   key offsets     - uint64 x (count + 1), offsets in the keys blob
+#   value offsets   - uint64 x (count + 1), file offsets of the values
+#   meta            - JSON
+HEADER = struct.Struct("<8sIIQQQQQQ") # magic, version, reserved, count, keys, key offsets, value offsets, meta, meta size
+VERSION = 1
+STORE_MAGIC = b"WKDSTORE"
+CURRENT_MAGIC = b"WKDCURNT"     # pointer file: magic + file name of the current version of the store
+STORE_VERSIONS_KEEP = 2         # count of published versions, kept for readers, not yet reloaded
+
+# Label index: front coded sorted labels, persisted next to the store in the <store>.trie
+#   header
+#   blocks          - LABEL_BLOCK_SIZE labels per block. First label of block saved full, next - as
+#                     (length of common prefix with previous label, suffix). Lengths as varint
+#   block offsets   - uint64 x (blocks + 1)
+LABEL_HEADER = struct.Struct("<8sIIQQQ") # magic, version, block size, count, blocks, block offsets
+LABEL_MAGIC = b"WKDTRIE\0"
+LABEL_BLOCK_SIZE = 16
+RANGE_PAGE_SIZE = 100           # default page size of Dictionary.range()
+MISSING_CACHE_SIZE = 100000     # count of missed labels, remembered by the Dictionary
+REVERSE_MAGIC = b"WKDREVTR"
+LEMMA_MAGIC = b"WKDLEMMA"
+FUZZY_MAGIC = b"WKDFUZZY"
+FUZZY_MAX_DISTANCE = 2          # max edit distance, supported by the fuzzy index
+FUZZY_PREFIX_LENGTH = 6         # length of label prefix and suffix, indexed with deletes
+NGRAM_MAGIC = b"WKDNGRAM"
+NGRAM_SIZE = 3                  # n-gram index: trigrams
+NGRAM_BISECT_LIMIT = 64         # n-gram index: count of candidates, checked in the other postings by binary search
+POSTING = struct.Struct("I")    # item of the postings: uint32 label position
+FULLTEXT_MAGIC = b"WKDFTEXT"
+FULLTEXT_BUFFER_POSTINGS = 250000           # full-text index: postings buffered, before moved to the spill sorter
+FULLTEXT_MEMORY_BUDGET = 64 * 1024 * 1024   # full-text index: memory for postings, before spilled to temporary files
+FULLTEXT_NO_WORD = 0xFFFFFFFF               # full-text index: word position of the label, added without words
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOKEN_RE = re.compile(r"\w+")
+
+
+def get_tmp_file(filename):
+    """
+    Get temporary file for the atomic write of the 'filename'. Unique per process,
+    so processes, which build the same index, not write into the same file.
+    """
+    return "%s.%d.tmp" % (filename, os.getpid())
+
+
+class SortedTableWriter:
+    """
+    Writer of the sorted table: binary file with sorted keys and one value per key.
+    Keys must be added in the sorted order. File written in the temporary file, and
+    replaced atomically on close().
+
+    Usage:
+        with SortedTableWriter("file", b"MAGIC") as table:
+            table.add("a", b"value a")
+            table.add("b", b"value b")
+    """
+    def __init__(self, filename, magic, meta=None):
+        wikidict.create_storage(os.path.dirname(os.path.abspath(filename)))
+
+        self.filename = filename
+        self.tmp_file = get_tmp_file(filename)
+        self.magic = magic
+        self.meta = meta or {}
+        self.keys = bytearray()
+        self.key_offsets = array.array("Q", [0])
+        self.value_offsets = array.array("Q")
+        self.last_key = None
+        self.f = open(self.tmp_file, "wb")
+        self.f.write(b"\0" * HEADER.size)
+
+    def add(self, key, value):
+        """
+        Add 'key' (str) with 'value' (bytes). Keys must be added in the sorted order.
+        """
+        bkey = key.encode("UTF-8")
+
+        if self.last_key is not None and bkey <= self.last_key:
+            raise ValueError("Keys not sorted: %r after %r" % (key, self.last_key.decode("UTF-8")))
+
+        self.last_key = bkey
+
+        self.value_offsets.append(self.f.tell())
+        self.f.write(value)
+
+        self.keys += bkey
+        self.key_offsets.append(len(self.keys))
+
+    def align(self):
+        """
+        Align file position to 8 bytes. For uint64 arrays.
+        """
+        pad = -self.f.tell() % 8
+        self.f.write(b"\0" * pad)
+        return self.f.tell()
+
+    def close(self):
+        """
+        Write index and header. Replace the file.
+        """
+        if self.f is None:
+            return
+
+        count = len(self.value_offsets)
+        self.value_offsets.append(self.f.tell())
+
+        keys_pos = self.f.tell()
+        self.f.write(self.keys)
+
+        key_offsets_pos = self.align()
+        self.f.write(self.key_offsets.tobytes())
+
+        value_offsets_pos = self.align()
+        self.f.write(self.value_offsets.tobytes())
+
+        meta = json.dumps(self.meta).encode("UTF-8")
+        meta_pos = self.f.tell()
+        self.f.write(meta)
+
+        self.f.seek(0)
+        self.f.write(HEADER.pack(self.magic, VERSION, 0, count, keys_pos, key_offsets_pos, value_offsets_pos, meta_pos, len(meta)))
+        self.f.close()
+        self.f = None
+
+        os.replace(self.tmp_file, self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.close()
+        else:
+            # failed. remove temporary file
+            self.f.close()
+            self.f = None
+            os.remove(self.tmp_file)
+
+
+class SortedTable:
+    """
+    Reader of the sorted table. File opened through the mmap. Keys searched by binary search.
+    Nothing loaded into memory on open.
+    """
+    def __init__(self, filename, magic):
+        self.filename = filename
+
+        with open(filename, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (file_magic, version, _, self.count, self.keys_pos, key_offsets_pos, value_offsets_pos, meta_pos, meta_size) = HEADER.unpack_from(self.mm, 0)
+
+        if file_magic != magic or version != VERSION:
+            self.mm.close()
+            raise ValueError("%s: unsupported file format" % filename)
+
+        mv = memoryview(self.mm)
+        self.key_offsets = mv[key_offsets_pos : key_offsets_pos + 8 * (self.count + 1)].cast("Q")
+        self.value_offsets = mv[value_offsets_pos : value_offsets_pos + 8 * (self.count + 1)].cast("Q")
+        self.meta = json.loads(self.mm[meta_pos : meta_pos + meta_size].decode("UTF-8"))
+
+    def key_bytes(self, i):
+        """
+        Get key 'i' as utf-8 bytes.
+        """
+        return self.mm[self.keys_pos + self.key_offsets[i] : self.keys_pos + self.key_offsets[i+1]]
+
+    def key(self, i):
+        """
+        Get key 'i'.
+        """
+        return self.key_bytes(i).decode("UTF-8")
+
+    def value(self, i):
+        """
+        Get value bytes of key 'i'.
+        """
+        return self.mm[self.value_offsets[i] : self.value_offsets[i+1]]
+
+    def bisect(self, key, lo=0, hi=None):
+        """
+        Find position of the first key >= 'key' in the range lo..hi.
+        """
+        bkey = key.encode("UTF-8")
+        mm = self.mm
+        keys_pos = self.keys_pos
+        key_offsets = self.key_offsets
+
+        if hi is None:
+            hi = self.count
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+
+            if mm[keys_pos + key_offsets[mid] : keys_pos + key_offsets[mid+1]] < bkey:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def find(self, key, lo=0):
+        """
+        Find position of the 'key'.
+
+        Out:
+            position | -1
+        """
+        i = self.bisect(key, lo)
+
+        if i < self.count and self.key_bytes(i) == key.encode("UTF-8"):
+            return i
+
+        return -1
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        if self.mm is not None:
+            self.key_offsets.release()
+            self.value_offsets.release()
+            self.mm.close()
+            self.mm = None
+
+
+def encode_varint(n):
+    """
+    Encode unsigned int 'n' as varint: 7 bits per byte, high bit - continue.
+    """
+    result = bytearray()
+    
+    while n >= 0x80:
+        result.append((n & 0x7F) | 0x80)
+        n >>= 7
+        
+    result.append(n)
+    return bytes(result)
+
+def decode_varint(data, pos):
+    """
+    Decode varint from 'data' at 'pos'.
+    
+    Out:
+        (n, next pos)
+    """
+    n = 0
+    shift = 0
+    
+    while True:
+        b = data[pos]
+        pos += 1
+        n |= (b & 0x7F) << shift
+        
+        if b < 0x80:
+            return (n, pos)
+            
+        shift += 7
+
+def save_label_index(labels, filename, block_size=LABEL_BLOCK_SIZE):
+    """
+    Save sorted 'labels' in the label index file 'filename'. See: LabelIndex.
+    
+    In:
+        labels     - iterable of labels, sorted
+        filename   - output file name, like a: "test/data.store.trie"
+        block_size - count of labels per block
+    Out:
+        count      - count of saved labels
+    """
+    tmp_file = get_tmp_file(filename)
+    offsets = array.array("Q")
+    count = 0
+    prev = None
+    
+    with open(tmp_file, "wb") as f:
+        f.write(b"\0" * LABEL_HEADER.size)
+        
+        for label in labels:
+            key = label.encode("UTF-8")
+            
+            if prev is not None and key <= prev:
+                f.close()
+                os.remove(tmp_file)
+                raise ValueError("Labels not sorted: %r after %r" % (label, prev.decode("UTF-8")))
+                
+            if count % block_size == 0:
+                # new block
+                offsets.append(f.tell())
+                shared = 0
+            else:
+                shared = 0
+                limit = min(len(prev), len(key))
+                
+                while shared < limit and prev[shared] == key[shared]:
+                    shared += 1
+                    
+            f.write(encode_varint(shared) + encode_varint(len(key) - shared) + key[shared:])
+            prev = key
+            count += 1
+            
+        offsets.append(f.tell())
+        
+        pad = -f.tell() % 8
+        f.write(b"\0" * pad)
+        offsets_pos = f.tell()
+        f.write(offsets.tobytes())
+        
+        f.seek(0)
+        f.write(LABEL_HEADER.pack(LABEL_MAGIC, VERSION, block_size, count, len(offsets) - 1, offsets_pos))
+        
+    os.replace(tmp_file, filename)
+    
+    return count
+
+class LabelIndex:
+    """
+    Sorted labels, front coded in blocks (see save_label_index()). Compact trie of the labels: 
+    common prefixes saved once per neighbors, so index few times smaller than the labels.
+    File opened through the mmap. Block found by binary search over the first labels of the blocks, 
+    then block decoded. Queries take O(log(blocks) + block size + result size).
+    
+    Usage:
+        index = LabelIndex("test/data.store.trie")
+        labels = index.prefix("ca", 10)
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        
+        with open(filename, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            
+        (magic, version, self.block_size, self.count, self.blocks, offsets_pos) = LABEL_HEADER.unpack_from(self.mm, 0)
+        
+        if magic != LABEL_MAGIC or version != VERSION:
+            self.mm.close()
+            raise ValueError("%s: unsupported file format" % filename)
+            
+        self.offsets = memoryview(self.mm)[offsets_pos : offsets_pos + 8 * (self.blocks + 1)].cast("Q")
+        
+    def first_key(self, block):
+        """
+        Get first label of the 'block' as utf-8 bytes.
+        """
+        pos = self.offsets[block]
+        (shared, pos) = decode_varint(self.mm, pos)
+        (size, pos) = decode_varint(self.mm, pos)
+        return self.mm[pos : pos + size]
+        
+    def read_block(self, block):
+        """
+        Decode labels of the 'block'.
+        
+        Out:
+            [ utf-8 bytes, ... ]
+        """
+        data = self.mm[self.offsets[block] : self.offsets[block+1]]
+        keys = []
+        key = b""
+        pos = 0
+        
+        while pos < len(data):
+            (shared, pos) = decode_varint(data, pos)
+            (size, pos) = decode_varint(data, pos)
+            key = key[:shared] + data[pos : pos + size]
+            pos += size
+            keys.append(key)
+            
+        return keys
+        
+    def bisect(self, label):
+        """
+        Find position of the first label >= 'label'.
+        """
+        key = label.encode("UTF-8")
+        
+        # last block with first label <= key
+        (lo, hi) = (0, self.blocks)
+        
+        while lo < hi:
+            mid = (lo + hi) // 2
+            
+            if self.first_key(mid) <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+                
+        block = max(lo - 1, 0)
+        
+        if block >= self.blocks:
+            return self.count
+            
+        for (i, k) in enumerate(self.read_block(block)):
+            if k >= key:
+                return block * self.block_size + i
+                
+        return (block + 1) * self.block_size if block + 1 < self.blocks else self.count
+        
+    def iter_from(self, position):
+        """
+        Generator. Yield labels from 'position' in the sorted order.
+        """
+        (block, skip) = divmod(position, self.block_size)
+        
+        while block < self.blocks:
+            for key in self.read_block(block)[skip:]:
+                yield key.decode("UTF-8")
+                
+            block += 1
+            skip = 0
+            
+    def prefix(self, p, limit=None):
+        """
+        Get sorted labels, starting with 'p'. Not more than 'limit'.
+        """
+        result = []
+        
+        if limit == 0:
+            return result
+        
+        for label in self.iter_from(self.bisect(p)):
+            if not label.startswith(p):
+                break
+                
+            result.append(label)
+            
+            if len(result) == limit:
+                break
+                
+        return result
+        
+    def range(self, lo=None, hi=None, cursor=None, limit=RANGE_PAGE_SIZE):
+        """
+        Get page of sorted labels in the range lo <= label < hi.
+        
+        In:
+            lo     - first label | None for from start
+            hi     - end label, not included | None for till end
+            cursor - cursor from the previous page | None for the first page
+            limit  - page size
+        Out:
+            (labels, cursor) - cursor of the next page | None if no more labels
+        """
+        if cursor is None:
+            cursor = self.bisect(lo) if lo is not None else 0
+            
+        labels = []
+        
+        for label in self.iter_from(cursor):
+            if hi is not None and label >= hi:
+                return (labels, None)
+                
+            if len(labels) == limit:
+                return (labels, cursor + len(labels))
+                
+            labels.append(label)
+            
+        return (labels, None)
+        
+    def __len__(self):
+        return self.count
+        
+    def close(self):
+        if self.mm is not None:
+            self.offsets.release()
+            self.mm.close()
+            self.mm = None
+
+
+class WordIndex:
+    """
+    Base class of the index builders. Index is the sorted table: key -> [value, value, ...], 
+    saved next to the store in the <store><SUFFIX>. Lookup take O(log n). See: Dictionary.lookup().
+    
+    Subclass define SUFFIX, MAGIC and extract(label, words).
+    
+    Usage:
+        index = ReverseTranslationIndex()
+        index.add("cat", words)
+        index.save("test/data.store")
+    """
+    SUFFIX = None
+    MAGIC = None
+    
+    def __init__(self):
+        self.entries = []
+        
+    def extract(self, label, words):
+        """
+        Generator. Yield (key, value) of the 'words'.
+        """
+        raise NotImplementedError
+        
+    def add(self, label, words):
+        """
+        Add 'words' of the 'label'.
+        """
+        self.entries.extend(self.extract(label, words))
+        
+    def save(self, store_file):
+        """
+        Save index next to the 'store_file'.
+        
+        Out:
+            count - count of keys
+        """
+        self.entries.sort()
+        
+        with SortedTableWriter(store_file + self.SUFFIX, self.MAGIC) as table:
+            for (key, group) in itertools.groupby(self.entries, key=operator.itemgetter(0)):
+                values = list(dict.fromkeys( value for (k, value) in group ))
+                table.add(key, pickle.dumps(values, protocol=pickle.HIGHEST_PROTOCOL))
+                
+            return len(table.value_offsets)
+
+    @classmethod
+    def build(cls, d):
+        """
+        Build index from all words of the Dictionary 'd'. Save next to the store.
+        """
+        index = cls()
+
+        for (label, words) in d.items():
+            index.add(label, words)
+
+        index.save(d.filename)
+
+class ReverseTranslationIndex(WordIndex):
+    """
+    Reverse translation index: "<lang>:<term>" -> [ (label, word position), ... ]
+    For find English words by foreign term. See: Dictionary.reverse_translate().
+    """
+    SUFFIX = ".rev"
+    MAGIC = REVERSE_MAGIC
+    
+    def extract(self, label, words):
+        for (i, word) in enumerate(words):
+            for (lang, field) in wikidict.WORD_TRANSLATION_FIELDS:
+                terms = getattr(word, field)
+                
+                if terms:
+                    for term in terms:
+                        if term:
+                            yield (lang + ":" + term, (label, i))
+
+class LemmaIndex(WordIndex):
+    """
+    Inflected form index: form -> [ (lemma, form type), ... ]. Many to many: "saw" -> "see", "saw".
+    For map tokens to dictionary entries. See: Dictionary.lemmatize().
+
+    Form types:
+        plural, singular, male, female               - from PluralVariant, SingleVariant, MaleVariant, FemaleVariant
+        present, participle, past, past participle   - from Conjugation. See: wikidict.get_conjugation_types()
+    """
+    SUFFIX = ".lemma"
+    MAGIC = LEMMA_MAGIC
+    FORM_FIELDS = (
+        ("PluralVariant", "plural"), ("SingleVariant", "singular"),
+        ("MaleVariant", "male"), ("FemaleVariant", "female"),
+    )
+
+    def extract(self, label, words):
+        for word in words:
+            for (field, form_type) in self.FORM_FIELDS:
+                forms = getattr(word, field)
+
+                if not forms:
+                    continue
+
+                if isinstance(forms, str):
+                    forms = [forms]
+
+                for form in forms:
+                    if form and form != label:
+                        yield (form, (label, form_type))
+
+            for form in word.Conjugation or ():
+                for form_type in wikidict.get_conjugation_types(label, form):
+                    yield (form, (label, form_type))
+
+def get_deletes(s, distance):
+    """
+    Get all strings, produced from 's' by deleting up to 'distance' chars. 's' included.
+    """
+    result = {s}
+    level = {s}
+
+    for i in range(distance):
+        level = { w[:j] + w[j+1:] for w in level for j in range(len(w)) }
+        result |= level
+
+    return result
+
+def edit_distance(a, b, max_distance):
+    """
+    Edit distance between 'a' and 'b': insert, delete, replace, transposition of adjacent chars (optimal string alignment).
+    Computed only in the band of 'max_distance' around the diagonal.
+
+    Out:
+        distance | max_distance + 1, if distance > max_distance
+    """
+    (la, lb) = (len(a), len(b))
+
+    if abs(la - lb) > max_distance:
+        return max_distance + 1
+
+    over = max_distance + 1
+    prev2 = None
+    prev = [ j if j <= max_distance else over for j in range(lb + 1) ]
+
+    for i in range(1, la + 1):
+        cur = [over] * (lb + 1)
+        cur[0] = i if i <= max_distance else over
+        ca = a[i-1]
+        lo = max(1, i - max_distance)
+        hi = min(lb, i + max_distance)
+        best = cur[0]
+
+        for j in range(lo, hi + 1):
+            cb = b[j-1]
+            d = prev[j-1] + (ca != cb)
+
+            if prev[j] + 1 < d:
+                d = prev[j] + 1
+
+            if cur[j-1] + 1 < d:
+                d = cur[j-1] + 1
+
+            if i > 1 and j > 1 and ca == b[j-2] and a[i-2] == cb and prev2[j-2] + 1 < d:
+                d = prev2[j-2] + 1
+
+            cur[j] = d if d < over else over
+
+            if d < best:
+                best = d
+
+        if best > max_distance:
+            return over
+
+        (prev2, prev) = (prev, cur)
+
+    return prev[lb] if prev[lb] <= max_distance else over
+
+def get_fuzzy_keys(label, distance, prefix_length):
+    """
+    Get keys of the fuzzy index for the 'label':
+        "<" + deletes of the prefix
+        ">" + deletes of the reversed suffix
+    """
+    prefix = label[:prefix_length]
+    suffix = label[:-prefix_length-1:-1]
+
+    return (
+        [ "<" + key for key in get_deletes(prefix, distance) ],
+        [ ">" + key for key in get_deletes(suffix, distance) ],
+    )
+
+class FuzzyIndex:
+    """
+    Fuzzy label index. Symmetric deletion: label prefix (FUZZY_PREFIX_LENGTH chars) with up to
+    FUZZY_MAX_DISTANCE deleted chars -> positions of labels in the store, as uint32 array.
+    Same for the reversed suffix of the label.
+
+    If edit distance of the query and label <= distance, then they have the common delete of the prefixes,
+    and the common delete of the reversed suffixes. So on query, candidates are labels found by prefix deletes
+    and by suffix deletes. Candidates verified with edit_distance().
+    Built once from the labels of the store. See: Dictionary.fuzzy().
+    """
+    SUFFIX = ".fuzzy"
+    MAGIC = FUZZY_MAGIC
+
+    @classmethod
+    def build(cls, d, max_distance=FUZZY_MAX_DISTANCE, prefix_length=FUZZY_PREFIX_LENGTH):
+        """
+        Build index from the labels of the Dictionary 'd'. Save next to the store.
+        """
+        postings = {}
+
+        for (position, label) in enumerate(d.keys()):
+            for keys in get_fuzzy_keys(label, max_distance, prefix_length):
+                for key in keys:
+                    lst = postings.get(key)
+
+                    if lst is None:
+                        postings[key] = array.array("I", [position])
+                    else:
+                        lst.append(position)
+
+        meta = { "max_distance": max_distance, "prefix_length": prefix_length }
+
+        with SortedTableWriter(d.filename + cls.SUFFIX, cls.MAGIC, meta) as table:
+            for key in sorted(postings):
+                table.add(key, postings[key].tobytes())
+
+def get_ngrams(label, n=NGRAM_SIZE):
+    """
+    Get set of n-grams of the 'label'.
+    """
+    return { label[i : i + n] for i in range(len(label) - n + 1) }
+
+def posting_contains(mm, start, count, position):
+    """
+    Binary search of the 'position' in the sorted uint32 array, 'count' items at 'start' of the 'mm'.
+    """
+    (lo, hi) = (0, count)
+
+    while lo < hi:
+        mid = (lo + hi) // 2
+
+        if POSTING.unpack_from(mm, start + 4 * mid)[0] < position:
+            lo = mid + 1
+        else:
+            hi = mid
+
+    return lo < count and POSTING.unpack_from(mm, start + 4 * lo)[0] == position
+
+class NGramIndex:
+    """
+    Trigram index of the labels: trigram -> sorted positions of the labels, as uint32 array.
+    For substring search: labels with all trigrams of the fragment are candidates, verified by 'fragment in label'.
+
+    Built incrementally: labels added while parse (see Wikidict.add_index()), and can be searched before saving.
+    Saved next to the store, as sorted table with uint32 postings, read through the mmap. See: Dictionary.contains().
+
+    Usage:
+        index = NGramIndex()
+        index.add("cat", words)
+        labels = index.contains("at")
+        index.save("test/data.store")
+    """
+    SUFFIX = ".ngram"
+    MAGIC = NGRAM_MAGIC
+
+    def __init__(self):
+        self.labels = []                # label id -> label
+        self.ids = {}                   # label -> label id
+        self.postings = {}              # trigram -> array of label ids
+
+    def add(self, label, words=None):
+        """
+        Add 'label'.
+        """
+        if label in self.ids:
+            return
+
+        label_id = len(self.labels)
+        self.labels.append(label)
+        self.ids[label] = label_id
+
+        for ngram in get_ngrams(label):
+            lst = self.postings.get(ngram)
+
+            if lst is None:
+                self.postings[ngram] = array.array("I", [label_id])
+            else:
+                lst.append(label_id)
+
+    def contains(self, fragment, limit=None):
+        """
+        Find added labels, containing 'fragment'.
+
+        Out:
+            [label, label, ...] - sorted
+        """
+        ngrams = get_ngrams(fragment)
+
+        if not ngrams:
+            result = ( label for label in self.labels if fragment in label )
+        else:
+            lists = sorted( self.postings.get(ngram, ()) for ngram in ngrams )
+            candidates = set(lists[0])
+
+            for lst in lists[1:]:
+                candidates = candidates.intersection(lst)
+
+            result = ( self.labels[i] for i in candidates if fragment in self.labels[i] )
+
+        return sorted(result)[:limit]
+
+    def save(self, store_file):
+        """
+        Save index next to the 'store_file'. Label ids replaced with positions of the labels in the store.
+
+        Out:
+            count - count of trigrams
+        """
+        # label id -> store position. Merge of sorted labels and sorted store keys
+        positions = array.array("i", [-1]) * len(self.labels)
+        ids = iter(sorted(range(len(self.labels)), key=self.labels.__getitem__))
+        label_id = next(ids, None)
+
+        with Dictionary(store_file, labels=False, bloom=False) as d:
+            for (position, label) in enumerate(d.keys()):
+                while label_id is not None and self.labels[label_id] < label:
+                    label_id = next(ids, None)
+
+                if label_id is not None and self.labels[label_id] == label:
+                    positions[label_id] = position
+                    label_id = next(ids, None)
+
+        with SortedTableWriter(store_file + self.SUFFIX, self.MAGIC, {"n": NGRAM_SIZE}) as table:
+            for ngram in sorted(self.postings):
+                lst = array.array("I", sorted( positions[i] for i in self.postings[ngram] if positions[i] != -1 ))
+
+                if lst:
+                    table.add(ngram, lst.tobytes())
+
+            return len(table.value_offsets)
+
+    @classmethod
+    def build(cls, d):
+        """
+        Build index from the labels of the Dictionary 'd'. Save next to the store.
+        """
+        index = cls()
+
+        for label in d.keys():
+            index.add(label)
+
+        index.save(d.filename)
+
+def tokenize(text):
+    """
+    Split 'text' to the lowercase terms.
+    """
+    return TOKEN_RE.findall(text.lower())
+
+class FullTextIndex:
+    """
+    Full-text index of the cleaned explanations (ExplainationExample "cln"). One document per Word.
+    Terms -> postings: uint32 document ids + uint32 term frequencies. Ranked by BM25. See: Dictionary.search().
+
+    Built as pipeline stage, from the stream of (label, words): in the parse_dump() (see Wikidict.add_index()),
+    or after, from the store. Postings moved to the spill sorter (see wikidict.SpillSorter) by portions,
+    so whole index not kept in memory.
+    If the label added many times, only the last words kept. Documents of the labels, not found in the store, dropped.
+
+    File: sorted table, saved next to the store:
+        ""     - documents: uint32 store positions of labels, uint32 word positions, uint32 lengths in terms
+        <term> - postings
+    """
+    SUFFIX = ".fts"
+    MAGIC = FULLTEXT_MAGIC
+
+    def __init__(self, memory_budget=FULLTEXT_MEMORY_BUDGET, folder=None, buffer_postings=FULLTEXT_BUFFER_POSTINGS):
+        """
+        In:
+            memory_budget   - bytes for postings in the spill sorter
+            folder          - folder for temporary files. None for system temp folder
+            buffer_postings - count of postings, collected before moved to the spill sorter
+        """
+        self.sorter = wikidict.SpillSorter(memory_budget, folder)
+        self.buffer_postings = buffer_postings
+        self.postings = {}              # term -> (document ids, frequencies)
+        self.buffered = 0
+        self.portion = 0
+        self.doc_labels = []            # document id -> label
+        self.doc_words = array.array("I")
+        self.doc_lengths = array.array("I")
+
+    def add(self, label, words):
+        """
+        Add 'words' of the 'label'. Replace words of the 'label', added before.
+        """
+        if not words:
+            # mark for drop of the words, added before
+            self.doc_labels.append(label)
+            self.doc_words.append(FULLTEXT_NO_WORD)
+            self.doc_lengths.append(0)
+
+        for (i, word) in enumerate(words):
+            text = " ".join( e["cln"] for e in word.ExplainationExample or () if isinstance(e, dict) and e.get("cln") )
+            terms = tokenize(text)
+
+            doc = len(self.doc_labels)
+            self.doc_labels.append(label)
+            self.doc_words.append(i)
+            self.doc_lengths.append(len(terms))
+
+            counts = {}
+
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+
+            for (term, tf) in counts.items():
+                posting = self.postings.get(term)
+
+                if posting is None:
+                    self.postings[term] = ( array.array("I", [doc]), array.array("I", [tf]) )
+                else:
+                    posting[0].append(doc)
+                    posting[1].append(tf)
+
+            self.buffered += len(counts)
+
+        if self.buffered >= self.buffer_postings:
+            self.flush()
+
+    def flush(self):
+        """
+        Move buffered postings to the spill sorter. Key "<term>\\0<portion>" keep postings in order of document ids.
+        """
+        suffix = "\0%08d" % self.portion
+
+        for (term, (docs, tfs)) in self.postings.items():
+            self.sorter.add( term + suffix, (docs.tobytes(), tfs.tobytes()) )
+
+        self.postings = {}
+        self.buffered = 0
+        self.portion += 1
+
+    def save(self, store_file):
+        """
+        Save index next to the 'store_file'. Documents of the labels, not found in the store, and replaced documents
+        dropped. Kept documents renumbered.
+
+        Out:
+            count - count of terms
+        """
+        self.flush()
+
+        # document id -> store position of the label. Merge of documents, sorted by label, and sorted store keys
+        count = len(self.doc_labels)
+        doc_labels = self.doc_labels
+        doc_words = self.doc_words
+        doc_positions = array.array("I", [0xFFFFFFFF]) * count
+        docs = iter(sorted(range(count), key=doc_labels.__getitem__))
+        doc = next(docs, None)
+
+        with Dictionary(store_file, labels=False, bloom=False) as d:
+            for (position, key) in enumerate(d.keys()):
+                while doc is not None and doc_labels[doc] < key:
+                    doc = next(docs, None)
+
+                # documents of the last add() of the label. Sorted by id, first word of the add() - 0
+                last = []
+
+                while doc is not None and doc_labels[doc] == key:
+                    if doc_words[doc] == 0 or doc_words[doc] == FULLTEXT_NO_WORD:
+                        last = []
+
+                    if doc_words[doc] != FULLTEXT_NO_WORD:
+                        last.append(doc)
+
+                    doc = next(docs, None)
+
+                for doc_id in last:
+                    doc_positions[doc_id] = position
+
+        # document id -> id of the kept document | -1
+        kept = [ doc for doc in range(count) if doc_positions[doc] != 0xFFFFFFFF ]
+        ids = None
+
+        if len(kept) != count:
+            ids = array.array("i", [-1]) * count
+
+            for (new_id, doc) in enumerate(kept):
+                ids[doc] = new_id
+
+        positions = array.array("I", ( doc_positions[doc] for doc in kept ))
+        words = array.array("I", ( doc_words[doc] for doc in kept ))
+        lengths = array.array("I", ( self.doc_lengths[doc] for doc in kept ))
+        meta = { "docs": len(kept), "avgdl": sum(lengths) / len(kept) if kept else 0.0 }
+
+        with SortedTableWriter(store_file + self.SUFFIX, self.MAGIC, meta) as table:
+            table.add("", positions.tobytes() + words.tobytes() + lengths.tobytes())
+
+            for (term, group) in itertools.groupby(self.sorter.merge(), key=lambda item: item[0].partition("\0")[0]):
+                docs = bytearray()
+                tfs = bytearray()
+
+                for (key, (portion_docs, portion_tfs)) in group:
+                    if ids is None:
+                        docs += portion_docs
+                        tfs += portion_tfs
+                        continue
+
+                    portion_docs = array.array("I", portion_docs)
+                    portion_tfs = array.array("I", portion_tfs)
+                    kept_docs = [ i for (i, doc) in enumerate(portion_docs) if ids[doc] != -1 ]
+                    docs += array.array("I", ( ids[portion_docs[i]] for i in kept_docs )).tobytes()
+                    tfs += array.array("I", ( portion_tfs[i] for i in kept_docs )).tobytes()
+
+                if docs:
+                    table.add(term, bytes(docs + tfs))
+
+            return len(table.value_offsets) - 1
+
+    @classmethod
+    def build(cls, d):
+        """
+        Build index from all words of the Dictionary 'd', label by label. Save next to the store.
+        """
+        index = cls()
+
+        for (label, words) in d.items():
+            index.add(label, words)
+
+        index.save(d.filename)
+
+
+def save_to_store(treemap, filename, indexes=(), bloom=None, error_rate=wikidict.BLOOM_ERROR_RATE):
+    """
+    Save 'treemap' in the file 'filename'. In binary store format, for Dictionary.
+    Label index saved next to the store, in the 'filename'.trie, bloom filter of labels - in the 'filename'.bloom
+    Indexes, built with the parse_dump() (see Wikidict.add_index()), saved next to the store too.
+
+    In:
+        treemap    - sorteddict with words | iterable of (label, words), sorted by label
+        filename   - output file name
+        indexes    - index builders, like a: [ReverseTranslationIndex()]
+        bloom      - bloom filter of labels, like a: Wikidict.bloom. None for build with the 'error_rate'.
+                     ValueError, if count of the labels in the filter not equal to the count of saved labels
+        error_rate - false positive rate of the bloom filter, like a: Wikidict.bloom_error_rate. None for BLOOM_ERROR_RATE.
+                     Saved in the store meta, for rebuild of the filter by the Dictionary
+    Out:
+        count      - count of saved labels
+    """
+    error_rate = error_rate or wikidict.BLOOM_ERROR_RATE
+    items = treemap.items() if hasattr(treemap, "items") else treemap
+    encode_words = wikidict.word_codec.encode_words
+
+    meta = { "fields": wikidict.word_codec.fields, "bloom_error_rate": error_rate }
+
+    with SortedTableWriter(filename, STORE_MAGIC, meta) as table:
+        for (label, words) in items:
+            table.add(label, pickle.dumps(encode_words(words), protocol=pickle.HIGHEST_PROTOCOL))
+
+        count = len(table.value_offsets)
+
+    with Dictionary(filename, labels=False, bloom=False) as d:
+        save_label_index(d.keys(), filename + ".trie")
+
+        if bloom is None:
+            bloom = wikidict.BloomFilter.build(d.keys(), len(d), error_rate)
+
+        elif bloom.count != len(d):
+            raise ValueError("Bloom filter of %d labels, store of %d labels: %s" % (bloom.count, len(d), filename))
+
+    bloom.save(filename + ".bloom")
+
+    for index in indexes:
+        index.save(filename)
+
+    return count
+
+
+def resolve_store(filename):
+    """
+    Get store file of the 'filename'. For the pointer file (see: publish_store()) - store file of the current version.
+    """
+    with open(filename, "rb") as f:
+        head = f.read(len(CURRENT_MAGIC) + 1024)
+
+    if head.startswith(CURRENT_MAGIC):
+        return os.path.join(os.path.dirname(filename), head[len(CURRENT_MAGIC):].decode("UTF-8"))
+
+    return filename
+
+
+def get_store_versions(filename):
+    """
+    Get published versions of the store 'filename'.
+
+    Out:
+        [1, 2, ...] - sorted. Store file of the version: <filename>.v<version>
+    """
+    folder = os.path.dirname(filename) or "."
+    version_re = re.compile(re.escape(os.path.basename(filename)) + r"\.v(\d+)$")
+    versions = []
+
+    for name in os.listdir(folder):
+        m = version_re.match(name)
+
+        if m:
+            versions.append(int(m.group(1)))
+
+    return sorted(versions)
+
+
+def publish_store(treemap, filename, indexes=(), bloom=None, keep=STORE_VERSIONS_KEEP, error_rate=wikidict.BLOOM_ERROR_RATE):
+    """
+    Save 'treemap' as the new version of the store, for processes, which share the 'filename'.
+    Version saved in the <filename>.v<version>, with the label index and the bloom filter.
+    Then the pointer file 'filename' replaced atomically. Readers open the pointer with the Dictionary,
+    keep the opened version mapped, and switch to the new version with Dictionary.reload().
+    Files of the old versions removed, except last 'keep'.
+
+    In:
+        treemap    - sorteddict with words | iterable of (label, words), sorted by label
+        filename   - pointer file name, like a: "test/data.store"
+        indexes    - index builders. See: save_to_store()
+        bloom      - bloom filter of labels. See: save_to_store()
+        keep       - count of the kept versions, with the new one
+        error_rate - false positive rate of the bloom filter. See: save_to_store()
+    Out:
+        store_file - file of the new version
+    """
+    versions = get_store_versions(filename)
+    version = versions[-1] + 1 if versions else 1
+    store_file = "%s.v%d" % (filename, version)
+    save_to_store(treemap, store_file, indexes, bloom, error_rate)
+
+    tmp_file = get_tmp_file(filename)
+
+    with open(tmp_file, "wb") as f:
+        f.write(CURRENT_MAGIC + os.path.basename(store_file).encode("UTF-8"))
+
+    os.replace(tmp_file, filename)
+
+    # old versions. Mapped pages stay valid for the readers, until they reload
+    folder = os.path.dirname(filename) or "."
+
+    for old in versions[:max(0, len(versions) + 1 - keep)]:
+        old_file = "%s.v%d" % (os.path.basename(filename), old)
+
+        for name in os.listdir(folder):
+            if name == old_file or name.startswith(old_file + "."):
+                try:
+                    os.remove(os.path.join(folder, name))
+                except OSError as e:
+                    # windows: file still mapped
+                    wikidict.log.warning("publish_store: %s", e)
+
+    return store_file
+
+
+class Dictionary:
+    """
+    Read-only dictionary, opened from the store file. See: save_to_store().
+    Opening take constant time. Words decoded only when the label requested.
+    Prefix and range queries answered by the label index <store>.trie. Built once, if not exists.
+    Missed labels rejected by the bloom filter <store>.bloom, before the search. Built once, if not exists.
+    Opened from the pointer file, shared by processes, switched to the new version with reload(). See: publish_store().
+
+    Usage:
+        d = Dictionary("test/data.store")
+        words = d["cat"]
+        words = d.get("cat", [])
+        results = d.lookup_many(["the", "cat", "sat"])
+        "cat" in d
+        labels = d.prefix("ca", 10)
+        (labels, cursor) = d.range("cat", "dog")
+        (labels, cursor) = d.range("cat", "dog", cursor)
+        d.reload()
+    """
+    def __init__(self, filename, labels=True, bloom=True):
+        """
+        In:
+            filename - store file | pointer file of the published store. See: publish_store()
+            labels   - True for open the label index
+            bloom    - True for open the bloom filter
+        """
+        self.source = filename
+        self.use_labels = labels
+        self.use_bloom = bloom
+        self.open(resolve_store(filename))
+
+    def open(self, filename):
+        """
+        Open store file 'filename', with the label index and bloom filter.
+        Dictionary switched to the new files, after all of them opened. On error files of the current version not changed.
+        """
+        table = SortedTable(filename, STORE_MAGIC)
+        labels = None
+        bloom = None
+
+        try:
+            decode_words = wikidict.get_word_codec(table.meta["fields"]).decode_words
+            keys = lambda: ( table.key(i) for i in range(len(table)) )
+
+            if self.use_labels:
+                label_file = filename + ".trie"
+
+                if not os.path.exists(label_file) or os.path.getmtime(label_file) < os.path.getmtime(filename):
+                    save_label_index(keys(), label_file)
+
+                labels = LabelIndex(label_file)
+
+            if self.use_bloom:
+                bloom_file = filename + ".bloom"
+
+                if not os.path.exists(bloom_file) or os.path.getmtime(bloom_file) < os.path.getmtime(filename):
+                    error_rate = table.meta.get("bloom_error_rate", wikidict.BLOOM_ERROR_RATE)
+                    wikidict.BloomFilter.build(keys(), len(table), error_rate).save(bloom_file)
+
+                bloom = wikidict.BloomFilter.load(bloom_file)
+
+        except BaseException:
+            for f in (table, labels, bloom):
+                if f is not None:
+                    f.close()
+
+            raise
+
+        self.filename = filename
+        self.table = table
+        self.decode_words = decode_words
+        self.labels = labels
+        self.bloom = bloom
+        self.indexes = {}
+        self.missing = set()
+
+    def reload(self):
+        """
+        Switch to the new version of the store, if published after open. See: publish_store().
+        Words, returned before, stay valid. Files of the old version closed after the new version opened.
+        If the new version not opened, error logged and the old version kept.
+
+        Out:
+            True - reloaded, False - not changed
+        """
+        try:
+            filename = resolve_store(self.source)
+
+            if filename == self.filename:
+                return False
+
+            old_files = self.get_files()
+            self.open(filename)
+
+        except Exception as e:
+            wikidict.log.warning("Dictionary: reload %s: %s", self.source, e)
+            return False
+
+        for f in old_files:
+            f.close()
+
+        return True
+
+    def get_files(self):
+        """
+        Opened files of the current version: store, label index, bloom filter and indexes.
+        """
+        files = [ self.table, self.labels, self.bloom ] + list(self.indexes.values())
+
+        return [ f for f in files if f is not None ]
+
+    def decode(self, i):
+        """
+        Decode words of the label 'i'.
+        """
+        return self.decode_words(pickle.loads(self.table.value(i)))
+
+    def get(self, label, default=None):
+        """
+        Get words of the 'label'.
+
+        Out:
+            [Word, Word] | default
+        """
+        if label in self.missing:
+            return default
+
+        i = self.find(label)
+
+        if i == -1:
+            self.add_missing(label)
+            return default
+
+        return self.decode(i)
+
+    def find(self, label):
+        """
+        Find position of the 'label'. Bloom filter checked first, and lookup counters updated.
+
+        Out:
+            position | -1
+        """
+        bloom = self.bloom
+
+        if bloom is None:
+            return self.table.find(label)
+
+        if label not in bloom:
+            bloom.misses += 1
+            return -1
+
+        i = self.table.find(label)
+
+        if i == -1:
+            bloom.false_positives += 1
+        else:
+            bloom.hits += 1
+
+        return i
+
+    def lookup_many(self, labels, default=None):
+        """
+        Get words of the each label. Labels deduplicated and sorted. Middle label searched first,
+        and splits the key range for the labels before and after it. So each search bounded
+        from both sides, the index and the records read in order, and each record decoded once.
+        Missed labels rejected by the bloom filter, or remembered, and not searched again.
+
+        In:
+            labels  - [label, label, ...], like a: tokens of the text
+            default - result for the missed label
+        Out:
+            [ [Word, Word] | default, ... ] - in the order of the 'labels'. Repeated labels share the same list.
+        """
+        table = self.table
+        missing = self.missing
+        bloom = self.bloom
+        keys = sorted( label for label in set(labels) if label not in missing )
+
+        if bloom is not None:
+            count = len(keys)
+            keys = [ label for label in keys if label in bloom ]
+            bloom.misses += count - len(keys)
+        positions = [-1] * len(keys)
+        stack = [ (0, len(keys), 0, table.count) ]   # keys[first:last] are in the table[lo:hi]
+
+        while stack:
+            (first, last, lo, hi) = stack.pop()
+
+            if first == last:
+                continue
+
+            mid = (first + last) // 2
+            i = table.bisect(keys[mid], lo, hi)
+
+            if i < hi and table.key(i) == keys[mid]:
+                positions[mid] = i
+                stack.append( (mid + 1, last, i + 1, hi) )
+            else:
+                stack.append( (mid + 1, last, i, hi) )
+
+            stack.append( (first, mid, lo, i) )
+
+        found = {}
+
+        for (label, i) in zip(keys, positions):
+            if i == -1:
+                self.add_missing(label)
+            else:
+                found[label] = self.decode(i)
+
+        if bloom is not None:
+            bloom.hits += len(found)
+            bloom.false_positives += len(keys) - len(found)
+
+        return [ found.get(label, default) for label in labels ]
+
+    def add_missing(self, label):
+        """
+        Remember missed 'label'. Cache cleared, when MISSING_CACHE_SIZE reached.
+        """
+        if len(self.missing) >= MISSING_CACHE_SIZE:
+            self.missing.clear()
+
+        self.missing.add(label)
+
+    def __getitem__(self, label):
+        words = self.get(label)
+
+        if words is None:
+            raise KeyError(label)
+
+        return words
+
+    def __contains__(self, label):
+        return self.find(label) != -1
+
+    def __len__(self):
+        return len(self.table)
+
+    def keys(self):
+        """
+        Generator. Yield all labels in the sorted order.
+        """
+        for i in range(len(self.table)):
+            yield self.table.key(i)
+
+    def prefix(self, p, limit=None):
+        """
+        Get sorted labels, starting with 'p'. Not more than 'limit'.
+
+        Out:
+            [label, label, ...]
+        """
+        return self.labels.prefix(p, limit)
+
+    def range(self, lo=None, hi=None, cursor=None, limit=RANGE_PAGE_SIZE):
+        """
+        Get page of sorted labels in the range lo <= label < hi. Next page requested with returned cursor.
+
+        Out:
+            (labels, cursor) - cursor is None after the last page
+        """
+        return self.labels.range(lo, hi, cursor, limit)
+
+    def get_index(self, index_class):
+        """
+        Open index of the 'index_class' (see WordIndex), saved next to the store.
+        If index not exists, or older than store, it built once from all words.
+        """
+        table = self.indexes.get(index_class)
+
+        if table is None:
+            index_file = self.filename + index_class.SUFFIX
+
+            if not os.path.exists(self.filename):
+                # version removed by publish_store(). Index not built, as it will not be removed with the version
+                raise FileNotFoundError("Store removed, reload() needed: %s" % self.filename)
+
+            if not os.path.exists(index_file) or os.path.getmtime(index_file) < os.path.getmtime(self.filename):
+                index_class.build(self)
+
+            table = self.indexes[index_class] = SortedTable(index_file, index_class.MAGIC)
+
+        return table
+
+    def lookup(self, index_class, key):
+        """
+        Get values of the 'key' from the index of the 'index_class'. O(log n).
+
+        Out:
+            [value, value, ...]
+        """
+        table = self.get_index(index_class)
+        i = table.find(key)
+
+        if i == -1:
+            return []
+
+        return pickle.loads(table.value(i))
+
+    def reverse_translate(self, lang, term):
+        """
+        Find English words, translated to the language 'lang' as 'term'.
+
+        In:
+            lang - language code, like a: "fr"
+            term - translation, like a: "chat"
+        Out:
+            [Word, Word]
+        """
+        result = []
+
+        for (label, i) in self.lookup(ReverseTranslationIndex, lang + ":" + term):
+            result.append(self[label][i])
+
+        return result
+
+    def lemmatize(self, form):
+        """
+        Find dictionary entries of the inflected 'form'.
+
+        In:
+            form - like a: "took", "horses"
+        Out:
+            [ (lemma, form type), ... ], like a: [("horse", "plural")]. See: LemmaIndex.
+        """
+        return self.lookup(LemmaIndex, form)
+
+    def fuzzy(self, query, max_distance=FUZZY_MAX_DISTANCE, limit=None):
+        """
+        Find labels, similar to the 'query'. For misspelled words.
+
+        In:
+            query        - label, like a: "catt"
+            max_distance - max edit distance (see edit_distance()). Not more than the distance of the index
+            limit        - max count of candidates | None for all
+        Out:
+            [ (label, distance), ... ] - sorted by distance, then by label
+        """
+        table = self.get_index(FuzzyIndex)
+
+        if max_distance > table.meta["max_distance"]:
+            raise ValueError("max_distance %d not supported by index. Max: %d" % (max_distance, table.meta["max_distance"]))
+
+        # candidates: found by prefix and by suffix
+        sides = []
+
+        for keys in get_fuzzy_keys(query, max_distance, table.meta["prefix_length"]):
+            found = [ i for i in map(table.find, keys) if i != -1 ]
+            size = sum( table.value_offsets[i+1] - table.value_offsets[i] for i in found )
+            sides.append( (size, found) )
+
+        # set from the smaller side, intersected with the larger side
+        sides.sort()
+        candidates = set()
+
+        for i in sides[0][1]:
+            candidates.update(array.array("I", table.value(i)))
+
+        positions = set()
+
+        for i in sides[1][1]:
+            positions |= candidates.intersection(array.array("I", table.value(i)))
+
+        candidates = positions
+
+        # verify
+        result = []
+        key = self.table.key
+        key_offsets = self.table.key_offsets
+        max_size = len(query.encode("UTF-8")) + 4 * max_distance
+        min_size = len(query) - max_distance
+
+        for position in candidates:
+            # utf-8 size of the label: chars <= size <= 4 * chars
+            size = key_offsets[position+1] - key_offsets[position]
+
+            if size > max_size or size < min_size:
+                continue
+
+            label = key(position)
+            distance = edit_distance(query, label, max_distance)
+
+            if distance <= max_distance:
+                result.append( (distance, label) )
+
+        result.sort()
+
+        return [ (label, distance) for (distance, label) in result[:limit] ]
+
+    def search(self, text, limit=10):
+        """
+        Full-text search in the explanations. Ranked by BM25. See: FullTextIndex.
+
+        In:
+            text  - query, like a: "domestic animal"
+            limit - max count of results
+        Out:
+            [ (Word, score), ... ] - best first
+        """
+        table = self.get_index(FullTextIndex)
+        count = table.meta["docs"]
+        avgdl = table.meta["avgdl"] or 1.0
+        docs = table.value_offsets[table.find("")]
+        lengths = docs + 8 * count
+        mm = table.mm
+        scores = {}
+
+        for term in set(tokenize(text)):
+            i = table.find(term)
+
+            if i == -1:
+                continue
+
+            data = table.value(i)
+            df = len(data) // 8
+            idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+
+            for (doc, tf) in zip(array.array("I", data[: 4 * df]), array.array("I", data[4 * df :])):
+                dl = POSTING.unpack_from(mm, lengths + 4 * doc)[0]
+                score = idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+                scores[doc] = scores.get(doc, 0.0) + score
+
+        result = []
+
+        for (doc, score) in heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0])):
+            position = POSTING.unpack_from(mm, docs + 4 * doc)[0]
+            word = POSTING.unpack_from(mm, docs + 4 * (count + doc))[0]
+            result.append( (self.decode(position)[word], score) )
+
+        return result
+
+    def contains(self, fragment, limit=None):
+        """
+        Find labels, containing 'fragment', like a: "olog" -> "biology", "ecology", ...
+        Candidates are labels with all trigrams of the 'fragment' (see NGramIndex).
+        Fragments shorter than trigram searched by scan of the labels.
+
+        In:
+            fragment - substring
+            limit    - max count of labels | None for all
+        Out:
+            [label, label, ...] - sorted
+        """
+        table = self.get_index(NGramIndex)
+        ngrams = get_ngrams(fragment, table.meta["n"])
+        result = []
+
+        if limit == 0:
+            return result
+
+        if not ngrams:
+            # short fragment: scan
+            for label in self.keys():
+                if fragment in label:
+                    result.append(label)
+
+                    if len(result) == limit:
+                        break
+
+            return result
+
+        # postings: (start, count), smallest first
+        postings = []
+
+        for ngram in ngrams:
+            i = table.find(ngram)
+
+            if i == -1:
+                return result
+
+            start = table.value_offsets[i]
+            postings.append( ((table.value_offsets[i+1] - start) // POSTING.size, start) )
+
+        postings.sort()
+        (count, start) = postings[0]
+        candidates = array.array("I", table.mm[start : start + count * POSTING.size])
+
+        # intersect: few candidates checked by binary search, many - by set
+        for (count, start) in postings[1:]:
+            if len(candidates) <= NGRAM_BISECT_LIMIT:
+                candidates = [ p for p in candidates if posting_contains(table.mm, start, count, p) ]
+            else:
+                lst = array.array("I", table.mm[start : start + count * POSTING.size])
+                candidates = sorted(set(candidates).intersection(lst))
+
+        # verify. Positions sorted, so labels sorted
+        key = self.table.key
+
+        for position in candidates:
+            label = key(position)
+
+            if fragment in label:
+                result.append(label)
+
+                if len(result) == limit:
+                    break
+
+        return result
+
+    def items(self):
+        """
+        Generator. Yield (label, words) in the sorted order.
+        """
+        for i in range(len(self.table)):
+            yield (self.table.key(i), self.decode(i))
+
+    def close(self):
+        for f in self.get_files():
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+### Tests ###
+def create_test_words(labels):
+    """
+    Create sorteddict with one Word per label. For tests.
+    """
+    treemap = wikidict.make_treemap()
+
+    for label in labels:
+        word = wikidict.Word()
+        word.LabelName = label
+        word.LanguageCode = "en"
+        word.Type = wikidict.WORD_TYPES.NOUN
+        word.ExplainationExample = [ {"cln": "explaination of " + label, "raw": "# explaination of " + label} ]
+        treemap[label] = [word]
+
+    return treemap
+
+
+class TestDictionary(unittest.TestCase):
+    """
+    Unit tests for the Dictionary.
+    """
+    def test_store(self):
+        labels = [ "cat", "chat", "dog", "horse", "zebra", "éclair", "" ]
+        treemap = create_test_words(labels)
+        filename = os.path.join(wikidict.TEST_FOLDER, "test.store")
+
+        self.assertTrue(save_to_store(treemap, filename) == len(labels))
+
+        with Dictionary(filename) as d:
+            self.assertTrue(len(d) == len(labels))
+            self.assertTrue(list(d.keys()) == sorted(labels))
+
+            for label in labels:
+                self.assertTrue(label in d)
+                self.assertTrue([ wikidict.word_codec.encode(w) for w in d[label] ] == [ wikidict.word_codec.encode(w) for w in treemap[label] ])
+
+            self.assertTrue("cats" not in d)
+            self.assertTrue(d.get("a") is None)
+
+            query = [ "zebra", "cats", "", "cat", "zebra", "éclair", "a", "cats" ]
+            results = d.lookup_many(query, [])
+            self.assertTrue([ words and words[0].LabelName for words in results ] == [ "zebra", [], "", "cat", "zebra", "éclair", [], [] ])
+            self.assertTrue(results[0] is results[4])
+            self.assertTrue("a" in d.missing and "zebra" not in d.missing)
+            self.assertTrue(d.lookup_many([]) == [])
+
+            self.assertTrue(os.path.exists(filename + ".bloom"))
+            self.assertTrue(d.bloom.hits + d.bloom.misses + d.bloom.false_positives > 0)
+            self.assertTrue(d.bloom.get_stats()["hits"] == d.bloom.hits)
+
+        # filter of the Wikidict
+        bloom = wikidict.BloomFilter.build(labels, len(labels))
+        save_to_store(treemap, filename, bloom=bloom)
+
+        with Dictionary(filename) as d:
+            self.assertTrue(d.bloom.size == bloom.size)
+            self.assertTrue(all( label in d for label in labels ))
+            self.assertTrue(d.bloom.hits == len(labels))
+            self.assertTrue(d.lookup_many([ "x" + label for label in labels ]) == [None] * len(labels))
+            self.assertTrue(d.bloom.misses + d.bloom.false_positives == len(labels))
+
+            with self.assertRaises(KeyError):
+                d["zzz"]
+
+        # stale filter
+        with self.assertRaises(ValueError):
+            save_to_store(treemap, filename, bloom=wikidict.BloomFilter.build(labels[:-1], len(labels)))
+
+        # error rate, kept in the meta for rebuild
+        save_to_store(treemap, filename, error_rate=0.001)
+        size = wikidict.BloomFilter.build(labels, len(labels), 0.001).size
+        os.remove(filename + ".bloom")
+
+        with Dictionary(filename) as d:
+            self.assertTrue(d.table.meta["bloom_error_rate"] == 0.001)
+            self.assertTrue(d.bloom.size == size and size > bloom.size)
+
+    def test_label_index(self):
+        import random
+
+        rnd = random.Random(1)
+        labels = sorted(set( "".join(rnd.choice("abcé") for i in range(rnd.randint(0, 6))) for j in range(500) ))
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-labels.store")
+        save_to_store(create_test_words(labels), filename)
+
+        with Dictionary(filename) as d:
+            self.assertTrue(list(d.labels.iter_from(0)) == labels)
+
+            for p in [ "", "a", "ab", "abc", "é", "éé", "b" * 7, "zz" ]:
+                expected = [ label for label in labels if label.startswith(p) ]
+                self.assertTrue(d.prefix(p) == expected)
+                self.assertTrue(d.prefix(p, 3) == expected[:3])
+
+            # pages
+            for (lo, hi) in [ (None, None), ("ab", "c"), ("b", "b"), ("zz", None) ]:
+                expected = [ label for label in labels if (lo is None or label >= lo) and (hi is None or label < hi) ]
+                result = []
+                (page, cursor) = d.range(lo, hi, limit=7)
+
+                while True:
+                    self.assertTrue(len(page) <= 7)
+                    result += page
+
+                    if cursor is None:
+                        break
+
+                    (page, cursor) = d.range(lo, hi, cursor, limit=7)
+
+                self.assertTrue(result == expected)
+
+    def test_reverse_translate(self):
+        dump_file = os.path.join(wikidict.TEST_FOLDER, "test-reverse-dump.xml.bz2")
+        pages = [
+            ("cat", "==English==\n===Noun===\n# animal\n"),
+            ("dog", "==English==\n===Noun===\n# animal\n"),
+        ]
+        wikidict.create_test_dump(dump_file, pages)
+
+        # same pass
+        wd = wikidict.Wikidict()
+        translations = { "cat": ["chat", "minou"], "dog": ["chien", "chat"] }
+
+        def parse_page(label, text, sha1=""):
+            words = create_test_words([label])[label]
+            words[0].Translation_FR = translations[label]
+            return words
+
+        wd.parse_page = parse_page
+        index = ReverseTranslationIndex()
+        wd.add_index(index)
+        wd.parse_dump(dump_file)
+
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-reverse.store")
+        save_to_store(wd.items(), filename, wd.indexes)
+        self.assertTrue(os.path.exists(filename + ".rev"))
+
+        with Dictionary(filename) as d:
+            self.assertTrue([ w.LabelName for w in d.reverse_translate("fr", "chat") ] == ["cat", "dog"])
+            self.assertTrue([ w.LabelName for w in d.reverse_translate("fr", "chien") ] == ["dog"])
+            self.assertTrue(d.reverse_translate("de", "chat") == [])
+
+        # built on demand
+        os.remove(filename + ".rev")
+
+        with Dictionary(filename) as d:
+            self.assertTrue([ w.LabelName for w in d.reverse_translate("fr", "minou") ] == ["cat"])
+
+    def test_lemmatize(self):
+        treemap = create_test_words([ "horse", "saw", "see", "take" ])
+        treemap["horse"][0].PluralVariant = "horses"
+        treemap["see"][0].Conjugation = [ "see", "saw", "seen", "seeing", "sees" ]
+        treemap["take"][0].Conjugation = [ "take", "took", "taken", "taking", "takes" ]
+        treemap["walk"] = create_test_words([ "walk" ])["walk"]
+        treemap["walk"][0].Conjugation = [ "walks", "walking", "walked" ]
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-lemma.store")
+
+        index = LemmaIndex()
+
+        for (label, words) in treemap.items():
+            index.add(label, words)
+
+        save_to_store(treemap, filename, [index])
+
+        with Dictionary(filename) as d:
+            self.assertTrue(d.lemmatize("horses") == [ ("horse", "plural") ])
+            self.assertTrue(d.lemmatize("took") == [ ("take", "past"), ("take", "past participle") ])
+            self.assertTrue(d.lemmatize("taken") == [ ("take", "past participle") ])
+            self.assertTrue(d.lemmatize("sees") == [ ("see", "present") ])
+            self.assertTrue(d.lemmatize("saw") == [ ("see", "past"), ("see", "past participle") ])
+            self.assertTrue(d.lemmatize("walked") == [ ("walk", "past"), ("walk", "past participle") ])
+            self.assertTrue(d.lemmatize("taking") == [ ("take", "participle") ])
+            self.assertTrue(d.lemmatize("take") == [])
+            self.assertTrue(d.lemmatize("horse") == [])
+
+    def test_fuzzy(self):
+        import random
+
+        self.assertTrue(edit_distance("cat", "cat", 2) == 0)
+        self.assertTrue(edit_distance("cat", "act", 2) == 1)
+        self.assertTrue(edit_distance("cat", "cats", 2) == 1)
+        self.assertTrue(edit_distance("kitten", "sitting", 2) == 3)
+        self.assertTrue(edit_distance("kitten", "sitting", 3) == 3)
+        self.assertTrue(edit_distance("", "ab", 2) == 2)
+
+        rnd = random.Random(1)
+        labels = sorted(set( "".join(rnd.choice("abcdé") for i in range(rnd.randint(1, 15))) for j in range(2000) ))
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-fuzzy.store")
+        save_to_store(create_test_words(labels), filename)
+
+        with Dictionary(filename) as d:
+            for query in [ "abcab", "a", "ddddddddd", "ébcaddcab", "x", "abcdeabcdeabcde" ] + labels[::200]:
+                for max_distance in (0, 1, 2):
+                    expected = sorted( (edit_distance(query, label, max_distance), label) for label in labels )
+                    expected = [ (label, distance) for (distance, label) in expected if distance <= max_distance ]
+                    self.assertTrue(d.fuzzy(query, max_distance) == expected)
+
+            self.assertTrue(len(d.fuzzy("abcab", 2, limit=3)) == 3)
+
+            with self.assertRaises(ValueError):
+                d.fuzzy("abcab", 3)
+
+    def test_contains(self):
+        import random
+
+        rnd = random.Random(1)
+        labels = sorted(set( "".join(rnd.choice("abcdé") for i in range(rnd.randint(1, 12))) for j in range(3000) ))
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-ngram.store")
+
+        # incremental
+        index = NGramIndex()
+
+        for label in labels[::2] + labels[1::2]:
+            index.add(label)
+
+        self.assertTrue(index.contains("abc") == [ label for label in labels if "abc" in label ])
+
+        save_to_store(create_test_words(labels), filename, [index])
+
+        with Dictionary(filename) as d:
+            for fragment in [ "a", "éb", "abc", "abcd", "dddd", "ébéb", "cabadeb", "x", "xyz", "" ]:
+                expected = [ label for label in labels if fragment in label ]
+                self.assertTrue(d.contains(fragment) == expected)
+                self.assertTrue(d.contains(fragment, 5) == expected[:5])
+
+    def test_search(self):
+        explanations = {
+            "cat": "A small domesticated carnivorous mammal",
+            "dog": "A mammal of the family Canidae, domesticated",
+            "horse": "A hoofed mammal. The horse is used for riding",
+            "pony": "A small horse",
+            "stable": "A building for horses",
+            "zebra": "",
+        }
+        treemap = create_test_words(sorted(explanations))
+
+        for (label, text) in explanations.items():
+            treemap[label][0].ExplainationExample = [ {"cln": text, "raw": "# " + text} ] if text else wikidict.EMPTY
+
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-search.store")
+        index = FullTextIndex(memory_budget=1, folder=wikidict.TEST_FOLDER, buffer_postings=3)
+
+        for label in [ "stable", "pony", "horse", "dog", "cat", "zebra" ]:
+            index.add(label, treemap[label])
+
+        # replaced and not stored documents dropped
+        index.add("unicorn", create_test_words(["unicorn"])["unicorn"])
+        index.add("stable", treemap["stable"] * 2)
+        index.add("zebra", [])
+        index.add("stable", treemap["stable"])
+
+        self.assertTrue(index.sorter.runs)
+        save_to_store(treemap, filename, [index])
+
+        with Dictionary(filename) as d:
+            self.assertTrue([ w.LabelName for (w, score) in d.search("horse") ] == [ "pony", "horse" ])
+            self.assertTrue([ w.LabelName for (w, score) in d.search("Small DOMESTICATED", 2) ] == [ "cat", "pony" ])
+            self.assertTrue(len(d.search("mammal", 10)) == 3)
+            self.assertTrue(d.search("unicorn") == [])
+            self.assertTrue([ w.LabelName for (w, score) in d.search("building") ] == [ "stable" ])
+            self.assertTrue(d.get_index(FullTextIndex).meta["docs"] == 5)
+
+        # built from the store
+        os.remove(filename + FullTextIndex.SUFFIX)
+
+        with Dictionary(filename) as d:
+            self.assertTrue([ w.LabelName for (w, score) in d.search("horse") ] == [ "pony", "horse" ])
+
+    def test_store_not_sorted(self):
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-not-sorted.store")
+
+        with self.assertRaises(ValueError):
+            save_to_store([ ("b", []), ("a", []) ], filename)
+
+        self.assertFalse(os.path.exists(get_tmp_file(filename)))
+
+    def test_publish_store(self):
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-publish.store")
+
+        for version in get_store_versions(filename):
+            os.remove("%s.v%d" % (filename, version))
+
+        self.assertTrue(publish_store(create_test_words(["cat", "dog"]), filename) == filename + ".v1")
+
+        with Dictionary(filename) as d, Dictionary(filename) as old:
+            self.assertTrue(d.filename == filename + ".v1")
+            self.assertTrue(list(d.keys()) == ["cat", "dog"])
+            self.assertFalse(d.reload())
+
+            # readers not changed, until reload
+            publish_store(create_test_words(["cat", "horse"]), filename)
+            self.assertTrue("dog" in d and "horse" not in d)
+
+            self.assertTrue(d.reload())
+            self.assertTrue(d.filename == filename + ".v2")
+            self.assertTrue("dog" not in d and d["horse"][0].LabelName == "horse")
+            self.assertTrue(d.prefix("h") == ["horse"])
+            self.assertTrue(d.bloom.count == 2)
+
+            # old versions removed. Opened one still readable
+            publish_store(create_test_words(["zebra"]), filename)
+            self.assertTrue(get_store_versions(filename) == [2, 3])
+            self.assertFalse(os.path.exists(filename + ".v1.trie"))
+
+            if os.name == "posix":
+                self.assertTrue(old["dog"][0].LabelName == "dog")
+
+            self.assertTrue(d.reload() and list(d.keys()) == ["zebra"])
+
+            # index of the removed version not built
+            if os.name == "posix":
+                with self.assertRaises(FileNotFoundError):
+                    old.lemmatize("dog")
+
+                self.assertFalse(any( name.startswith("test-publish.store.v1") for name in os.listdir(wikidict.TEST_FOLDER) ))
+
+            # broken version not opened. Current one kept
+            store_file = "%s.v%d" % (filename, get_store_versions(filename)[-1] + 1)
+
+            with open(store_file, "wb") as f:
+                f.write(b"broken")
+
+            with open(filename, "wb") as f:
+                f.write(CURRENT_MAGIC + os.path.basename(store_file).encode("UTF-8"))
+
+            self.assertFalse(d.reload())
+            self.assertTrue(d.filename == filename + ".v3" and d["zebra"][0].LabelName == "zebra")
+            os.remove(store_file)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,596 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# Local lookup server over the dictionary store.
+#
+# Store opened once and shared by all clients, instead of load_from_pickle() in every process.
+# Protocol: one JSON request per line, one JSON response per line, over TCP localhost or unix socket.
+# Requests of one connection processed concurrently, so responses may come out of order: matched by "id".
+#
+# Requests:
+#   {"id": 1, "op": "get", "label": "cat"}
+#   {"id": 2, "op": "prefix", "prefix": "ca", "limit": 10}
+#   {"id": 3, "op": "batch", "labels": ["cat", "dog"]}
+#   {"id": 4, "op": "reverse", "lang": "fr", "term": "chat"}
+#   {"id": 5, "op": "stats"}
+# Responses:
+#   {"id": 1, "result": [{"LabelName": "cat", ...}]}
+#   {"id": 1, "error": "..."}
+#
+# New version of the store, published with dictionary.publish_store(), picked up without restart.
+# Missed label index, bloom filter and indexes of the new version built in the thread, before switch.
+#
+# Usage:
+#   python server.py test/data.store [port | socket path]
+#
+#   async with LookupClient(port=8765) as client:
+#       words = await client.request("get", label="cat")
+
+
+import os
+import sys
+import json
+import time
+import asyncio
+import unittest
+from collections import OrderedDict, deque
+
+import wikidict
+import dictionary
+
+
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_CACHE_SIZE = 100000  # count of labels, which decoded words kept in the LRU cache
+SERVER_BATCH_CHUNK = 100    # count of labels of the batch, decoded before yield to other requests
+SERVER_LINE_LIMIT = 16 * 1024 * 1024    # max size of the request line
+LATENCY_WINDOW = 10000      # count of last requests, used for the latency percentiles
+SERVER_RELOAD_SECONDS = 1.0 # interval of the check for the new version of the store. None for disable
+SERVER_INDEXES = (dictionary.ReverseTranslationIndex,)  # indexes of the ops. Built before serve, not in the event loop
+
+
+class WordCache:
+    """
+    LRU cache of decoded words by label. Missed labels cached too, as None.
+    """
+    def __init__(self, d, size=SERVER_CACHE_SIZE):
+        """
+        In:
+            d    - Dictionary
+            size - max count of labels
+        """
+        self.d = d
+        self.size = size
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, label):
+        """
+        Get words of the 'label'.
+
+        Out:
+            [Word, Word] | None
+        """
+        data = self.data
+
+        if label in data:
+            self.hits += 1
+            data.move_to_end(label)
+            return data[label]
+
+        self.misses += 1
+        words = data[label] = self.d.get(label)
+
+        if len(data) > self.size:
+            data.popitem(last=False)
+
+        return words
+
+    def get_many(self, labels):
+        """
+        Get words of the each label. Labels, not in the cache, read by one Dictionary.lookup_many().
+
+        Out:
+            [ [Word, Word] | None, ... ] - in the order of the 'labels'
+        """
+        data = self.data
+        missed = [ label for label in labels if label not in data ]
+        self.misses += len(missed)
+        self.hits += len(labels) - len(missed)
+
+        # dict keeps the cached words, even if pushed out by the next labels
+        result = { label: data[label] for label in labels if label in data }
+        result.update(zip(missed, self.d.lookup_many(missed)))
+
+        for label in labels:
+            if label in data:
+                data.move_to_end(label)
+            else:
+                data[label] = result[label]
+
+        while len(data) > self.size:
+            data.popitem(last=False)
+
+        return [ result[label] for label in labels ]
+
+    def get_stats(self):
+        total = self.hits + self.misses
+
+        return {
+            "cache_size": len(self.data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+def percentile(values, p):
+    """
+    Get 'p' percentile of the 'values'. Nearest rank.
+
+    In:
+        values - [number, number, ...], sorted
+        p      - like a: 50, 99
+    """
+    if not values:
+        return 0.0
+
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class LookupServer:
+    """
+    Asyncio server over the dictionary store. See protocol at the top of the module.
+
+    Usage:
+        server = LookupServer("test/data.store")
+        await server.start(port=8765)
+        await server.serve_forever()
+    """
+    def __init__(self, filename, cache_size=SERVER_CACHE_SIZE, batch_chunk=SERVER_BATCH_CHUNK, reload_seconds=SERVER_RELOAD_SECONDS, line_limit=SERVER_LINE_LIMIT):
+        """
+        In:
+            filename       - store file | pointer file. See: dictionary.save_to_store(), dictionary.publish_store()
+            cache_size     - count of labels in the LRU cache
+            batch_chunk    - count of labels of the batch, decoded before yield to other requests
+            reload_seconds - interval of the check for the new version of the store
+            line_limit     - max size of the request line
+        """
+        self.d = dictionary.Dictionary(filename)
+        self.open_indexes(self.d)
+        self.cache = WordCache(self.d, cache_size)
+        self.batch_chunk = batch_chunk
+        self.line_limit = line_limit
+        self.reload_seconds = reload_seconds
+        self.reloader = None
+        self.reloads = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.errors = 0
+        self.server = None
+        self.ops = {
+            "get"     : self.op_get,
+            "prefix"  : self.op_prefix,
+            "batch"   : self.op_batch,
+            "reverse" : self.op_reverse,
+            "stats"   : self.op_stats,
+        }
+
+    async def start(self, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        """
+        Start listen. Port 0 for any free port.
+
+        In:
+            host, port - TCP address
+            path       - unix socket file. Used instead of the TCP, if set.
+        Out:
+            port | path
+        """
+        if self.reload_seconds:
+            self.reloader = asyncio.create_task(self.reload_forever())
+
+        if path:
+            self.server = await asyncio.start_unix_server(self.handle, path, limit=self.line_limit)
+            return path
+
+        self.server = await asyncio.start_server(self.handle, host, port, limit=self.line_limit)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def reload_forever(self):
+        """
+        Switch to the new version of the store, when published. Cached words of the old version dropped.
+        Errors logged, and the old version served until the next check.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await asyncio.sleep(self.reload_seconds)
+
+            try:
+                await loop.run_in_executor(None, self.prepare_reload)
+
+                if self.d.reload():
+                    self.open_indexes(self.d)
+                    self.cache.data.clear()
+                    self.reloads += 1
+                    wikidict.log.info("lookup server: reloaded %s", self.d.filename)
+
+            except Exception as e:
+                wikidict.log.warning("lookup server: reload: %s", e)
+
+    def prepare_reload(self):
+        """
+        Open the new version of the store, if published, in the separate Dictionary. Missed files built,
+        so reload() and open_indexes() in the event loop only open them. Run in the thread.
+        """
+        filename = dictionary.resolve_store(self.d.source)
+
+        if filename != self.d.filename:
+            with dictionary.Dictionary(filename) as d:
+                self.open_indexes(d)
+
+    def open_indexes(self, d):
+        """
+        Open SERVER_INDEXES of the Dictionary 'd'. Missed index built.
+        """
+        for index_class in SERVER_INDEXES:
+            d.get_index(index_class)
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        if self.reloader is not None:
+            self.reloader.cancel()
+
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+        self.d.close()
+
+    async def handle(self, reader, writer):
+        """
+        Connection handler. Each request line processed in own task.
+        """
+        tasks = set()
+
+        try:
+            while True:
+                line = await reader.readline()
+
+                if not line:
+                    break
+
+                task = asyncio.create_task(self.process(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError) as e:
+            wikidict.log.warning("lookup server: %s", e)
+
+        finally:
+            # requests in progress finished before close. Their errors retrieved
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, Exception):
+                    wikidict.log.warning("lookup server: %s", result)
+
+            writer.close()
+
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def process(self, line, writer):
+        """
+        Process one request line, write response line.
+        """
+        start = time.perf_counter()
+        request_id = None
+
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            op = self.ops.get(request.get("op"))
+
+            if op is None:
+                raise ValueError("unknown op: %s" % request.get("op"))
+
+            response = { "id": request_id, "result": await op(request) }
+
+        except Exception as e:
+            self.errors += 1
+            response = { "id": request_id, "error": "%s: %s" % (e.__class__.__name__, e) }
+
+        writer.write(json.dumps(response, cls=wikidict.WordsEncoder, ensure_ascii=False).encode("UTF-8") + b"\n")
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - start)
+
+        await writer.drain()
+
+    async def op_get(self, request):
+        return self.cache.get(request["label"])
+
+    async def op_prefix(self, request):
+        return self.d.prefix(request["prefix"], request.get("limit", dictionary.RANGE_PAGE_SIZE))
+
+    async def op_batch(self, request):
+        """
+        Get words of the each label. Other requests processed between chunks of the batch.
+
+        Out:
+            [ [Word, Word] | None, ... ] - in the order of the labels
+        """
+        labels = request["labels"]
+        result = []
+
+        for i in range(0, len(labels), self.batch_chunk):
+            result.extend(self.cache.get_many(labels[i : i + self.batch_chunk]))
+            await asyncio.sleep(0)
+
+        return result
+
+    async def op_reverse(self, request):
+        return self.d.reverse_translate(request["lang"], request["term"])
+
+    async def op_stats(self, request):
+        return self.get_stats()
+
+    def get_stats(self):
+        """
+        Get count of requests, latency percentiles in ms, cache hit rate.
+        """
+        latencies = sorted(self.latencies)
+        stats = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "reloads": self.reloads,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+        stats.update(self.cache.get_stats())
+
+        return stats
+
+
+class LookupClient:
+    """
+    Client of the LookupServer. Requests may be sent concurrently over one connection.
+
+    Usage:
+        async with LookupClient(port=port) as client:
+            words = await client.request("get", label="cat")
+            (a, b) = await asyncio.gather(client.request("get", label="cat"), client.request("get", label="dog"))
+    """
+    def __init__(self, host=SERVER_HOST, port=SERVER_PORT, path=None):
+        self.host = host
+        self.port = port
+        self.path = path
+        self.reader = None
+        self.writer = None
+        self.futures = {}
+        self.next_id = 0
+        self.receiver = None
+
+    async def connect(self):
+        if self.path:
+            (self.reader, self.writer) = await asyncio.open_unix_connection(self.path, limit=SERVER_LINE_LIMIT)
+        else:
+            (self.reader, self.writer) = await asyncio.open_connection(self.host, self.port, limit=SERVER_LINE_LIMIT)
+
+        self.receiver = asyncio.create_task(self.receive())
+
+    async def receive(self):
+        """
+        Read response lines, resolve futures of the requests.
+        """
+        try:
+            while True:
+                line = await self.reader.readline()
+
+                if not line:
+                    break
+
+                response = json.loads(line)
+                future = self.futures.pop(response["id"], None)
+
+                if future is None or future.done():
+                    continue
+
+                if "error" in response:
+                    future.set_exception(RuntimeError(response["error"]))
+                else:
+                    future.set_result(response["result"])
+
+        finally:
+            for future in self.futures.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("lookup server closed connection"))
+
+    async def request(self, op, **params):
+        """
+        Send request, wait the response.
+
+        In:
+            op     - "get" | "prefix" | "batch" | "reverse" | "stats"
+            params - like a: label="cat"
+        Out:
+            result. Words as dicts of the Word fields.
+        """
+        self.next_id += 1
+        request_id = self.next_id
+        future = self.futures[request_id] = asyncio.get_running_loop().create_future()
+
+        params.update(id=request_id, op=op)
+        self.writer.write(json.dumps(params, ensure_ascii=False).encode("UTF-8") + b"\n")
+        await self.writer.drain()
+
+        return await future
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+        if self.receiver is not None:
+            await asyncio.gather(self.receiver, return_exceptions=True)
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+
+### Tests ###
+class TestLookupServer(unittest.TestCase):
+    """
+    Unit tests for the LookupServer. On localhost.
+    """
+    def test_server(self):
+        labels = [ "cat", "chat", "dog", "horse", "éclair" ]
+        treemap = dictionary.create_test_words(labels)
+        treemap["cat"][0].Translation_FR = ["chat"]
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-server.store")
+        dictionary.save_to_store(treemap, filename)
+
+        async def run(path=None):
+            server = LookupServer(filename, cache_size=3, batch_chunk=2)
+            port = await server.start(port=0, path=path)
+
+            try:
+                async with LookupClient(port=port, path=path) as client:
+                    words = await client.request("get", label="cat")
+                    self.assertTrue([ w["LabelName"] for w in words ] == ["cat"])
+                    self.assertTrue(words[0]["ExplainationExample"] == [ {"cln": "explaination of cat", "raw": "# explaination of cat"} ])
+                    self.assertTrue(await client.request("get", label="cow") is None)
+
+                    self.assertTrue(await client.request("prefix", prefix="c", limit=10) == ["cat", "chat"])
+                    self.assertTrue([ w["LabelName"] for w in await client.request("reverse", lang="fr", term="chat") ] == ["cat"])
+
+                    batch = await client.request("batch", labels=["dog", "cow", "éclair", "cat", "dog"])
+                    self.assertTrue([ words and words[0]["LabelName"] for words in batch ] == ["dog", None, "éclair", "cat", "dog"])
+
+                    # concurrent requests on the one connection
+                    results = await asyncio.gather(*[ client.request("get", label=label) for label in labels ])
+                    self.assertTrue([ words[0]["LabelName"] for words in results ] == labels)
+
+                    with self.assertRaises(RuntimeError):
+                        await client.request("unknown")
+
+                    stats = await client.request("stats")
+                    self.assertTrue(stats["requests"] == 11 and stats["errors"] == 1)
+                    self.assertTrue(stats["cache_size"] == 3)
+                    self.assertTrue(stats["hits"] + stats["misses"] == 12 and stats["hits"] > 0)
+                    self.assertTrue(0 < stats["p50_ms"] <= stats["p99_ms"])
+
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+        path = os.path.join(wikidict.TEST_FOLDER, "test-server.sock")
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        asyncio.run(run(path))
+
+    def test_bad_line(self):
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-server.store")
+        dictionary.save_to_store(dictionary.create_test_words([ "cat", "dog" ]), filename)
+
+        async def run():
+            server = LookupServer(filename, batch_chunk=1, line_limit=1024)
+            port = await server.start(port=0)
+
+            try:
+                # batch in progress, when the next line is too long: batch answered, then connection closed
+                (reader, writer) = await asyncio.open_connection(SERVER_HOST, port)
+                writer.write(b'{"id": 1, "op": "batch", "labels": ["cat", "dog", "cow"]}\n' + b"x" * 2048 + b"\n")
+                await writer.drain()
+
+                response = json.loads(await reader.readline())
+                self.assertTrue(response["id"] == 1 and [ words and words[0]["LabelName"] for words in response["result"] ] == [ "cat", "dog", None ])
+                self.assertTrue(await reader.readline() == b"")
+                writer.close()
+
+                self.assertTrue(server.requests == 1)
+
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+    def test_reload(self):
+        filename = os.path.join(wikidict.TEST_FOLDER, "test-server-publish.store")
+        dictionary.publish_store(dictionary.create_test_words(["cat"]), filename)
+
+        async def run():
+            server = LookupServer(filename, reload_seconds=0.01)
+            port = await server.start(port=0)
+
+            try:
+                async with LookupClient(port=port) as client:
+                    self.assertTrue(await client.request("get", label="dog") is None)
+
+                    dictionary.publish_store(dictionary.create_test_words(["cat", "dog"]), filename)
+                    await asyncio.sleep(0.1)
+
+                    self.assertTrue((await client.request("get", label="dog"))[0]["LabelName"] == "dog")
+                    self.assertTrue((await client.request("stats"))["reloads"] == 1)
+
+                    # error in the check not stop the reloads
+                    reload = server.d.reload
+                    errors = []
+
+                    def failed_reload():
+                        if not errors:
+                            errors.append(1)
+                            raise OSError("test")
+
+                        return reload()
+
+                    server.d.reload = failed_reload
+                    dictionary.publish_store(dictionary.create_test_words(["cat", "dog", "cow"]), filename)
+                    await asyncio.sleep(0.1)
+
+                    self.assertTrue(errors and (await client.request("get", label="cow"))[0]["LabelName"] == "cow")
+                    self.assertTrue((await client.request("stats"))["reloads"] == 2)
+
+                    # indexes of the new version built before switch
+                    self.assertTrue(os.path.exists(server.d.filename + dictionary.ReverseTranslationIndex.SUFFIX))
+                    self.assertTrue(dictionary.ReverseTranslationIndex in server.d.indexes)
+
+            finally:
+                await server.close()
+
+        asyncio.run(run())
+
+
+def main():
+    """
+    Run server. Args: store file, port or unix socket path.
+    """
+    filename = sys.argv[1] if len(sys.argv) > 1 else os.path.join(wikidict.TEST_FOLDER, "data.store")
+    address = sys.argv[2] if len(sys.argv) > 2 else str(SERVER_PORT)
+
+    async def serve():
+        server = LookupServer(filename)
+
+        if address.isdigit():
+            where = await server.start(port=int(address))
+        else:
+            where = await server.start(path=address)
+
+        wikidict.log.info("lookup server: %s on %s", filename, where)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
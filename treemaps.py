@@ -0,0 +1,219 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# Sorted map backends for the Wikidict.treemap.
+#
+# Words are added label by label while parsing, but the order needed only on export.
+# Backends:
+#   dict   - plain dict. Keys sorted once, on first ordered access after changes. Fastest build.
+#   bisect - dict + sorted list of keys, kept with bisect.
+#   blist  - blist.sorteddict, if installed.
+#
+# All backends keep the mapping API: treemap[label], label in treemap, len(treemap),
+# treemap.keys(), treemap.items() in the sorted order, pickle.
+#
+# Usage:
+#   treemap = make_treemap("dict")
+
+
+import bisect
+import unittest
+from collections.abc import MutableMapping, ItemsView, ValuesView
+
+try:
+    from blist import sorteddict
+except ImportError:
+    sorteddict = None
+
+
+TREEMAP_BACKEND = "dict"    # default backend
+
+
+class SortedItemsView(ItemsView):
+    """
+    Items view without __getitem__ call per key.
+    """
+    def __iter__(self):
+        data = self._mapping.data
+
+        for key in self._mapping:
+            yield (key, data[key])
+
+
+class SortedValuesView(ValuesView):
+    """
+    Values view without __getitem__ call per key.
+    """
+    def __iter__(self):
+        data = self._mapping.data
+
+        for key in self._mapping:
+            yield data[key]
+
+
+class DictTreemap(MutableMapping):
+    """
+    Plain dict. Keys sorted once, on first ordered access after changes.
+    """
+    def __init__(self, items=()):
+        self.data = {}
+        self.sorted_keys = None
+        self.update(items)
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        data = self.data
+        count = len(data)
+        data[key] = value
+
+        if len(data) != count:
+            # new key
+            self.sorted_keys = None
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.sorted_keys = None
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __len__(self):
+        return len(self.data)
+
+    def __iter__(self):
+        if self.sorted_keys is None:
+            self.sorted_keys = sorted(self.data)
+
+        return iter(self.sorted_keys)
+
+    def update(self, items=(), **kwargs):
+        """
+        Bulk insert.
+        """
+        self.data.update(items, **kwargs)
+        self.sorted_keys = None
+
+    def items(self):
+        return SortedItemsView(self)
+
+    def values(self):
+        return SortedValuesView(self)
+
+    def __getstate__(self):
+        return { "data": self.data, "sorted_keys": None }
+
+    def __repr__(self):
+        return self.__class__.__name__ + "(" + repr(dict(self.items())) + ")"
+
+
+class BisectTreemap(DictTreemap):
+    """
+    Dict + sorted list of keys. New keys inserted into the list with bisect.
+    """
+    def __init__(self, items=()):
+        self.sorted_keys = []
+        super().__init__(items)
+
+    def __setitem__(self, key, value):
+        data = self.data
+
+        if key not in data:
+            keys = self.sorted_keys
+
+            if not keys or key > keys[-1]:
+                keys.append(key)
+            else:
+                bisect.insort(keys, key)
+
+        data[key] = value
+
+    def __delitem__(self, key):
+        del self.data[key]
+        keys = self.sorted_keys
+        del keys[bisect.bisect_left(keys, key)]
+
+    def __iter__(self):
+        return iter(self.sorted_keys)
+
+    def update(self, items=(), **kwargs):
+        """
+        Bulk insert. Keys sorted once.
+        """
+        self.data.update(items, **kwargs)
+        self.sorted_keys = sorted(self.data)
+
+    def __getstate__(self):
+        return { "data": self.data }
+
+    def __setstate__(self, state):
+        self.data = state["data"]
+        self.sorted_keys = sorted(self.data)
+
+
+BACKENDS = {
+    "dict"   : DictTreemap,
+    "bisect" : BisectTreemap,
+}
+
+if sorteddict is not None:
+    BACKENDS["blist"] = sorteddict
+
+
+def make_treemap(backend=None, items=()):
+    """
+    Create sorted map.
+
+    In:
+        backend - "dict" | "bisect" | "blist". None for TREEMAP_BACKEND
+        items   - initial items: dict | iterable of (key, value)
+    Out:
+        treemap
+    """
+    backend = backend or TREEMAP_BACKEND
+
+    if backend not in BACKENDS:
+        raise ValueError("Unsupported treemap backend: %s. Available: %s" % (backend, ", ".join(BACKENDS)))
+
+    return BACKENDS[backend](items)
+
+
+### Tests ###
+class TestTreemaps(unittest.TestCase):
+    """
+    Unit tests for the treemap backends.
+    """
+    def test_backends(self):
+        import pickle
+
+        keys = [ "horse", "cat", "dog", "zebra", "ant", "cat" ]
+
+        for backend in BACKENDS:
+            treemap = make_treemap(backend)
+
+            for i, key in enumerate(keys):
+                treemap[key] = i
+
+            self.assertTrue(list(treemap.keys()) == sorted(set(keys)))
+            self.assertTrue(list(treemap.items())[0] == ("ant", 4))
+            self.assertTrue(treemap["cat"] == 5)
+            self.assertTrue(len(treemap) == 5)
+            self.assertTrue("dog" in treemap and "cow" not in treemap)
+
+            del treemap["dog"]
+            treemap["bee"] = 6
+            self.assertTrue(list(treemap) == [ "ant", "bee", "cat", "horse", "zebra" ])
+            self.assertTrue(list(treemap.values()) == [ 4, 6, 5, 0, 3 ])
+
+            loaded = pickle.loads(pickle.dumps(treemap))
+            self.assertTrue(list(loaded.items()) == list(treemap.items()))
+
+            self.assertTrue(list(make_treemap(backend, {"b": 1, "a": 2}).items()) == [ ("a", 2), ("b", 1) ])
+
+        with self.assertRaises(ValueError):
+            make_treemap("unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
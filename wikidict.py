@@ -3,13 +3,13 @@
 
 # 1) Wiktionary Loader from dump : download the file source with HTTP (This module have one parameter : Language code)
 # 2) Load into memory (TreeMap): parse the source file 
-# 3) Export to 9 text file JSON UTF-8
+# 3) Export to 9 text file JSON UTF-8 (see save_to_partitions())
 # 4) Load from JSON text file into TreeMap
 # 5) Save to disk (Pickle)
 # 6) Load from disk (Pickl
 
 # Requirements:
-#   pip install blist
+#   pip install blist           (optional, treemap backend "blist". See: treemaps.py)
 #   pip install wikitextparser
 #   pip install requests
 #
@@ -35,9 +35,27 @@ import pickle
 import string
 import itertools
 import logging
+import threading
+import queue
+import time
+import io
+import gzip
+import operator
+import heapq
+import tempfile
+import random
+import bisect
+import concurrent.futures
+import multiprocessing
+import sqlite3
+import mmap
+import math
+import struct
+import hashlib
  
 #import wikitextparser as wtp
-from blist import sorteddict
+from collections.abc import Mapping
+from treemaps import make_treemap
 import templates
 
 
@@ -46,6 +64,23 @@ CACHE_FOLDER = "cached"     # folder where stored downloadad dumps
 LOGS_FOLDER  = "logs"       # log folder
 TEST_FOLDER  = "test"       # test folder
 
+# dump reading
+DUMP_BUFFER_SIZE = 4 * 1024 * 1024  # size of decompressed chunk, fed to the xml parser
+DUMP_QUEUE_SIZE  = 8                # max count of decompressed chunks, waiting for the xml parser
+
+# export
+NDJSON_BUFFER_SIZE = 1024 * 1024    # write buffer of the NDJSON sink
+JSON_BUFFER_SIZE   = 1024 * 1024    # read buffer of the streaming JSON reader
+PARTITIONS = 9                      # count of JSON files in the partitioned export
+PARTITION_SAMPLE_SIZE = 10000       # count of labels, sampled for choose partition bounds
+PARTITIONS_MANIFEST = "partitions.json" # manifest of the partitioned export: partition files and key ranges
+SQLITE_BATCH_SIZE = 10000           # count of words, inserted in one transaction
+
+# bloom filter of labels
+BLOOM_ERROR_RATE = 0.01             # false positive rate of the bloom filter
+BLOOM_HEADER = struct.Struct("<8sIIQQ") # magic, version, hashes, bits, count
+BLOOM_MAGIC = b"WKDBLOOM"
+
 # logging
 log_level = logging.INFO    # log level: logging.DEBUG | logging.INFO | logging.WARNING | logging.ERROR
 WORD_JUST = 24              # align size
@@ -125,13 +160,68 @@ Templates:
     Verb: verb
 """
 
+class EmptyList(list):
+    """
+    Read-only empty list. One instance EMPTY shared by all Words, instead of own empty lists.
+    Equal to [], encoded in JSON as [], pickled as reference to EMPTY.
+    """
+    __slots__ = ()
+    
+    def readonly(self, *args, **kwargs):
+        raise TypeError("EMPTY list is read-only")
+        
+    append = extend = insert = pop = remove = clear = sort = reverse = readonly
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = readonly
+    
+    def __reduce__(self):
+        return "EMPTY"
+        
+EMPTY = EmptyList()
+
+
+# Word fields, in the order of the packed layout
+WORD_FIELDS = (
+    "LabelName", "LanguageCode", "Type", "TypeLabelName", "ExplainationExample",
+    "IsMaleVariant", "IsFemaleVariant", "MaleVariant", "FemaleVariant",
+    "IsSingleVariant", "IsPluralVariant", "SingleVariant", "PluralVariant",
+    "AlternativeFormsOther", "RelatedTerms",
+    "IsVerbPast", "IsVerbPresent", "IsVerbFutur", "Conjugation", "Synonyms",
+    "Translation_EN", "Translation_FR", "Translation_DE", "Translation_ES",
+    "Translation_RU", "Translation_CN", "Translation_PT", "Translation_JA",
+)
+
+# Fields with few different values. Interned, so millions of Words share the same strings
+WORD_INTERNED_FIELDS = ("LanguageCode", "Type", "TypeLabelName")
+
+# Fields with empty list by default. Empty lists replaced by the EMPTY
+WORD_LIST_FIELDS = ("ExplainationExample", "AlternativeFormsOther")
+
+# Translation fields, with language codes
+WORD_TRANSLATION_FIELDS = (
+    ("en", "Translation_EN"), ("fr", "Translation_FR"), ("de", "Translation_DE"), ("es", "Translation_ES"),
+    ("ru", "Translation_RU"), ("cn", "Translation_CN"), ("pt", "Translation_PT"), ("ja", "Translation_JA"),
+)
+
+# Types of the Word.Conjugation forms. See: get_conjugation_types()
+CONJUGATION_FORMS = ("present", "participle", "past", "past participle")
+
+# Fields with lists common for all Words of the page (see get_words()). Saved once per label in the shared layout
+WORD_SHARED_FIELDS = (
+    "AlternativeFormsOther",
+    "Translation_EN", "Translation_FR", "Translation_DE", "Translation_ES",
+    "Translation_RU", "Translation_CN", "Translation_PT", "Translation_JA",
+)
+
+
 class Word:
+    __slots__ = WORD_FIELDS
+    
     def __init__(self):
         self.LabelName = ""             #
         self.LanguageCode = ""          # (EN,FR,…)
         self.Type = ""                  #  = noun,verb… see = WORD_TYPES
         self.TypeLabelName = ""         # chatt for verb of chat
-        self.ExplainationExample = [ ]  # (explaination1||Example1) (A wheeled vehicle that moves independently||She drove her car to the mall..)
+        self.ExplainationExample = EMPTY # (explaination1||Example1) (A wheeled vehicle that moves independently||She drove her car to the mall..)
         self.IsMaleVariant = None
         self.IsFemaleVariant = None
         self.MaleVariant = None         # ""
@@ -140,7 +230,7 @@ class Word:
         self.IsPluralVariant = None
         self.SingleVariant = None       # ""
         self.PluralVariant = None       # ""
-        self.AlternativeFormsOther = [] # (British variant, usa variant, etc…)
+        self.AlternativeFormsOther = EMPTY # (British variant, usa variant, etc…)
         self.RelatedTerms = None        # [] (list of all Related terms and Derived terms)
         self.IsVerbPast = None
         self.IsVerbPresent = None
@@ -165,6 +255,266 @@ class Word:
     def __repr__(self):
         return "Word("+self.LabelName+")"
 
+    def __reduce__(self):
+        # pickle as list of field values. see: WordCodec
+        return (unpack_word, (word_codec.encode(self),))
+
+    def __setstate__(self, state):
+        # unpickle Word, pickled before __slots__: state is __dict__, or (__dict__ | None, slots)
+        if isinstance(state, tuple):
+            (state, slots) = state
+            state = dict(state or {}, **(slots or {}))
+            
+        word = word_codec.decode( tuple(state.get(f, getattr(EMPTY_WORD, f)) for f in WORD_FIELDS) )
+        set_word_values(self, word_codec.encode(word))
+
+
+def set_word_values(word, values):
+    """
+    Set all fields of the 'word' from 'values', in the order of WORD_FIELDS.
+    Fields listed explicitly: one unpacking assignment, faster than setattr() per field.
+    Order checked against the WORD_FIELDS on import. See: check_set_word_values()
+    """
+    (word.LabelName, word.LanguageCode, word.Type, word.TypeLabelName, word.ExplainationExample,
+     word.IsMaleVariant, word.IsFemaleVariant, word.MaleVariant, word.FemaleVariant,
+     word.IsSingleVariant, word.IsPluralVariant, word.SingleVariant, word.PluralVariant,
+     word.AlternativeFormsOther, word.RelatedTerms,
+     word.IsVerbPast, word.IsVerbPresent, word.IsVerbFutur, word.Conjugation, word.Synonyms,
+     word.Translation_EN, word.Translation_FR, word.Translation_DE, word.Translation_ES,
+     word.Translation_RU, word.Translation_CN, word.Translation_PT, word.Translation_JA) = values
+
+
+def check_set_word_values():
+    """
+    Check, that set_word_values() set fields in the order of the WORD_FIELDS (and Word.__slots__).
+    Raise ValueError, if field lists differ.
+    """
+    if Word.__slots__ != WORD_FIELDS:
+        raise ValueError("Word.__slots__ differ from WORD_FIELDS")
+        
+    word = object.__new__(Word)
+    set_word_values(word, WORD_FIELDS)
+    
+    for f in WORD_FIELDS:
+        if getattr(word, f) != f:
+            raise ValueError("set_word_values(): field %s set from the %s" % (f, getattr(word, f)))
+            
+check_set_word_values()
+
+
+def check_word_fields(fields):
+    """
+    Check field list 'fields', like a read from the file. Raise ValueError on unknown or duplicate field.
+    
+    Out:
+        tuple of fields
+    """
+    fields = tuple(fields)
+    
+    for f in fields:
+        if not isinstance(f, str) or f not in WORD_FIELDS:
+            raise ValueError("Unknown Word field: %r" % (f,))
+            
+    if not fields:
+        raise ValueError("Empty Word field list")
+        
+    if len(set(fields)) != len(fields):
+        raise ValueError("Duplicate Word fields: %r" % (fields,))
+        
+    return fields
+
+
+class WordCodec:
+    """
+    Fast Word encoder/decoder for the Word field list 'fields'.
+    
+    Word packed to the tuple of field values, in the order of 'fields':
+        ("cat", "en", "noun", ...)
+        
+    Used in: pickle, packed JSON, NDJSON. Field lists, read from files, checked with check_word_fields().
+    For read use get_word_codec(fields): one codec per field list.
+    
+    Usage:
+        values = word_codec.encode(word)
+        word = word_codec.decode(values)
+    """
+    def __init__(self, fields=WORD_FIELDS):
+        self.fields = check_word_fields(fields)
+        
+        # encoder: one C call, without per-field reflection
+        if len(self.fields) == 1:
+            get = operator.attrgetter(self.fields[0])
+            self.encode = lambda word: (get(word),)
+        else:
+            self.encode = operator.attrgetter(*self.fields)
+        
+        # decoder: values reordered to the WORD_FIELDS order, with defaults of the missed fields, by one C call,
+        # then assigned by set_word_values(). WORD_INTERNED_FIELDS interned, empty WORD_LIST_FIELDS replaced by the EMPTY
+        default = Word()
+        default_values = tuple( getattr(default, f) for f in WORD_FIELDS )
+        count = len(self.fields)
+        new = object.__new__
+        intern = sys.intern
+        interned_positions = tuple( WORD_FIELDS.index(f) for f in WORD_INTERNED_FIELDS )
+        list_positions = tuple( WORD_FIELDS.index(f) for f in WORD_LIST_FIELDS )
+        
+        if self.fields == WORD_FIELDS:
+            reorder = None
+        else:
+            # index in the values + default_values
+            positions = { f: i for (i, f) in enumerate(self.fields) }
+            reorder = operator.itemgetter(*( positions.get(f, count + j) for (j, f) in enumerate(WORD_FIELDS) ))
+        
+        def decode(values):
+            if reorder is None:
+                values = list(values)
+            elif len(values) != count:
+                raise ValueError("Word values: expected %d, got %d" % (count, len(values)))
+            else:
+                values = list(reorder(tuple(values) + default_values))
+                
+            for i in interned_positions:
+                if values[i]:
+                    values[i] = intern(values[i])
+                    
+            for i in list_positions:
+                if values[i] == []:
+                    values[i] = EMPTY
+                    
+            word = new(Word)
+            set_word_values(word, values)
+            
+            return word
+            
+        self.decode = decode
+        
+        # positions of the shared fields in the packed tuple
+        self.shared_positions = tuple( i for (i, f) in enumerate(self.fields) if f in WORD_SHARED_FIELDS )
+        
+    def encode_words(self, words):
+        """
+        Encode list of words. Out: [ (...), (...) ]
+        """
+        encode = self.encode
+        return [ encode(w) for w in words ]
+        
+    def decode_words(self, rows):
+        """
+        Decode list of packed words. Out: [Word, Word]
+        """
+        decode = self.decode
+        return [ decode(r) for r in rows ]
+        
+    def encode_words_shared(self, words):
+        """
+        Encode list of words. Lists, common for several words (see WORD_SHARED_FIELDS), saved once, 
+        in the reference table. Words refer to them by index in the table.
+        
+        Out:
+            [ (...), (...) ]                                      - without common lists
+            {"@shared": [ [...], [...] ], "@rows": [ (...), (...) ]}  - with common lists, like a:
+                {"@shared": [["chat"]], "@rows": [["cat", "en", "noun", ... 0, ...], ["cat", "en", "verb", ... 0, ...]]}
+        """
+        rows = self.encode_words(words)
+        
+        if len(rows) < 2:
+            return rows
+            
+        # count usage of each list. by identity: get_words() assign the same list object to all words of the page
+        positions = self.shared_positions
+        usage = {}
+        
+        for row in rows:
+            for i in positions:
+                lst = row[i]
+                
+                if lst:
+                    if id(lst) in usage:
+                        usage[id(lst)][1] += 1
+                    else:
+                        usage[id(lst)] = [lst, 1]
+                    
+        table = []
+        refs = {}
+        
+        for (key, (lst, count)) in usage.items():
+            if count > 1:
+                refs[key] = len(table)
+                table.append(lst)
+                
+        if not table:
+            return rows
+            
+        shared_rows = []
+        
+        for row in rows:
+            row = list(row)
+            
+            for i in positions:
+                ref = refs.get(id(row[i]))
+                
+                if ref is not None:
+                    row[i] = ref
+                    
+            shared_rows.append(row)
+            
+        return { "@shared": table, "@rows": shared_rows }
+        
+    def decode_words_shared(self, obj):
+        """
+        Decode list of words, encoded with encode_words_shared(). References replaced with lists from the table.
+        Words, referred to the same list, get the same list object, like a after get_words().
+        
+        Out: [Word, Word]
+        """
+        if not isinstance(obj, dict):
+            return self.decode_words(obj)
+            
+        table = obj["@shared"]
+        positions = self.shared_positions
+        decode = self.decode
+        words = []
+        
+        for row in obj["@rows"]:
+            for i in positions:
+                if type(row[i]) is int:
+                    row[i] = table[row[i]]
+                    
+            words.append(decode(row))
+            
+        return words
+
+
+word_codec = WordCodec()
+EMPTY_WORD = Word()             # default values
+
+
+word_codecs = { WORD_FIELDS: word_codec }   # codecs by field list. See: get_word_codec()
+
+
+def get_word_codec(fields):
+    """
+    Get WordCodec of the field list 'fields'. Created once per field list.
+    """
+    fields = check_word_fields(fields)
+    codec = word_codecs.get(fields)
+    
+    if codec is None:
+        codec = word_codecs[fields] = WordCodec(fields)
+        
+    return codec
+    
+    
+def unpack_word(values):
+    """
+    Unpickle callback. Decode Word from the packed tuple.
+    """
+    if len(values) != len(WORD_FIELDS):
+        # pickled with other fields
+        return get_word_codec(WORD_FIELDS[:len(values)]).decode(values)
+        
+    return word_codec.decode(values)
+
 
 class WordsEncoder(json.JSONEncoder):
     """
@@ -174,10 +524,10 @@ class WordsEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Word):
             # Word
-            return {k:v for k,v in obj.__dict__.items() if k[0] != "_"}
+            return dict(zip(WORD_FIELDS, word_codec.encode(obj)))
 
-        elif isinstance(obj, sorteddict):
-            # sorteddict
+        elif isinstance(obj, Mapping):
+            # treemap
             return dict(obj.items())
 
         # default
@@ -203,7 +553,8 @@ def sanitize_filename(filename):
     return re.sub(r'(?u)[^-\w.]', '', filename)
 
 def unique(lst):    
-    return list(set(lst))
+    # order kept
+    return list(dict.fromkeys(lst))
 
 def get_contents(filename):
     """
@@ -227,222 +578,1758 @@ def save_text(label, text, ext=".txt"):
     """
     put_contents(os.path.join(TXT_FOLDER, sanitize_filename(label) + ext), text)
     
-def save_to_json(treemap, filename):
+def save_to_json(treemap, filename, packed=False, shared=False):
     """
     Save 'treemap' in the file 'filename'. In JSON format. Encoding UTF-8.
+    Labels written one by one, so 'treemap' can be the stream of (label, words), like a: wd.items()
+    
+    In:
+        treemap  - sorteddict with words | iterable of (label, words)
+        filename - output file name
+        packed   - True for packed layout: Word saved as list of field values (see WordCodec), without indents.
+                   {"@fields": ["LabelName", ...], "@words": {"cat": [["cat", "en", ...], ...]}}
+        shared   - True for packed layout with shared lists: alternatives and translations, common for all words
+                   of the label, saved once per label (see WordCodec.encode_words_shared()).
+                   {"@fields": ["LabelName", ...], "@words": {"cat": {"@shared": [["chat"]], "@rows": [["cat", "en", ..., 0, ...], ...]}}}
     """
     create_storage(os.path.dirname(os.path.abspath(filename)))
     
     with open(filename, "w", encoding="UTF-8") as f:
-        json.dump(treemap, f, cls=WordsEncoder, sort_keys=False, indent=4, ensure_ascii=False)
+        if isinstance(treemap, (Word, list)):
+            # not treemap
+            json.dump(treemap, f, cls=WordsEncoder, sort_keys=False, indent=4, ensure_ascii=False)
+            return
+            
+        items = treemap.items() if hasattr(treemap, "items") else treemap
+        
+        if packed or shared:
+            encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+            encode_words = word_codec.encode_words_shared if shared else word_codec.encode_words
+            
+            f.write('{"@fields":' + encoder.encode(word_codec.fields) + ',"@words":{')
+            
+            for i, (label, words) in enumerate(items):
+                f.write( ("," if i else "") + encoder.encode(label) + ":" + encoder.encode(encode_words(words)) )
+                
+            f.write("}}")
+            
+        else:
+            # same as json.dump(treemap, f, indent=4)
+            encoder = WordsEncoder(ensure_ascii=False, indent=4)
+            
+            count = 0
+            
+            f.write("{")
+            
+            for (label, words) in items:
+                f.write( ("," if count else "") + "\n    " + encoder.encode(label) + ": " + encoder.encode(words).replace("\n", "\n    ") )
+                count += 1
+                
+            f.write("\n}" if count else "}")
 
 def load_from_json(filename):    
     """
     Load data from JSON-file 'filename'. Decode to class Word. Encoding UTF-8. 
+    Packed and shared layouts (see save_to_json()) detected automatically.
     
     In:
         filename
     Out:
         sorteddict | None
     """
-    def decode_json_object(obj):
-        """
-        json object decoder callback.
-        """
-        if "LabelName" in obj:
-            word = Word()
-            
-            for k,v in obj.items():
-                setattr(word, k, v)
-            
-            return word
-            
-        else:
-            return sorteddict(obj)        
-
     # decode
     with open(filename, "r", encoding="UTF-8") as f:
-        treemap = json.load(f, object_hook=decode_json_object)
+        if f.read(len('{"@fields"')) == '{"@fields"':
+            # packed
+            f.seek(0)
+            obj = json.load(f)
+            decode_words = get_word_codec(obj["@fields"]).decode_words_shared
+            return make_treemap(items=( (label, decode_words(rows)) for (label, rows) in obj["@words"].items() ))
+            
+        f.seek(0)
+        treemap = json.load(f, object_hook=decode_word)
+        
+        if isinstance(treemap, dict):
+            treemap = make_treemap(items=treemap)
+            
         return treemap
         
     return None
 
-def save_to_pickle(treemap, filename):    
+def decode_word(obj):
     """
-    Save Treemap to the 'filename' in Pickle format.
-    
-    In:
-        treemap
-        filename
+    json object decoder callback. Decode Word from dict. Other dicts returned as is.
     """
-    create_storage(os.path.dirname(os.path.abspath(filename)))
-    
-    with open(filename, "wb") as f:
-        pickle.dump(treemap, f)
+    if "LabelName" in obj:
+        return word_codec.decode( tuple(obj.get(f, getattr(EMPTY_WORD, f)) for f in WORD_FIELDS) )
+        
+    return obj
 
-def load_from_pickle(filename):    
+class JSONStreamReader:
     """
-    Load Treemap from the file 'filename'. File must be in Pickle format.
+    Incremental reader of the JSON text. Text read from the file 'f' by chunks of 'buffer_size' chars.
+    Values decoded one by one, with json.JSONDecoder.raw_decode(), so in memory only the current value.
     
-    In:
-        filename
-    Out:
-        sorteddict
-    """
-    with open(filename, "rb") as f:
-        obj = pickle.load(f, encoding="UTF-8")
-        return obj
-
-    return None
-
-def is_english(s):
+    Usage:
+        reader = JSONStreamReader(f)
+        reader.expect("{")
+        key = reader.decode()
     """
-    Check word for all chars is English.
+    WS = re.compile(r'[ \t\n\r]*')
     
-    In:
-        s - string
-    Out:
-        True | False
-    """
-    try:
-        s.encode(encoding='utf-8').decode('ascii')
-    except UnicodeDecodeError:
-        return False
-    else:
-        return True
-
-
-class Wikidict:
-    """
-    This is the main class.
-        # 1) Wiktionary Loader from dump : download the file source with HTTP (This module have one parameter : Language code)
-        # 2) Load into memory (TreeMap): parse the source file 
-        # 3) Export to 9 text file JSON UTF-8
-        # 4) Load from JSON text file into TreeMap
-        # 5) Save to disk (Pickle)
-        # 6) Load from disk (Pickle)
-    """
-    def __init__(self):
-        self.limit = 0 # all
-        self.treemap = sorteddict()
-        self.is_need_save_txt = False
-        
-    def download(self, lang="en", use_cached=True):
+    def __init__(self, f, buffer_size=JSON_BUFFER_SIZE):
+        self.f = f
+        self.buffer_size = buffer_size
+        self.buf = ""
+        self.pos = 0
+        self.ws = ""
+        self.decoder = json.JSONDecoder()
+        
+    def fill(self):
         """
-        Download file from HTTPS.
+        Read next chunk into buffer. Consumed text dropped.
         
-        In:
-            lang       - Language code string, like a: en, de, fr
-            use_cached - True if need use cached_file. False for force run downloading.
         Out:
-            local_file - local cached file name
+            False on end of file
         """
-        remote_file = "https://dumps.wikimedia.org/"+lang+"wiktionary/latest/"+lang+"wiktionary-latest-pages-articles.xml.bz2"
+        chunk = self.f.read(self.buffer_size)
         
-        create_storage(CACHE_FOLDER)
-        local_file = os.path.join(CACHE_FOLDER, lang+"wiktionary-latest-pages-articles.xml.bz2")
-
-        # check cache
-        if use_cached and os.path.exists(local_file):
-            return local_file
-
-        # download
-        import requests
-        import shutil
-                
-        r = requests.get(remote_file, auth=('usrname', 'password'), verify=False,stream=True)
-        r.raw.decode_content = True
+        if not chunk:
+            return False
+            
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
         
-        log.info("Downloading....")
-        with open(local_file, 'wb') as f:
-            shutil.copyfileobj(r.raw, f)  
-        log.info("Downloaded....[ OK ]")
+    def peek(self):
+        """
+        Skip whitespaces. Return next char. Skipped whitespaces in the self.ws
+        """
+        while True:
+            end = self.WS.match(self.buf, self.pos).end()
+            
+            if end < len(self.buf):
+                self.ws = self.buf[self.pos : end]
+                self.pos = end
+                return self.buf[end]
+                
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON")
+                
+    def expect(self, c):
+        """
+        Skip whitespaces and char 'c'.
+        """
+        if self.peek() != c:
+            raise ValueError("'%s' expected, got: %r" % (c, self.buf[self.pos : self.pos + 20]))
+            
+        self.pos += 1
         
-        return local_file
-    
-    def parse_dump(self, dump_file):
+    def decode(self, decoder=None):
         """
-        Parse 'dump_file'.
-        Here:
-        - unzip bz2 file
-        - parse xml
-        - extract <page>
-        - extract <label>, <text>
-        - parse text
-        - create Word
-        - fill Word with data
+        Decode next value with 'decoder'. None for plain json.JSONDecoder.
+        """
+        decoder = decoder or self.decoder
+        self.peek()
         
-        Extracted words saved in sorteddict self.treemap.
-        Can limit of words extraction by call set_limit(N), Like a set_limit(100).
+        while True:
+            try:
+                (obj, end) = decoder.raw_decode(self.buf, self.pos)
+                
+                if end < len(self.buf):
+                    # value can be truncated by the buffer end, like a number: 12|3
+                    self.pos = end
+                    return obj
+                    
+            except json.JSONDecodeError:
+                pass
+                
+            if not self.fill():
+                (obj, self.pos) = decoder.raw_decode(self.buf, self.pos)
+                return obj
+                
+    def skip(self, indent=None):
+        """
+        Skip next value, without decoding, if can.
+        For the file written with indents, value of the top level object ends with line '<indent>]' | '<indent>}'.
+        Other values skipped by plain decoder: without object_hook and Word objects.
         
         In:
-            dump_file - string contans local file name, like a "./ru/ruwiktionary-latest-pages-articles.xml.bz2"
-        Out:
-            treemap - sorteddict with words, like a: {'chat': [Word, Word, Word]}
+            indent - indent of the top level keys, like a: "    ". None for file without indents.
         """
-        # dump_file = "./ru/ruwiktionary-latest-pages-articles.xml.bz2"
-        self.text_parser = TextParser()
-        self.text_parser.is_need_save_txt = self.is_need_save_txt
-        self.count = 0
-        self.treemap = sorteddict()
+        c = self.peek()
         
-        def callback(label, text):
-            # keep english words only
-            if not is_english(label):
-                #put_contents(os.path.join(TXT_FOLDER, sanitize_filename("non_english-"+label)+".txt"), text)
-                log_non_english.warning("%s: non english chars ... [SKIP]", label.ljust(WORD_JUST))
-                return
+        if indent is None or c not in "[{":
+            self.decode()
+            return
             
-            # main step
-            words = self.text_parser.parse(label, text)
-            self.treemap[label] = words
+        end_line = "\n" + indent + ("]" if c == "[" else "}")
+        
+        while True:
+            if self.buf.startswith("\n", self.pos + 1):
+                end = self.buf.find(end_line, self.pos)
+                
+                if end != -1:
+                    self.pos = end + len(end_line)
+                    return
+                    
+            elif self.pos + 1 < len(self.buf):
+                # one line value, like a: []
+                self.decode()
+                return
+                
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON")
+
+def iter_json(filename, labels=None, lo=None, hi=None, buffer_size=JSON_BUFFER_SIZE):
+    """
+    Generator. Load words from JSON-file 'filename' (see save_to_json()) one label at a time. 
+    File read incrementally, so in memory only current label. All layouts detected automatically.
+    Not requested labels skipped without decoding to Word.
+    
+    In:
+        filename    - JSON file
+        labels      - collection of requested labels | None for all
+        lo          - first label of the requested range | None
+        hi          - last label of the requested range | None. Labels in the file sorted, so reading stopped after 'hi'.
+        buffer_size - read buffer size, in chars
+    Out:
+        (label, [Word, Word, Word])
+    """
+    if labels is not None:
+        labels = set(labels)
+        
+    with open(filename, "r", encoding="UTF-8") as f:
+        reader = JSONStreamReader(f, buffer_size)
+        reader.expect("{")
+        
+        if reader.peek() == "}":
+            return
+            
+        ws = reader.ws
+        label = reader.decode()
+        
+        if label == "@fields":
+            # packed | shared
+            reader.expect(":")
+            decode_words = get_word_codec(reader.decode()).decode_words_shared
+            reader.expect(",")
+            
+            if reader.decode() != "@words":
+                raise ValueError("%s: '@words' expected" % filename)
+                
+            reader.expect(":")
+            reader.expect("{")
+            
+            if reader.peek() == "}":
+                return
+                
+            label = reader.decode()
+            decoder = None
+            indent = None
+            
+        else:
+            decode_words = None
+            decoder = json.JSONDecoder(object_hook=decode_word)
+            indent = ws.rpartition("\n")[2] if "\n" in ws else None
+            
+        found = 0
+        
+        while True:
+            reader.expect(":")
+            
+            if hi is not None and label > hi:
+                return
+                
+            if (lo is not None and label < lo) or (labels is not None and label not in labels):
+                reader.skip(indent)
+                
+            else:
+                words = reader.decode(decoder)
+                
+                if decode_words:
+                    words = decode_words(words)
+                    
+                yield (label, words)
+                
+                found += 1
+                
+                if labels is not None and found == len(labels):
+                    return
+                    
+            if reader.peek() == "}":
+                return
+                
+            reader.expect(",")
+            label = reader.decode()
+
+class NDJSONWriter:
+    """
+    Streaming sink for words. Write one compact JSON line per label: ["label", [Word, Word]]
+    Words packed as list of field values (see WordCodec). First line is header with field names: {"@fields": [...]}
+    With 'shared', lists common for the words of the label saved once per line (see WordCodec.encode_words_shared()).
+    Lines written through the large buffer. Can compress on the fly.
+    
+    Usage:
+        with NDJSONWriter("result.ndjson.gz") as sink:
+            for (label, words) in wd.iter_words(dump_file):
+                sink.write(label, words)
+    """
+    def __init__(self, filename, compress=None, buffer_size=NDJSON_BUFFER_SIZE, shared=False):
+        """
+        In:
+            filename    - output file name
+            compress    - None | "gz" | "bz2". None for detect by file extension .gz | .bz2
+            buffer_size - write buffer size
+            shared      - True for save common lists once per label
+        """
+        create_storage(os.path.dirname(os.path.abspath(filename)))
+        
+        self.encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+        self.encode_words = word_codec.encode_words_shared if shared else word_codec.encode_words
+        self.count = 0
+        self.f = open_ndjson(filename, "w", compress, buffer_size)
+        self.f.write(self.encoder.encode({"@fields": word_codec.fields}))
+        self.f.write("\n")
+        
+    def write(self, label, words):
+        """
+        Write one line with 'label' and 'words'.
+        """
+        self.f.write(self.encoder.encode([label, self.encode_words(words)]))
+        self.f.write("\n")
+        self.count += 1
+        
+    def close(self):
+        self.f.close()
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.close()
+
+def open_ndjson(filename, mode="r", compress=None, buffer_size=NDJSON_BUFFER_SIZE):
+    """
+    Open NDJSON file 'filename' in text mode. Encoding UTF-8.
+    
+    In:
+        mode     - "r" | "w"
+        compress - None | "gz" | "bz2". None for detect by file extension .gz | .bz2
+    """
+    if compress is None:
+        if filename.endswith(".gz"):
+            compress = "gz"
+        elif filename.endswith(".bz2"):
+            compress = "bz2"
+    
+    if compress == "gz":
+        raw = gzip.open(filename, mode + "b", compresslevel=6)
+    elif compress == "bz2":
+        raw = bz2.BZ2File(filename, mode + "b")
+    else:
+        raw = open(filename, mode + "b", buffering=0)
+        
+    if mode == "w":
+        buffered = io.BufferedWriter(raw, buffer_size)
+    else:
+        buffered = io.BufferedReader(raw, buffer_size)
+        
+    return io.TextIOWrapper(buffered, encoding="UTF-8", newline="\n")
+
+def save_to_ndjson(items, filename, compress=None, shared=False):
+    """
+    Save 'items' in the file 'filename'. In NDJSON format: one line per label. Encoding UTF-8.
+    
+    In:
+        items    - iterable of (label, words), like a: treemap.items() | wd.iter_words(dump_file)
+        filename - output file name, like a: "result.ndjson" | "result.ndjson.gz"
+        compress - None | "gz" | "bz2". None for detect by file extension .gz | .bz2
+        shared   - True for save common lists once per label
+    Out:
+        count    - count of saved labels
+    """
+    with NDJSONWriter(filename, compress, shared=shared) as sink:
+        for (label, words) in items:
+            sink.write(label, words)
+            
+        return sink.count
+
+def iter_ndjson(filename, compress=None):
+    """
+    Generator. Load entries from NDJSON file 'filename' one at a time. Decode to class Word.
+    
+    Out:
+        (label, [Word, Word, Word])
+    """
+    decoder = json.JSONDecoder(object_hook=decode_word)
+    decode_words = None
+    
+    with open_ndjson(filename, "r", compress) as f:
+        for line in f:
+            if line.startswith('{"@fields"'):
+                # header
+                decoder = json.JSONDecoder()
+                decode_words = get_word_codec(decoder.decode(line)["@fields"]).decode_words_shared
+                
+            elif line.strip():
+                (label, words) = decoder.decode(line)
+                
+                if decode_words:
+                    words = decode_words(words)
+                    
+                yield (label, words)
+
+def get_partition_bounds(treemap, partitions=PARTITIONS, sample_size=PARTITION_SAMPLE_SIZE):
+    """
+    Split sorted labels of the 'treemap' into 'partitions' ranges of similar size in bytes.
+    Size estimated by the sample of 'sample_size' labels, encoded as in the packed layout.
+    
+    In:
+        treemap     - sorteddict with words
+        partitions  - count of partitions
+        sample_size - count of sampled labels
+    Out:
+        (labels, bounds) - sorted labels, and start positions of partitions in it: [0, 120, 245, ...]
+    """
+    labels = list(treemap.keys())
+    count = len(labels)
+    
+    if count == 0:
+        return (labels, [0])
+        
+    # sample sizes, in the sorted order
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    encode_words = word_codec.encode_words_shared
+    
+    positions = sorted( random.Random(count).sample(range(count), min(sample_size, count)) )
+    sizes = list(itertools.accumulate( len(encoder.encode(encode_words(treemap[labels[i]]))) + len(labels[i]) for i in positions ))
+    total = sizes[-1]
+    
+    # bound: first sampled label, where the accumulated size reach next 1/partitions of the total
+    bounds = [0]
+    
+    for k in range(1, partitions):
+        i = bisect.bisect_left(sizes, total * k / partitions)
+        
+        if i < len(positions) and positions[i] > bounds[-1]:
+            bounds.append(positions[i])
+            
+    return (labels, bounds)
+
+partition_source = None    # (treemap, labels) of the save_to_partitions(). Inherited by the forked writers
+
+
+def iter_partition(source):
+    """
+    Generator. Yield (label, words) of the partition 'source':
+        (start, end) - positions in the labels of the partition_source
+        spill file   - pickled (label, words), one after other. Removed after read.
+    """
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    break
+                    
+        os.remove(source)
+        return
+        
+    (treemap, labels) = partition_source
+    (start, end) = source
+    
+    for label in labels[start:end]:
+        yield (label, treemap[label])
+
+def save_partition(args):
+    """
+    Process pool job. Save one partition in the packed JSON file.
+    
+    In:
+        (filename, source, shared) - source: see iter_partition()
+    Out:
+        (filename, size)
+    """
+    (filename, source, shared) = args
+    save_to_json(iter_partition(source), filename, packed=True, shared=shared)
+    return (filename, os.path.getsize(filename))
+
+def load_partition(args):
+    """
+    Process pool job. Load one partition, only labels in the range [lo, hi].
+    
+    In:
+        (filename, lo, hi)
+    Out:
+        [ (label, words), ... ]
+    """
+    (filename, lo, hi) = args
+    return list(iter_json(filename, lo=lo, hi=hi))
+
+def map_jobs(fn, jobs, processes=None, context=None):
+    """
+    Run 'jobs' with 'fn' in the process pool. Results in the order of the jobs.
+    With 'processes' = 1 or one job run in the current process.
+    
+    In:
+        context - multiprocessing context, like a: multiprocessing.get_context("fork"). None for default
+    """
+    if processes == 1 or len(jobs) <= 1:
+        return [ fn(job) for job in jobs ]
+        
+    with concurrent.futures.ProcessPoolExecutor(processes, mp_context=context) as pool:
+        return list(pool.map(fn, jobs))
+
+def save_to_partitions(treemap, folder, partitions=PARTITIONS, processes=None, shared=True, sample_size=PARTITION_SAMPLE_SIZE, start_method=None):
+    """
+    Save 'treemap' in the folder 'folder', as 'partitions' JSON files with key ranges of similar size in bytes. 
+    Files written in parallel, by the process pool. Packed layout (see save_to_json()).
+    Forked writers get only the key range, and read words from the inherited treemap. 
+    Without fork, words of each partition passed through the spill file, one by one.
+    Manifest with the key range of each file saved atomically in the 'folder'/partitions.json:
+        {"partitions": [{"file": "part-000.json", "first": "a", "last": "cat", "count": 120, "size": 1048576}, ...]}
+    
+    In:
+        treemap     - sorteddict with words | iterable of (label, words), sorted by label
+        folder      - output folder
+        partitions  - count of files
+        processes   - count of writer processes. None for count of CPUs
+        shared      - True for the shared layout
+        sample_size - count of labels, sampled for choose partition bounds
+        start_method - start method of the writers: "fork" | "spawn" | "forkserver". None for "fork", if supported
+    Out:
+        manifest
+    """
+    global partition_source
+    
+    create_storage(folder)
+    
+    if not isinstance(treemap, Mapping):
+        treemap = make_treemap(items=treemap)
+    
+    (labels, bounds) = get_partition_bounds(treemap, partitions, sample_size)
+    bounds.append(len(labels))
+    
+    if start_method is None:
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        
+    # spill files needed only for the writers in other processes, without inherited treemap
+    inline = processes == 1 or len(bounds) <= 2
+    spill = start_method != "fork" and not inline
+    
+    jobs = []
+    manifest = { "partitions": [] }
+    
+    for k in range(len(bounds) - 1):
+        (start, end) = (bounds[k], bounds[k+1])
+        
+        if start == end:
+            continue
+        
+        name = "part-%03d.json" % k
+        filename = os.path.join(folder, name)
+        
+        if spill:
+            source = filename + ".spill"
+            
+            with open(source, "wb") as f:
+                for label in labels[start:end]:
+                    pickle.dump((label, treemap[label]), f, protocol=pickle.HIGHEST_PROTOCOL)
+        else:
+            source = (start, end)
+            
+        jobs.append( (filename, source, shared) )
+        manifest["partitions"].append( { "file": name, "first": labels[start], "last": labels[end-1], "count": end - start } )
+        
+    partition_source = (treemap, labels)
+    
+    try:
+        results = map_jobs(save_partition, jobs, processes, multiprocessing.get_context(start_method))
+    finally:
+        partition_source = None
+        
+    for (partition, (filename, size)) in zip(manifest["partitions"], results):
+        partition["size"] = size
+        
+    manifest_file = os.path.join(folder, PARTITIONS_MANIFEST)
+    put_contents(manifest_file + ".tmp", json.dumps(manifest, ensure_ascii=False, indent=4))
+    os.replace(manifest_file + ".tmp", manifest_file)
+    
+    return manifest
+
+def load_from_partitions(folder, lo=None, hi=None, processes=None):
+    """
+    Load words from the partitioned export (see save_to_partitions()). Partitions loaded in parallel, by the process pool.
+    With 'lo' / 'hi' opened only partitions, which cover the label range [lo, hi].
+    
+    In:
+        folder    - folder with partitions.json
+        lo        - first label of the range | None
+        hi        - last label of the range | None
+        processes - count of reader processes. None for count of CPUs
+    Out:
+        sorteddict
+    """
+    manifest = json.loads(get_contents(os.path.join(folder, PARTITIONS_MANIFEST)))
+    
+    jobs = [ 
+        (os.path.join(folder, partition["file"]), lo, hi) for partition in manifest["partitions"] 
+            if (lo is None or partition["last"] >= lo) and (hi is None or partition["first"] <= hi) 
+        ]
+    
+    treemap = make_treemap()
+    
+    for items in map_jobs(load_partition, jobs, processes):
+        treemap.update(items)
+        
+    return treemap
+
+def save_to_pickle(treemap, filename):    
+    """
+    Save Treemap to the 'filename' in Pickle format.
+    
+    In:
+        treemap
+        filename
+    """
+    create_storage(os.path.dirname(os.path.abspath(filename)))
+    
+    with open(filename, "wb") as f:
+        pickle.dump(treemap, f)
+
+def load_from_pickle(filename):    
+    """
+    Load Treemap from the file 'filename'. File must be in Pickle format.
+    
+    In:
+        filename
+    Out:
+        sorteddict
+    """
+    with open(filename, "rb") as f:
+        obj = pickle.load(f, encoding="UTF-8")
+        return obj
+
+    return None
+
+# SQLite tables
+#   words        - one row per Word, with scalar fields
+#   explanations - ExplainationExample
+#   translations - Translation_XX, with lang code
+#   alternatives, related, synonyms, conjugations - list fields
+#   male_variants, female_variants, ... - variants, which are lists, like a: PluralVariant of the {{en-noun}}.
+#                  Variant string saved in the column of the words
+# List items stored with position 'pos'. List fields, which are not None, marked in the bit mask words.lists
+SQLITE_WORD_COLUMNS = (
+    ("label", "LabelName"), ("lang", "LanguageCode"), ("type", "Type"), ("type_label", "TypeLabelName"),
+    ("is_male", "IsMaleVariant"), ("is_female", "IsFemaleVariant"), ("male", "MaleVariant"), ("female", "FemaleVariant"),
+    ("is_single", "IsSingleVariant"), ("is_plural", "IsPluralVariant"), ("single", "SingleVariant"), ("plural", "PluralVariant"),
+    ("is_verb_past", "IsVerbPast"), ("is_verb_present", "IsVerbPresent"), ("is_verb_futur", "IsVerbFutur"),
+)
+SQLITE_LIST_TABLES = (
+    ("alternatives", "AlternativeFormsOther"), ("related", "RelatedTerms"), ("synonyms", "Synonyms"), ("conjugations", "Conjugation"),
+    ("male_variants", "MaleVariant"), ("female_variants", "FemaleVariant"), ("single_variants", "SingleVariant"), ("plural_variants", "PluralVariant"),
+)
+SQLITE_LIST_FIELDS = ("ExplainationExample",) + tuple( f for (t, f) in SQLITE_LIST_TABLES ) + tuple( f for (l, f) in WORD_TRANSLATION_FIELDS )
+
+SQLITE_SCHEMA = """
+CREATE TABLE words (id INTEGER PRIMARY KEY, %s, lists INTEGER);
+CREATE TABLE explanations (word_id INTEGER, pos INTEGER, cln TEXT, raw TEXT, PRIMARY KEY (word_id, pos)) WITHOUT ROWID;
+CREATE TABLE translations (word_id INTEGER, lang TEXT, pos INTEGER, term TEXT, PRIMARY KEY (word_id, lang, pos)) WITHOUT ROWID;
+%s
+""" % (
+    ", ".join( c for (c, f) in SQLITE_WORD_COLUMNS ),
+    "\n".join( "CREATE TABLE %s (word_id INTEGER, pos INTEGER, term TEXT, PRIMARY KEY (word_id, pos)) WITHOUT ROWID;" % t for (t, f) in SQLITE_LIST_TABLES ),
+)
+
+# created after bulk load
+SQLITE_INDEXES = """
+CREATE INDEX words_label ON words (label);
+CREATE INDEX words_type ON words (type);
+CREATE INDEX translations_term ON translations (lang, term);
+CREATE INDEX related_term ON related (term);
+CREATE INDEX synonyms_term ON synonyms (term);
+CREATE INDEX conjugations_term ON conjugations (term);
+"""
+
+# bulk load: without journal and fsync. File written in the temporary file, so not corrupted on fail
+SQLITE_BULK_PRAGMAS = """
+PRAGMA journal_mode = OFF;
+PRAGMA synchronous = OFF;
+PRAGMA locking_mode = EXCLUSIVE;
+PRAGMA temp_store = MEMORY;
+PRAGMA cache_size = -262144;
+"""
+
+def save_to_sqlite(treemap, filename, batch_size=SQLITE_BATCH_SIZE):
+    """
+    Save 'treemap' in the SQLite database 'filename'. Word normalized to tables (see SQLITE_SCHEMA).
+    Rows inserted by executemany(), 'batch_size' words per transaction. Indexes created after insert.
+    
+    In:
+        treemap    - sorteddict with words | iterable of (label, words)
+        filename   - output file name
+        batch_size - count of words per transaction
+    Out:
+        count      - count of saved words
+    """
+    create_storage(os.path.dirname(os.path.abspath(filename)))
+    
+    tmp_file = filename + ".tmp"
+    
+    if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+        
+    items = treemap.items() if hasattr(treemap, "items") else treemap
+    
+    word_values = operator.attrgetter(*( f for (c, f) in SQLITE_WORD_COLUMNS ))
+    list_values = operator.attrgetter(*SQLITE_LIST_FIELDS)
+    
+    words_sql = "INSERT INTO words VALUES (?, %s, ?)" % ", ".join( "?" for c in SQLITE_WORD_COLUMNS )
+    explanations_sql = "INSERT INTO explanations VALUES (?, ?, ?, ?)"
+    translations_sql = "INSERT INTO translations VALUES (?, ?, ?, ?)"
+    lists_sql = [ "INSERT INTO %s VALUES (?, ?, ?)" % t for (t, f) in SQLITE_LIST_TABLES ]
+    variants_mask = sum( 1 << i for (i, f) in enumerate(SQLITE_LIST_FIELDS) if f.endswith("Variant") )
+    
+    conn = sqlite3.connect(tmp_file, isolation_level=None)
+    
+    try:
+        conn.executescript(SQLITE_BULK_PRAGMAS)
+        conn.executescript(SQLITE_SCHEMA)
+        
+        # batch rows
+        words = []
+        explanations = []
+        translations = []
+        lists = [ [] for t in SQLITE_LIST_TABLES ]
+        
+        def flush():
+            conn.execute("BEGIN")
+            conn.executemany(words_sql, words)
+            conn.executemany(explanations_sql, explanations)
+            conn.executemany(translations_sql, translations)
+            
+            for (sql, rows) in zip(lists_sql, lists):
+                conn.executemany(sql, rows)
+                rows.clear()
+                
+            conn.execute("COMMIT")
+            
+            words.clear()
+            explanations.clear()
+            translations.clear()
+            
+        count = 0
+        
+        for (label, label_words) in items:
+            for word in label_words:
+                count += 1
+                values = list_values(word)
+                mask = 0
+                
+                for (i, lst) in enumerate(values):
+                    if lst is not None and type(lst) is not str:
+                        mask |= 1 << i
+                        
+                row = word_values(word)
+                
+                if mask & variants_mask:
+                    # variant list in the list table, not in the column
+                    row = tuple( None if isinstance(value, list) else value for value in row )
+                    
+                words.append( (count,) + row + (mask,) )
+                
+                if values[0]:
+                    explanations.extend( (count, pos, expl["cln"], expl["raw"]) for (pos, expl) in enumerate(values[0]) )
+                    
+                for (rows, lst) in zip(lists, values[1 : 1 + len(lists)]):
+                    if lst and type(lst) is not str:
+                        rows.extend( (count, pos, term) for (pos, term) in enumerate(lst) )
+                        
+                for ((lang, f), lst) in zip(WORD_TRANSLATION_FIELDS, values[1 + len(lists):]):
+                    if lst:
+                        translations.extend( (count, lang, pos, term) for (pos, term) in enumerate(lst) )
+                        
+            if len(words) >= batch_size:
+                flush()
+                
+        if words:
+            flush()
+            
+        conn.executescript(SQLITE_INDEXES)
+        conn.execute("ANALYZE")
+        
+    except BaseException:
+        # failed. remove temporary file
+        conn.close()
+        os.remove(tmp_file)
+        raise
+        
+    finally:
+        conn.close()
+        
+    os.replace(tmp_file, filename)
+    
+    return count
+
+class SQLiteLoader:
+    """
+    Loader of Words from the SQLite database, saved by save_to_sqlite().
+    Queries are constant, so prepared once and reused from the statement cache of the connection.
+    
+    Usage:
+        with SQLiteLoader("test/data.sqlite") as db:
+            words = db.get("cat")
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.conn = sqlite3.connect("file:" + filename + "?mode=ro", uri=True)
+        
+        self.words_sql = "SELECT id, %s, lists FROM words WHERE label = ? ORDER BY id" % ", ".join( c for (c, f) in SQLITE_WORD_COLUMNS )
+        self.explanations_sql = "SELECT word_id, cln, raw FROM explanations WHERE word_id IN (SELECT id FROM words WHERE label = ?) ORDER BY word_id, pos"
+        self.translations_sql = "SELECT word_id, lang, term FROM translations WHERE word_id IN (SELECT id FROM words WHERE label = ?) ORDER BY word_id, lang, pos"
+        self.lists_sql = [ 
+            "SELECT word_id, term FROM %s WHERE word_id IN (SELECT id FROM words WHERE label = ?) ORDER BY word_id, pos" % t for (t, f) in SQLITE_LIST_TABLES 
+            ]
+        self.translation_fields = dict(WORD_TRANSLATION_FIELDS)
+        
+    def get(self, label, default=None):
+        """
+        Get words of the 'label'.
+        
+        Out:
+            [Word, Word] | default
+        """
+        execute = self.conn.execute
+        words = {}
+        
+        for row in execute(self.words_sql, (label,)):
+            word = Word()
+            
+            for ((c, f), value) in zip(SQLITE_WORD_COLUMNS, row[1:]):
+                if f.startswith("Is") and value is not None:
+                    value = bool(value)
+                    
+                setattr(word, f, value)
+                
+            # lists, which are not None
+            mask = row[-1]
+            
+            for (i, f) in enumerate(SQLITE_LIST_FIELDS):
+                if mask & (1 << i):
+                    setattr(word, f, [])
+                    
+                elif f in WORD_LIST_FIELDS:
+                    # None, not the default EMPTY
+                    setattr(word, f, None)
+                    
+            words[row[0]] = word
+            
+        if not words:
+            return default
+            
+        for (word_id, cln, raw) in execute(self.explanations_sql, (label,)):
+            words[word_id].ExplainationExample.append( {"cln": cln, "raw": raw} )
+            
+        for ((t, f), sql) in zip(SQLITE_LIST_TABLES, self.lists_sql):
+            for (word_id, term) in execute(sql, (label,)):
+                getattr(words[word_id], f).append(term)
+                
+        for (word_id, lang, term) in execute(self.translations_sql, (label,)):
+            getattr(words[word_id], self.translation_fields[lang]).append(term)
+            
+        for word in words.values():
+            for f in WORD_LIST_FIELDS:
+                if getattr(word, f) == []:
+                    setattr(word, f, EMPTY)
+                    
+        return list(words.values())
+        
+    def __getitem__(self, label):
+        words = self.get(label)
+        
+        if words is None:
+            raise KeyError(label)
+            
+        return words
+        
+    def __contains__(self, label):
+        return self.conn.execute("SELECT 1 FROM words WHERE label = ? LIMIT 1", (label,)).fetchone() is not None
+        
+    def close(self):
+        self.conn.close()
+        
+    def __enter__(self):
+        return self
+        
+    def __exit__(self, *args):
+        self.close()
+
+def is_english(s):
+    """
+    Check word for all chars is English.
+    
+    In:
+        s - string
+    Out:
+        True | False
+    """
+    try:
+        s.encode(encoding='utf-8').decode('ascii')
+    except UnicodeDecodeError:
+        return False
+    else:
+        return True
+
+
+class Wikidict:
+    """
+    This is the main class.
+        # 1) Wiktionary Loader from dump : download the file source with HTTP (This module have one parameter : Language code)
+        # 2) Load into memory (TreeMap): parse the source file 
+        # 3) Export to 9 text file JSON UTF-8
+        # 4) Load from JSON text file into TreeMap
+        # 5) Save to disk (Pickle)
+        # 6) Load from disk (Pickle)
+    """
+    def __init__(self):
+        self.limit = 0 # all
+        self.treemap_backend = None     # treemap backend: "dict" | "bisect" | "blist". None for default. See: treemaps.py
+        self.treemap = make_treemap(self.treemap_backend)
+        self.is_need_save_txt = False
+        self.checkpoint_file = None     # checkpoint file name. None for disable checkpoints
+        self.checkpoint_pages = 10000   # save checkpoint each N pages
+        self.checkpoint_seconds = None  # save checkpoint each N seconds
+        self.manifest_file = None       # manifest file name. None for disable reusing words of unchanged pages
+        self.manifest = None
+        self.reused = 0                 # count of pages with words from the manifest
+        self.reparsed = 0               # count of parsed pages
+        self.memory_budget = None       # bytes. Spill extracted words to temporary files, when reached. None for keep all in self.treemap
+        self.spill_folder = None        # folder for temporary files. None for system temp folder
+        self.sorter = None
+        self.indexes = []               # index builders, filled with extracted words. See: add_index()
+        self.bloom_error_rate = BLOOM_ERROR_RATE    # false positive rate of the self.bloom. None for disable
+        self.bloom = None               # BloomFilter of labels, built after parse_dump()
+        
+    def download(self, lang="en", use_cached=True):
+        """
+        Download file from HTTPS.
+        
+        In:
+            lang       - Language code string, like a: en, de, fr
+            use_cached - True if need use cached_file. False for force run downloading.
+        Out:
+            local_file - local cached file name
+        """
+        remote_file = "https://dumps.wikimedia.org/"+lang+"wiktionary/latest/"+lang+"wiktionary-latest-pages-articles.xml.bz2"
+        
+        create_storage(CACHE_FOLDER)
+        local_file = os.path.join(CACHE_FOLDER, lang+"wiktionary-latest-pages-articles.xml.bz2")
+
+        # check cache
+        if use_cached and os.path.exists(local_file):
+            return local_file
+
+        # download
+        import requests
+        import shutil
+                
+        r = requests.get(remote_file, auth=('usrname', 'password'), verify=False,stream=True)
+        r.raw.decode_content = True
+        
+        log.info("Downloading....")
+        with open(local_file, 'wb') as f:
+            shutil.copyfileobj(r.raw, f)  
+        log.info("Downloaded....[ OK ]")
+        
+        return local_file
+    
+    def parse_dump(self, dump_file):
+        """
+        Parse 'dump_file'.
+        Here:
+        - unzip bz2 file
+        - parse xml
+        - extract <page>
+        - extract <label>, <text>
+        - parse text
+        - create Word
+        - fill Word with data
+        
+        Extracted words saved in sorteddict self.treemap.
+        Can limit of words extraction by call set_limit(N), Like a set_limit(100).
+        Can save checkpoints and resume after crash by call set_checkpoint(filename).
+        Can reuse words of pages, unchanged from the previous run, by call set_manifest(filename).
+        Can limit memory by call set_memory_budget(bytes). Then words spilled to temporary files, 
+        self.treemap stay empty, and words available from self.items() only.
+        
+        In:
+            dump_file - string contans local file name, like a "./ru/ruwiktionary-latest-pages-articles.xml.bz2"
+        Out:
+            treemap - sorteddict with words, like a: {'chat': [Word, Word, Word]}
+                      In memory-budget mode: self.items()
+        """
+        # dump_file = "./ru/ruwiktionary-latest-pages-articles.xml.bz2"
+        self.text_parser = TextParser()
+        self.text_parser.is_need_save_txt = self.is_need_save_txt
+        self.count = 0
+        self.treemap = make_treemap(self.treemap_backend)
+        self.reused = 0
+        self.reparsed = 0
+        self.bloom = None
+        
+        if self.memory_budget:
+            self.sorter = SpillSorter(self.memory_budget, self.spill_folder)
+        else:
+            self.sorter = None
+        
+        parser = XMLParser()
+        offset = 0
+        
+        if self.manifest_file:
+            self.manifest = Manifest(self.manifest_file)
+            self.manifest.load()
+        else:
+            self.manifest = None
+        
+        if self.checkpoint_file:
+            checkpoint = Checkpoint(self.checkpoint_file, dump_file, self.checkpoint_pages, self.checkpoint_seconds)
+            offset = checkpoint.resume(self, parser)
+        else:
+            checkpoint = None
+        
+        def callback(label, text):
+            words = self.parse_page(label, text, parser.sha1)
+            
+            if words is None:
+                return
+                
+            self.add_words(label, words)
+
+            #
+            self.count += 1
+            
+            if self.count % 100 == 0:
+                log.info("%d", self.count)
+
+            if checkpoint:
+                checkpoint.add(label, words, parser.sha1)
+                checkpoint.check(self, parser)
+                
+            if self.limit and (self.count > self.limit):
+                raise IterStopException()
+
+        try: read_dump(dump_file, callback, parser=parser, offset=offset)
+        except IterStopException: stopped = True
+        else: stopped = False
+        
+        if checkpoint: 
+            checkpoint.remove()
+        
+        if self.manifest:
+            # run stopped by the set_limit() not replace the manifest of the full run
+            if not stopped:
+                self.manifest.save()
+                
+            log.info("Pages: reused: %d, reparsed: %d", self.reused, self.reparsed)
+            
+        if stopped:
+            return
+            
+        if self.sorter:
+            # labels not known before merge. Bloom filter built by dictionary.save_to_store(..., error_rate=self.bloom_error_rate)
+            return self.items()
+        
+        if self.bloom_error_rate:
+            self.bloom = BloomFilter.build(self.treemap.keys(), len(self.treemap), self.bloom_error_rate)
+        
+        return self.treemap
+        
+    def add_words(self, label, words):
+        """
+        Save extracted words. In self.treemap, or in the spill sorter in memory-budget mode.
+        Words added to the indexes too. See: add_index().
+        Bloom filter of the parse_dump() dropped, as not contain the new labels.
+        """
+        self.bloom = None
+        
+        if self.sorter:
+            self.sorter.add(label, words)
+        else:
+            self.treemap[label] = words
+            
+        for index in self.indexes:
+            index.add(label, words)
+            
+    def add_index(self, index):
+        """
+        Build 'index' in the same pass with the parse_dump(). Extracted words added to the 'index' with index.add(label, words).
+        Index saved after parse, like a: dictionary.save_to_store(wd.items(), filename, wd.indexes)
+        
+        In:
+            index - index builder, like a: dictionary.ReverseTranslationIndex()
+        """
+        self.indexes.append(index)
+            
+    def items(self):
+        """
+        Extracted words, sorted by label. For export: save_to_json(wd.items(), filename)
+        In memory-budget mode it is k-way merge of temporary files. Can be iterated once.
+        
+        Out:
+            iterable of (label, [Word, Word, Word])
+        """
+        if self.sorter:
+            return self.sorter.merge()
+            
+        return self.treemap.items()
+        
+    def set_memory_budget(self, memory_budget, spill_folder=None):
+        """
+        Limit memory for extracted words in the parse_dump(). When 'memory_budget' reached, 
+        words sorted and spilled to temporary file. Result available from the self.items().
+        
+        In:
+            memory_budget - bytes, like a: 1024**3. None for keep all words in self.treemap
+            spill_folder  - folder for temporary files. None for system temp folder
+        """
+        self.memory_budget = memory_budget
+        self.spill_folder = spill_folder
+        
+    def iter_words(self, dump_file, limit=None):
+        """
+        Generator. Parse 'dump_file' and yield extracted words page by page.
+        Words not saved in self.treemap, so memory use not depends on the dump size.
+        Stop iteration (break, close()) stops decompression and closes the dump file.
+        
+        In:
+            dump_file - string contans local file name, like a "./ru/ruwiktionary-latest-pages-articles.xml.bz2"
+            limit     - stop after 'limit' labels. None for all
+        Out:
+            (label, [Word, Word, Word])
+        """
+        self.text_parser = TextParser()
+        self.text_parser.is_need_save_txt = self.is_need_save_txt
+        self.manifest = None
+        self.reused = 0
+        self.reparsed = 0
+        
+        count = 0
+        pages = iter_dump(dump_file)
+        
+        try:
+            for (label, text) in pages:
+                words = self.parse_page(label, text)
+                
+                if words is None:
+                    continue
+                    
+                yield (label, words)
+                
+                count += 1
+                
+                if limit and count >= limit:
+                    break
+                    
+        finally:
+            pages.close()
 
-            #
+    def parse_page(self, label, text, sha1=""):
+        """
+        Parse one page of the dump. Used by parse_dump() and apply_incremental().
+        
+        In:
+            label - page <title>
+            text  - page <text>
+            sha1  - page <revision><sha1>
+        Out:
+            words - list of extracted words, like a: [Word, Word, Word] | None for skipped page
+        """
+        # keep english words only
+        if not is_english(label):
+            #put_contents(os.path.join(TXT_FOLDER, sanitize_filename("non_english-"+label)+".txt"), text)
+            log_non_english.warning("%s: non english chars ... [SKIP]", label.ljust(WORD_JUST))
+            return None
+        
+        # unchanged page
+        words = self.manifest.get(label, sha1) if self.manifest else None
+        
+        if words is not None:
+            self.reused += 1
+            
+        else:
+            # main step
+            words = self.text_parser.parse(label, text)
+            self.reparsed += 1
+            
+        if self.manifest:
+            self.manifest.add(label, sha1, words)
+            
+        return words
+        
+    def apply_incremental(self, dump_file, store_file=None, changelog_file=None):
+        """
+        Apply Wikimedia "adds-changes" incremental dump 'dump_file' to the existing dictionary.
+        Only pages from the 'dump_file' parsed. Their entries replaced in the dictionary. 
+        If the page have many revisions, the last one used.
+        Deleted pages not listed in the incremental dumps, so not removed.
+        
+        In:
+            dump_file      - incremental dump, like a: "cached/enwiktionary-20190101-pages-meta-hist-incr.xml.bz2"
+            store_file     - stored dictionary (Pickle). Loaded, updated and saved back. None for update self.treemap
+            changelog_file - change log, lines: <action> <revision_id> <label>. Default: <store_file>.changelog
+        Out:
+            treemap - updated sorteddict with words
+        """
+        self.text_parser = TextParser()
+        self.text_parser.is_need_save_txt = self.is_need_save_txt
+        self.manifest = None
+        self.reused = 0
+        self.reparsed = 0
+        # not contain the added labels. Built again by dictionary.save_to_store()
+        self.bloom = None
+        
+        if store_file:
+            self.treemap = load_from_pickle(store_file)
+            
+        if changelog_file is None and store_file:
+            changelog_file = store_file + ".changelog"
+        
+        parser = XMLParser()
+        changes = []
+        
+        def callback(label, text):
+            words = self.parse_page(label, text)
+            
+            if words is None:
+                return
+                
+            action = "changed" if label in self.treemap else "added"
+            self.treemap[label] = words
+            changes.append( (action, parser.revision_id, label) )
+            
+        read_dump(dump_file, callback, parser=parser)
+        
+        # save
+        if store_file:
+            tmp_file = store_file + ".tmp"
+            save_to_pickle(self.treemap, tmp_file)
+            os.replace(tmp_file, store_file)
+            
+        if changelog_file:
+            with open(changelog_file, "a", encoding="UTF-8") as f:
+                f.write("# " + os.path.basename(dump_file) + "\n")
+                
+                for change in changes:
+                    f.write(" ".join(change) + "\n")
+                    
+        log.info("Incremental: %s: changed: %d, added: %d", dump_file, 
+            len([c for c in changes if c[0] == "changed"]), len([c for c in changes if c[0] == "added"]))
+            
+        return self.treemap
+        
+    def set_limit(self, n):
+        """
+        Set limit on word extraction, 'n' words only.
+        """
+        self.limit = n
+        
+    def set_checkpoint(self, checkpoint_file, pages=10000, seconds=None):
+        """
+        Enable checkpoints in the parse_dump(). 
+        Checkpoint saved each 'pages' pages or each 'seconds' seconds. Extracted words saved 
+        in the append-only spill file <checkpoint_file>.spill.
+        If parse_dump() killed, next call parse_dump() continue from the last checkpoint.
+        
+        In:
+            checkpoint_file - checkpoint file name, like a: "cached/enwiktionary.checkpoint". None for disable.
+            pages           - save checkpoint each N pages. None for disable.
+            seconds         - save checkpoint each N seconds. None for disable.
+        """
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_pages = pages
+        self.checkpoint_seconds = seconds
+        
+    def set_manifest(self, manifest_file):
+        """
+        Enable reusing words of unchanged pages in the parse_dump(). 
+        Manifest keep the <sha1> of the page revision and extracted words. If the page <sha1> 
+        equal to the manifest <sha1> from the previous run, words taken from the manifest without parsing.
+        Manifest rewritten after each parse_dump().
+        
+        In:
+            manifest_file - manifest file name, like a: "cached/enwiktionary.manifest". None for disable.
+        """
+        self.manifest_file = manifest_file
+        
+    def set_bloom_error_rate(self, error_rate):
+        """
+        Set false positive rate of the bloom filter of labels, built after parse_dump() in the self.bloom.
+        
+        In:
+            error_rate - like a: 0.01. None for disable
+        """
+        self.bloom_error_rate = error_rate
+        
+    def get_all_dump_sections(self, dump_file):
+        """
+        Debugging function for extract all section names, like ==English==, ==Middle English==, ...
+        """
+        # dump_file = "./ru/ruwiktionary-latest-pages-articles.xml.bz2"
+        self.text_parser = SectionExtractor()        
+        self.count = 0
+        
+        def callback(label, text):
+            words = self.text_parser.parse(label, text)
+            
             self.count += 1
             
-            if self.count % 100 == 0:
+            if self.count % 1000 == 0:
                 log.info("%d", self.count)
 
-            if self.limit and (self.count > self.limit):
+            if self.limit and self.count > self.limit:
+                with open("sections.txt", "w", encoding="UTF-8") as f:
+                    for x in self.text_parser.sections.keys():
+                        f.write(x+"\n")
                 raise IterStopException()
 
-        try: read_dump(dump_file, callback)
-        except IterStopException: return
+        try: read_dump(local_file, callback)
+        except IterStopException: return self.text_parser.sections.keys()
         
-        return self.treemap
+        return self.text_parser.sections.keys()
+
+
+class Checkpoint:
+    """
+    Checkpoint for the Wikidict.parse_dump(). For resume long parsing after crash.
+    
+    Files:
+        <checkpoint_file>       - JSON: position in the dump. Written atomically
+        <checkpoint_file>.spill - append-only file with pickled (label, words, sha1)
+        
+    Position is the compressed offset of the bz2 stream and the count of pages.
+    On resume, reading starts from the bz2 stream, already parsed pages skipped.
+    For multistream dumps (*-pages-articles-multistream.xml.bz2) it seek near the checkpoint,
+    for single stream dumps it re-read xml from the begin, but not parse pages again.
+    """
+    def __init__(self, checkpoint_file, dump_file, pages=10000, seconds=None):
+        self.checkpoint_file = checkpoint_file
+        self.spill_file = checkpoint_file + ".spill"
+        self.dump_file = dump_file
+        self.pages = pages
+        self.seconds = seconds
+        self.unsaved = []
+        self.last_pages = 0
+        self.last_time = time.monotonic()
+        
+    def get_dump_id(self):
+        """
+        Dump identity. For detect changed dump.
+        """
+        st = os.stat(self.dump_file)
+        return [os.path.abspath(self.dump_file), st.st_size, int(st.st_mtime)]
         
-    def set_limit(self, n):
+    def resume(self, wd, parser):
+        """
+        Load last checkpoint, if exists. Fill 'wd.treemap' from the spill file, setup 'parser' for skip parsed pages.
+        
+        Out:
+            offset - compressed offset for read_dump()
+        """
+        create_storage(os.path.dirname(os.path.abspath(self.checkpoint_file)))
+        
+        state = None
+        
+        if os.path.exists(self.checkpoint_file) and os.path.exists(self.spill_file):
+            with open(self.checkpoint_file, "r", encoding="UTF-8") as f:
+                state = json.load(f)
+                
+            if state["dump"] != self.get_dump_id():
+                log.warning("Checkpoint: %s: other dump ... [SKIP]", self.checkpoint_file)
+                state = None
+        
+        if state is None:
+            # start new
+            with open(self.spill_file, "wb"):
+                pass
+                
+            return 0
+            
+        # drop tail after last checkpoint
+        with open(self.spill_file, "r+b") as f:
+            f.truncate(state["spill_size"])
+            
+        # load words
+        with open(self.spill_file, "rb") as f:
+            while True:
+                try: (label, words, sha1) = pickle.load(f)
+                except EOFError: break
+                
+                wd.add_words(label, words)
+                
+                if wd.manifest:
+                    wd.manifest.add(label, sha1, words)
+        
+        wd.count = state["count"]
+        parser.pages = state["stream_pages"]
+        parser.skip = state["pages"]
+        self.last_pages = state["pages"]
+        
+        log.info("Checkpoint: resume from page %d, offset %d", state["pages"], state["offset"])
+        
+        return state["offset"]
+        
+    def add(self, label, words, sha1=""):
+        """
+        Add extracted words. Will be saved in the spill file on next checkpoint.
+        """
+        self.unsaved.append( (label, words, sha1) )
+        
+    def check(self, wd, parser):
+        """
+        Save checkpoint, if it time.
+        """
+        if self.pages and parser.pages - self.last_pages >= self.pages:
+            self.save(wd, parser)
+            
+        elif self.seconds and time.monotonic() - self.last_time >= self.seconds:
+            self.save(wd, parser)
+            
+    def save(self, wd, parser):
+        """
+        Append unsaved words to the spill file. Then write checkpoint atomically.
+        """
+        with open(self.spill_file, "ab") as f:
+            for item in self.unsaved:
+                pickle.dump(item, f)
+                
+            f.flush()
+            os.fsync(f.fileno())
+            spill_size = f.tell()
+            
+        state = {
+            "dump"         : self.get_dump_id(),
+            "pages"        : parser.pages,
+            "offset"       : parser.stream_offset,
+            "stream_pages" : parser.stream_pages,
+            "count"        : wd.count,
+            "spill_size"   : spill_size,
+        }
+        
+        tmp_file = self.checkpoint_file + ".tmp"
+        
+        with open(tmp_file, "w", encoding="UTF-8") as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+            
+        os.replace(tmp_file, self.checkpoint_file)
+        
+        self.unsaved = []
+        self.last_pages = parser.pages
+        self.last_time = time.monotonic()
+        
+        log.info("Checkpoint: page %d, offset %d", parser.pages, parser.stream_offset)
+        
+    def remove(self):
+        """
+        Remove checkpoint files. Parsing done.
+        """
+        for filename in (self.checkpoint_file, self.spill_file):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+
+class SpillSorter:
+    """
+    External merge sort of (key, value) with bounded memory.
+    
+    Items buffered in memory as pickled values. When 'memory_budget' reached, buffer sorted 
+    and spilled to the temporary run file. merge() does k-way merge of all runs.
+    If the key added many times, the last value kept, like a dict do.
+    """
+    ITEM_OVERHEAD = 100 # bytes per buffered item: tuple, key, bytes object
+    
+    def __init__(self, memory_budget, folder=None):
+        self.memory_budget = memory_budget
+        self.folder = folder
+        self.buffer = []
+        self.size = 0
+        self.seq = 0
+        self.runs = []
+        self.tmp_folder = None
+        
+    def add(self, key, value):
+        """
+        Add 'value' with 'key'.
+        """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.buffer.append( (key, self.seq, data) )
+        self.seq += 1
+        self.size += len(key) + len(data) + self.ITEM_OVERHEAD
+        
+        if self.size >= self.memory_budget:
+            self.spill()
+            
+    def spill(self):
+        """
+        Sort buffer and write it to the new run file.
+        """
+        if not self.buffer:
+            return
+            
+        if self.tmp_folder is None:
+            if self.folder:
+                create_storage(self.folder)
+            self.tmp_folder = tempfile.mkdtemp(prefix="wikidict-spill-", dir=self.folder)
+            
+        run_file = os.path.join(self.tmp_folder, "run-%d" % len(self.runs))
+        
+        self.buffer.sort()
+        
+        with open(run_file, "wb") as f:
+            for item in self.buffer:
+                pickle.dump(item, f, protocol=pickle.HIGHEST_PROTOCOL)
+                
+        self.runs.append(run_file)
+        self.buffer = []
+        self.size = 0
+        
+        log.debug("Spill: %s", run_file)
+        
+    def iter_run(self, run_file):
+        """
+        Generator. Read items of the run file.
+        """
+        with open(run_file, "rb") as f:
+            while True:
+                try: yield pickle.load(f)
+                except EOFError: break
+                
+    def merge(self):
+        """
+        Generator. k-way merge of all runs and the buffer. Temporary files removed after.
+        
+        Out:
+            (key, value), sorted by key
+        """
+        self.buffer.sort()
+        runs = [ self.iter_run(run_file) for run_file in self.runs ]
+        
+        try:
+            last = None
+            
+            for item in heapq.merge(*runs, self.buffer):
+                if last is not None and last[0] != item[0]:
+                    yield (last[0], pickle.loads(last[2]))
+                    
+                last = item # same key: last one wins
+                
+            if last is not None:
+                yield (last[0], pickle.loads(last[2]))
+                
+        finally:
+            for run in runs:
+                run.close()
+                
+            self.cleanup()
+            
+    def cleanup(self):
+        """
+        Remove temporary files.
+        """
+        for run_file in self.runs:
+            if os.path.exists(run_file):
+                os.remove(run_file)
+                
+        if self.tmp_folder and os.path.exists(self.tmp_folder):
+            os.rmdir(self.tmp_folder)
+            
+        self.runs = []
+        self.buffer = []
+        self.tmp_folder = None
+
+
+class Manifest:
+    """
+    Pages manifest for reuse words of unchanged pages across dump versions.
+    
+    Manifest file (Pickle) keep the dict: title -> (sha1, words). 
+    Loaded from the previous run, new manifest filled on current run, and saved on the place of old.
+    """
+    def __init__(self, manifest_file):
+        self.manifest_file = manifest_file
+        self.old = {}
+        self.new = {}
+        
+    def load(self):
+        """
+        Load manifest of the previous run, if exists.
+        """
+        if os.path.exists(self.manifest_file):
+            self.old = load_from_pickle(self.manifest_file)
+            
+    def get(self, title, sha1):
+        """
+        Get words of the page 'title', if the page <sha1> not changed.
+        
+        Out:
+            [Word, Word] | None
+        """
+        if not sha1:
+            return None
+            
+        entry = self.old.get(title)
+        
+        if entry is not None and entry[0] == sha1:
+            return entry[1]
+            
+        return None
+        
+    def add(self, title, sha1, words):
+        """
+        Add page into new manifest.
+        """
+        if sha1:
+            self.new[title] = (sha1, words)
+            
+    def save(self):
+        """
+        Save new manifest. Atomically.
+        """
+        tmp_file = self.manifest_file + ".tmp"
+        save_to_pickle(self.new, tmp_file)
+        os.replace(tmp_file, self.manifest_file)
+
+
+class BloomFilter:
+    """
+    Bloom filter of labels. For fast check, that label not exists, without the treemap or store lookup.
+    'label in bloom' is False - label not exists, True - label exists with the probability 1 - error_rate.
+    Bit positions by double hashing of the blake2b digest, stable across processes.
+    Saved file opened through the mmap.
+    
+    Usage:
+        bloom = BloomFilter.build(labels, len(labels), 0.01)
+        "cat" in bloom
+        bloom.save("test/data.store.bloom")
+        bloom = BloomFilter.load("test/data.store.bloom")
+    """
+    def __init__(self, count, error_rate=BLOOM_ERROR_RATE):
+        """
+        In:
+            count      - expected count of labels
+            error_rate - false positive rate, like a: 0.01
+        """
+        count = max(count, 1)
+        self.size = max(8, int(math.ceil(-count * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / count * math.log(2))))
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+        self.mm = None
+        # lookup counters, updated by the reader. See: dictionary.Dictionary.find()
+        self.hits = 0               # label in filter, and exists
+        self.misses = 0             # label not in filter
+        self.false_positives = 0    # label in filter, but not exists
+        
+    @classmethod
+    def build(cls, labels, count, error_rate=BLOOM_ERROR_RATE):
+        """
+        Create filter with 'labels'.
+        
+        In:
+            labels     - iterable of labels
+            count      - count of labels
+            error_rate - false positive rate
+        """
+        bloom = cls(count, error_rate)
+        
+        for label in labels:
+            bloom.add(label)
+            
+        return bloom
+        
+    def positions(self, label):
+        """
+        Generator. Yield bit positions of the 'label'.
+        """
+        digest = int.from_bytes(hashlib.blake2b(label.encode("UTF-8"), digest_size=16).digest(), "little")
+        h1 = digest & 0xFFFFFFFFFFFFFFFF
+        h2 = (digest >> 64) | 1
+        size = self.size
+        
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % size
+            
+    def add(self, label):
+        bits = self.bits
+        
+        for pos in self.positions(label):
+            bits[pos >> 3] |= 1 << (pos & 7)
+            
+        self.count += 1
+        
+    def __contains__(self, label):
+        bits = self.bits
+        
+        for pos in self.positions(label):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+                
+        return True
+        
+    def get_stats(self):
+        """
+        Get lookup counters and observed false positive rate.
+        """
+        negatives = self.misses + self.false_positives
+        
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "false_positives": self.false_positives,
+            "false_positive_rate": self.false_positives / negatives if negatives else 0.0,
+        }
+        
+    def save(self, filename):
         """
-        Set limit on word extraction, 'n' words only.
+        Save filter. Atomically.
         """
-        self.limit = n
+        tmp_file = "%s.%d.tmp" % (filename, os.getpid())
         
-    def get_all_dump_sections(self, dump_file):
+        with open(tmp_file, "wb") as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, 1, self.hashes, self.size, self.count))
+            f.write(self.bits)
+            
+        os.replace(tmp_file, filename)
+        
+    @classmethod
+    def load(cls, filename):
         """
-        Debugging function for extract all section names, like ==English==, ==Middle English==, ...
+        Open saved filter through the mmap. Close with close().
         """
-        # dump_file = "./ru/ruwiktionary-latest-pages-articles.xml.bz2"
-        self.text_parser = SectionExtractor()        
-        self.count = 0
+        bloom = cls(0)
         
-        def callback(label, text):
-            words = self.text_parser.parse(label, text)
+        with open(filename, "rb") as f:
+            bloom.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
             
-            self.count += 1
+        (magic, version, bloom.hashes, bloom.size, bloom.count) = BLOOM_HEADER.unpack_from(bloom.mm, 0)
+        
+        if magic != BLOOM_MAGIC or version != 1:
+            bloom.mm.close()
+            raise ValueError("%s: unsupported file format" % filename)
             
-            if self.count % 1000 == 0:
-                log.info("%d", self.count)
-
-            if self.limit and self.count > self.limit:
-                with open("sections.txt", "w", encoding="UTF-8") as f:
-                    for x in self.text_parser.sections.keys():
-                        f.write(x+"\n")
-                raise IterStopException()
-
-        try: read_dump(local_file, callback)
-        except IterStopException: return self.text_parser.sections.keys()
+        bloom.bits = memoryview(bloom.mm)[BLOOM_HEADER.size : BLOOM_HEADER.size + (bloom.size + 7) // 8]
         
-        return self.text_parser.sections.keys()
+        return bloom
+        
+    def close(self):
+        if self.mm is not None:
+            self.bits.release()
+            self.mm.close()
+            self.mm = None
 
 
 class SectionExtractor:
@@ -459,27 +2346,245 @@ class SectionExtractor:
             self.sections[section.title] = 1
             
 
-def read_dump(dump_file, text_callback):
+def read_dump(dump_file, text_callback, buffer_size=DUMP_BUFFER_SIZE, queue_size=DUMP_QUEUE_SIZE, threaded=True, parser=None, offset=0):
     """
     Read .bz2 file 'dump_file', parse xml, call 'text_callback' on each <page> tag.
     Callback format: text_callback(label, text)
+    
+    Decompression runs in the background thread (DumpDecompressor), so it overlaps
+    with xml parsing and page processing. bz2 releases the GIL while decompressing.
+    
+    In:
+        dump_file     - string contans local file name
+        text_callback - function like a: text_callback(label, text)
+        buffer_size   - size of decompressed chunk, fed to the xml parser
+        queue_size    - max count of decompressed chunks, waiting for the xml parser
+        threaded      - False for decompress in the current thread. (For benchmark)
+        parser        - XMLParser. For track position: parser.pages, parser.stream_offset
+        offset        - start reading from the bz2 stream at this compressed offset. (Multistream dumps)
+    """
+    parser = parser or XMLParser()
+    parser.stream_offset = offset
+    parser.stream_pages = parser.pages
+    
+    chunks = iter_dump_chunks(dump_file, buffer_size, queue_size, threaded, offset)
+    
+    try: parser.parse_chunks(chunks, text_callback)
+    finally: 
+        chunks.close()
+        parser.close(finish=False)
+
+
+def iter_dump(dump_file, buffer_size=DUMP_BUFFER_SIZE, queue_size=DUMP_QUEUE_SIZE, threaded=True):
+    """
+    Generator. Read .bz2 file 'dump_file', parse xml, yield each <page>.
+    Stop iteration (close()) stops decompression thread, closes file and xml parser.
+    
+    Out:
+        (label, text)
     """
-    stream = bz2.BZ2File(dump_file, "r")
     parser = XMLParser()
-    parser.parse(stream, text_callback)
-    stream.close()
+    pages = []
+    parser.page_callback = lambda label, text: pages.append( (label, text) )
+    
+    chunks = iter_dump_chunks(dump_file, buffer_size, queue_size, threaded)
+    
+    try:
+        for (offset, chunk) in chunks:
+            parser.feed(offset, chunk)
+            
+            if pages:
+                parsed = pages[:]
+                pages.clear()
+                yield from parsed
+                
+        parser.close()
+        yield from pages
+        
+    finally:
+        chunks.close()
+        parser.close(finish=False)
+
+
+def iter_dump_chunks(dump_file, buffer_size=DUMP_BUFFER_SIZE, queue_size=DUMP_QUEUE_SIZE, threaded=True, offset=0):
+    """
+    Generator. Yield decompressed chunks (stream_offset, chunk) of the .bz2 file 'dump_file'.
+    If 'threaded', decompression runs in the background thread (DumpDecompressor).
+    """
+    if offset:
+        # stream in the middle of the dump. add root tag
+        yield (offset, b"<mediawiki>")
+        
+    if threaded:
+        decompressor = DumpDecompressor(dump_file, buffer_size, queue_size, offset)
+        decompressor.start()
+        
+        try: yield from decompressor.chunks()
+        finally: decompressor.stop()
+        
+    else:
+        yield from iter_bz2_chunks(dump_file, buffer_size, offset)
+
+
+def iter_bz2_chunks(dump_file, buffer_size=DUMP_BUFFER_SIZE, offset=0):
+    """
+    Generator. Read .bz2 file 'dump_file' from the compressed 'offset', decompress it.
+    Support multistream files (concatenated bz2 streams), like a: *-pages-articles-multistream.xml.bz2
+    
+    Chunk never crosses the bz2 stream boundary, so each chunk has the compressed offset 
+    of the own bz2 stream. Reading can be continued from this offset.
+    
+    Out:
+        (stream_offset, chunk) - like a: (0, b"<mediawiki>...")
+    """
+    with open(dump_file, "rb") as f:
+        f.seek(offset)
+        
+        decompressor = bz2.BZ2Decompressor()
+        stream_offset = offset  # compressed offset of the current bz2 stream
+        pos = offset            # compressed offset of the 'data'
+        pending = []
+        pending_size = 0
+        streams = 0
+        
+        while True:
+            data = f.read(buffer_size)
+            
+            if not data:
+                break
+                
+            while data:
+                try:
+                    out = decompressor.decompress(data)
+                except OSError:
+                    if streams:
+                        # trailing data isn't a valid bz2 stream. ignore, like a bz2.BZ2File
+                        return
+                    raise
+                    
+                if out:
+                    pending.append(out)
+                    pending_size += len(out)
+                    
+                if decompressor.eof:
+                    # end of stream. flush
+                    if pending:
+                        yield (stream_offset, b"".join(pending))
+                        pending = []
+                        pending_size = 0
+                        
+                    unused = decompressor.unused_data
+                    pos += len(data) - len(unused)
+                    stream_offset = pos
+                    streams += 1
+                    data = unused
+                    decompressor = bz2.BZ2Decompressor()
+                    
+                else:
+                    pos += len(data)
+                    data = b""
+                    
+                if pending_size >= buffer_size:
+                    yield (stream_offset, b"".join(pending))
+                    pending = []
+                    pending_size = 0
+                    
+        if pending:
+            yield (stream_offset, b"".join(pending))
+            
+        if pos != stream_offset:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+
+
+class DumpDecompressor(threading.Thread):
+    """
+    Background thread. Read .bz2 file, decompress it and put decompressed chunks into the bounded queue.
+    Chunks are taken by the chunks() generator.
+    """
+    def __init__(self, dump_file, buffer_size=DUMP_BUFFER_SIZE, queue_size=DUMP_QUEUE_SIZE, offset=0):
+        super().__init__(name="DumpDecompressor", daemon=True)
+        self.dump_file = dump_file
+        self.buffer_size = buffer_size
+        self.offset = offset
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopped = threading.Event()
+        self.error = None
+        
+    def run(self):
+        chunks = iter_bz2_chunks(self.dump_file, self.buffer_size, self.offset)
+        
+        try:
+            for item in chunks:
+                if not self.put(item):
+                    break
+                    
+        except Exception as e:
+            self.error = e
+            
+        finally:
+            chunks.close()
+            self.put(None) # end marker
+            
+    def put(self, item):
+        """
+        Put 'item' into the queue. Wait while queue is full. Return False, if stopped.
+        """
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+                
+        return False
+        
+    def chunks(self):
+        """
+        Generator. Yield decompressed chunks (stream_offset, chunk), until end of file.
+        """
+        while True:
+            item = self.queue.get()
+            
+            if item is None:
+                break
+                
+            yield item
+            
+        if self.error is not None:
+            raise self.error
+            
+    def stop(self):
+        """
+        Stop the thread and wait for it.
+        """
+        self.stopped.set()
+        self.join()
 
 
 class XMLParser:
     """
     XML parser. Parser xml stream, find <page>, extract all subtags and data, and run callback.
+    
+    When callback called, the revision of the page available in the: 
+        self.revision_id - <revision><id>
+        self.sha1        - <revision><sha1>
     """
     def __init__(self):
         self.inpage = False
         self.intitle = False
         self.intext = False
+        self.inrevision = False
+        self.incontributor = False
+        self.inrevid = False
+        self.insha1 = False
         self.title = ""
         self.text = ""
+        self.revision_id = ""
+        self.sha1 = ""
+        self.pages = 0          # count of parsed <page>
+        self.skip = 0           # do not run callback for first 'skip' pages. (Resume)
+        self.stream_offset = 0  # compressed offset of the current bz2 stream
+        self.stream_pages = 0   # count of pages before the current bz2 stream
      
         ### BEGIN ###
         # Initializing xml parser
@@ -499,8 +2604,11 @@ class XMLParser:
                 self.inpage = True
                 self.intitle = False
                 self.intext = False
+                self.inrevision = False
                 self.text = ""
                 self.title = ""
+                self.revision_id = ""
+                self.sha1 = ""
                 
         elif self.inpage:
             if tag == "title":
@@ -511,6 +2619,21 @@ class XMLParser:
                 self.intext = True
                 self.text = ""
                 
+            elif tag == "revision":
+                self.inrevision = True
+                
+            elif self.inrevision:
+                if tag == "contributor":
+                    self.incontributor = True
+                    
+                elif tag == "id" and not self.incontributor:
+                    self.inrevid = True
+                    self.revision_id = ""
+                    
+                elif tag == "sha1":
+                    self.insha1 = True
+                    self.sha1 = ""
+                
     def data_handler(self, data):
         if self.inpage:
             if self.intitle:
@@ -518,18 +2641,39 @@ class XMLParser:
                 
             elif self.intext:
                 self.text += data
+                
+            elif self.inrevid:
+                self.revision_id += data
+                
+            elif self.insha1:
+                self.sha1 += data
 
     def end_tag(self, tag):
         if self.inpage:
             if tag == "page":
-                self.page_callback(self.title, self.text)
+                self.pages += 1
                 self.inpage = False
+                
+                if self.pages > self.skip:
+                    self.page_callback(self.title, self.text)
 
             elif tag == "title":
                 self.intitle = False
                 
             elif tag == "text":
                 self.intext = False
+                
+            elif tag == "revision":
+                self.inrevision = False
+                
+            elif tag == "contributor":
+                self.incontributor = False
+                
+            elif tag == "id":
+                self.inrevid = False
+                
+            elif tag == "sha1":
+                self.insha1 = False
 
     def parse(self, file_stream, page_callback):
         """
@@ -546,6 +2690,54 @@ class XMLParser:
         self.parser.ParseFile(file_stream)
         log.info("Done processing.")
 
+    def parse_chunks(self, chunks, page_callback):
+        """
+        Parse xml from the bytes chunks 'chunks', and run callback 'page_callback'
+        
+        In:
+            chunks        - iterable of (stream_offset, bytes), like a: [(0, b"<mediawiki>..."), (0, b"...</mediawiki>")]
+            page_callback - function like a: page_callback(label, text)
+            
+        """
+        self.page_callback = page_callback
+
+        log.info("Processing...")
+        for (offset, chunk) in chunks:
+            self.feed(offset, chunk)
+            
+        self.close()
+        log.info("Done processing.")
+        
+    def feed(self, offset, chunk):
+        """
+        Parse next bytes 'chunk' of the bz2 stream with compressed 'offset'. Run self.page_callback on each <page>.
+        """
+        if offset != self.stream_offset:
+            # next bz2 stream
+            self.stream_offset = offset
+            self.stream_pages = self.pages
+            
+        self.parser.Parse(chunk, False)
+        
+    def close(self, finish=True):
+        """
+        Close xml parser.
+        
+        In:
+            finish - True for check end of the xml document. False for stop parsing in the middle.
+        """
+        if self.parser is None:
+            return
+            
+        if finish:
+            self.parser.Parse(b"", True)
+            
+        # break reference cycle: parser -> handlers -> self
+        self.parser.StartElementHandler = None
+        self.parser.EndElementHandler = None
+        self.parser.CharacterDataHandler = None
+        self.parser = None
+
 
 def oneof(*args):
     it_was = False
@@ -810,7 +3002,7 @@ def get_synonyms(section):
 
     return bylang
     
-def get_conjugations(section):
+def get_conjugations(section, label):
     """
     ==English==
     ===Etymology 1===
@@ -821,7 +3013,8 @@ def get_conjugations(section):
     In: section Verb
     
     Out:
-        [ basic, simple_past, past_participle, present_participle, simple_present_third_person ]
+        [ basic, simple_past, past_participle, present_participle, simple_present_third_person ] - unique forms, in order
+        of the templates. Types of the forms: get_conjugation_types()
     """
     
     result = []
@@ -839,10 +3032,35 @@ def get_conjugations(section):
             result.append(past_participle)
 
     # unique
-    result = unique(result)
+    result = unique( form for form in result if form )
     
     return result if result else None
 
+def get_conjugation_types(label, form):
+    """
+    Get types of the conjugation 'form' of the verb 'label', by endings of the {{en-verb}} forms.
+    Past and past participle of regular verbs are the same, so typed both.
+    
+    In:
+        label - verb, like a: "walk"
+        form  - form from the get_conjugations(), like a: "walked"
+    Out:
+        (type, ...) - see CONJUGATION_FORMS, like a: ("past", "past participle"). () for the 'label'
+    """
+    if not form or form == label:
+        return ()
+    
+    if form.endswith("ing"):
+        return ("participle",)
+    
+    if form.endswith("s") and not form.endswith("ss"):
+        return ("present",)
+    
+    if form.endswith("en"):
+        return ("past participle",)
+    
+    return ("past", "past participle")
+
 def is_male_variant(section):
     # From {{inh|en|enm|cat}}, {{m|enm|catte}}, 
     # from {{inh|en|ang|catt||male cat}}, {{m|ang|catte||female cat}}, 
@@ -960,12 +3178,12 @@ def get_words(label, text):
             
             # type
             word.Type = WORD_TYPES().detect_type(section.title)
-            word.TypeLabelName = section.title
+            word.TypeLabelName = sys.intern(section.title)
             
             # explainations
             word.ExplainationExample = [
                     {"cln":cleanup(expl), "raw":expl} for expl in get_explainations(section)
-                ]
+                ] or EMPTY
         
             # alternatives
             # type alternatives
@@ -990,7 +3208,7 @@ def get_words(label, text):
             word.Synonyms = get_synonyms(section).get("en", None)
             
             # conjugations
-            word.Conjugation = get_conjugations(section)
+            word.Conjugation = get_conjugations(section, label)
             
             # male | female
             if is_male_variant(section):
@@ -1857,6 +4075,61 @@ def get_all_sections():
     for section in sections:
         print(section)
 
+def create_test_dump(dump_file, pages, pages_per_stream=None):
+    """
+    Create small .bz2 dump 'dump_file' with 'pages' in the Wikimedia xml format. For tests and benchmarks.
+    
+    In:
+        dump_file        - string, file name
+        pages            - list of (label, text)
+        pages_per_stream - create multistream dump, with N pages in each bz2 stream. None for single stream.
+    """
+    from xml.sax.saxutils import escape
+    import hashlib
+    import io
+    
+    create_storage(os.path.dirname(os.path.abspath(dump_file)))
+    
+    f = io.BytesIO()
+    streams = []
+    
+    def flush():
+        if f.tell():
+            streams.append(bz2.compress(f.getvalue()))
+            f.seek(0)
+            f.truncate()
+            
+    f.write(b"<mediawiki>\n  <siteinfo>\n    <sitename>Wiktionary</sitename>\n  </siteinfo>\n")
+    
+    for i, (label, text) in enumerate(pages):
+        if pages_per_stream and i % pages_per_stream == 0:
+            flush()
+            
+        sha1 = hashlib.sha1(text.encode("UTF-8")).hexdigest()
+        page = (
+            "  <page>\n"
+            "    <title>" + escape(label) + "</title>\n"
+            "    <ns>0</ns>\n"
+            "    <id>" + str(i + 1) + "</id>\n"
+            "    <revision>\n"
+            "      <id>" + str(i + 1000) + "</id>\n"
+            "      <text xml:space=\"preserve\">" + escape(text) + "</text>\n"
+            "      <sha1>" + sha1 + "</sha1>\n"
+            "    </revision>\n"
+            "  </page>\n"
+            )
+        f.write(page.encode("UTF-8"))
+        
+    if pages_per_stream:
+        flush()
+        
+    f.write(b"</mediawiki>\n")
+    flush()
+    
+    with open(dump_file, "wb") as dump:
+        for stream in streams:
+            dump.write(stream)
+
 
 ### Tests ###
 class TestStringMethods(unittest.TestCase):
@@ -1932,6 +4205,511 @@ class TestStringMethods(unittest.TestCase):
         
         self.assertTrue(self.found is not None)
 
+    #@unittest.skip("skip")
+    def test_read_dump(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        pages = [ ("word" + str(i), "text " * i) for i in range(300) ]
+        create_test_dump(dump_file, pages)
+        
+        for threaded in (True, False):
+            found = []
+            read_dump(dump_file, lambda label, text: found.append( (label, text) ), buffer_size=1024, queue_size=2, threaded=threaded)
+            self.assertTrue(found == pages)
+
+        # stop by exception
+        def callback(label, text):
+            raise IterStopException()
+            
+        with self.assertRaises(IterStopException):
+            read_dump(dump_file, callback, buffer_size=1024, queue_size=2)
+            
+        self.assertTrue(threading.active_count() == 1)
+        
+        # multistream
+        create_test_dump(dump_file, pages, pages_per_stream=100)
+        offsets = sorted(set( offset for (offset, chunk) in iter_bz2_chunks(dump_file, buffer_size=1024) ))
+        self.assertTrue(len(offsets) == 5) # header, 3 x 100 pages, footer
+        
+        found = []
+        parser = XMLParser()
+        parser.pages = 200
+        read_dump(dump_file, lambda label, text: found.append( (label, text) ), parser=parser, offset=offsets[3])
+        self.assertTrue(found == pages[200:])
+
+    #@unittest.skip("skip")
+    def test_iter_words(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        pages = [ ("word" + str(i), "==English==\n===Noun===\n# expl " + str(i)) for i in range(300) ]
+        create_test_dump(dump_file, pages)
+        
+        full = Wikidict().parse_dump(dump_file)
+        
+        wd = Wikidict()
+        found = [ (label, [ word_codec.encode(w) for w in words ]) for (label, words) in wd.iter_words(dump_file) ]
+        self.assertTrue(found == [ (label, [ word_codec.encode(w) for w in full[label] ]) for (label, text) in pages ])
+        self.assertTrue(len(wd.treemap) == 0)
+        
+        # limit
+        self.assertTrue(len(list(wd.iter_words(dump_file, limit=10))) == 10)
+        
+        # stop
+        for (label, words) in wd.iter_words(dump_file):
+            break
+            
+        it = wd.iter_words(dump_file)
+        next(it)
+        it.close()
+        self.assertTrue(threading.active_count() == 1)
+
+    #@unittest.skip("skip")
+    def test_ndjson(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        pages = [ ("word" + str(i), "==English==\n===Noun===\n# expl " + str(i)) for i in range(100) ]
+        create_test_dump(dump_file, pages)
+        
+        full = Wikidict().parse_dump(dump_file)
+        
+        for filename in ("test.ndjson", "test.ndjson.gz", "test.ndjson.bz2"):
+            filename = os.path.join(TEST_FOLDER, filename)
+            count = save_to_ndjson(Wikidict().iter_words(dump_file), filename)
+            self.assertTrue(count == 100)
+            
+            loaded = [ (label, [ word_codec.encode(w) for w in words ]) for (label, words) in iter_ndjson(filename) ]
+            self.assertTrue(loaded == [ (label, [ word_codec.encode(w) for w in full[label] ]) for (label, text) in pages ])
+
+    #@unittest.skip("skip")
+    def test_word_codec(self):
+        word = Word()
+        word.LabelName = "cat"
+        word.Type = WORD_TYPES.NOUN
+        word.ExplainationExample = [ {"cln": "animal", "raw": "[[animal]]"} ]
+        word.Translation_FR = ["chat"]
+        
+        values = word_codec.encode(word)
+        self.assertTrue(len(values) == len(WORD_FIELDS))
+        self.assertTrue(word_codec.decode(values) is not word and word_codec.encode(word_codec.decode(values)) == values)
+        
+        # compact
+        self.assertFalse(hasattr(word, "__dict__"))
+        self.assertTrue(Word().ExplainationExample is EMPTY and pickle.loads(pickle.dumps(Word())).AlternativeFormsOther is EMPTY)
+        self.assertTrue(word_codec.decode(values[:2] + ("".join(["no", "un"]),) + values[3:]).Type is WORD_TYPES.NOUN)
+        self.assertTrue(decode_word({"LabelName": "cat", "Unknown": 1}).ExplainationExample is EMPTY)
+        
+        with self.assertRaises(TypeError):
+            Word().ExplainationExample.append("a")
+        
+        # other schema
+        old_codec = WordCodec(WORD_FIELDS[:5])
+        self.assertTrue(old_codec.decode(values[:5]).Translation_FR is None)
+        self.assertTrue(get_word_codec(WORD_FIELDS[:5]) is get_word_codec(list(WORD_FIELDS[:5])))
+        self.assertTrue(pickle.loads(pickle.dumps(unpack_word(values[:5]))).LanguageCode == values[1])
+        
+        self.assertTrue(word_codec.encode(word_codec.decode(tuple(map(str, range(len(WORD_FIELDS)))))) == tuple(map(str, range(len(WORD_FIELDS)))))
+        self.assertTrue(word_codec.encode(WordCodec(reversed(WORD_FIELDS)).decode(values[::-1])) == values)
+        
+        with self.assertRaises(ValueError):
+            old_codec.decode(values[:4])
+            
+        # fields from the file checked, not executed
+        for fields in ( ["LabelName) = (values[0],)\n    __import__('os').system('echo PWNED')\n    (word.LanguageCode"], 
+                        ["LabelName", "LabelName"], ["__class__"], [1], [] ):
+            with self.assertRaises(ValueError):
+                get_word_codec(fields)
+                
+        with open("test/test-codec-fields.json", "w", encoding="UTF-8") as f:
+            json.dump({"@fields": ["LabelName", "__dict__"], "@words": {"cat": [["cat", {}]]}}, f)
+            
+        with self.assertRaises(ValueError):
+            load_from_json("test/test-codec-fields.json")
+            
+        # setter out of the WORD_FIELDS order
+        module = sys.modules[Word.__module__]
+        setter = set_word_values
+        
+        def swapped(word, values):
+            setter(word, (values[1], values[0]) + tuple(values[2:]))
+            
+        try:
+            check_set_word_values()
+            module.set_word_values = swapped
+            
+            with self.assertRaises(ValueError):
+                check_set_word_values()
+                
+        finally:
+            module.set_word_values = setter
+        
+        # pickle
+        self.assertTrue(word_codec.encode(pickle.loads(pickle.dumps(word))) == values)
+        
+        # pickled before __slots__: Word with __dict__ state
+        class OldWord:
+            def __init__(self, state):
+                self.__dict__.update(state)
+                
+        class OldSlotsWord:
+            def __init__(self, state):
+                self.state = state
+                
+            def __getstate__(self):
+                return (None, self.state)
+                
+        word_class = Word
+        module = sys.modules[Word.__module__]
+        state = dict(zip(WORD_FIELDS, values), Unknown=1)
+        
+        for old_class in (OldWord, OldSlotsWord):
+            old_class.__qualname__ = "Word"
+            module.Word = old_class
+            
+            try:
+                data = [ pickle.dumps([old_class(state), old_class({"LabelName": "cat"})], protocol=protocol) for protocol in range(0, pickle.HIGHEST_PROTOCOL + 1) ]
+            finally:
+                module.Word = word_class
+                
+            for dumped in data:
+                (loaded, short) = pickle.loads(dumped)
+                self.assertTrue(type(loaded) is Word and word_codec.encode(loaded) == values)
+                self.assertTrue(short.LabelName == "cat" and short.Translation_FR is None and short.ExplainationExample is EMPTY)
+        
+        # json
+        treemap = make_treemap()
+        treemap["cat"] = [word, word]
+        
+        for packed in (False, True):
+            save_to_json(treemap, "test/test-codec.json", packed=packed)
+            loaded = load_from_json("test/test-codec.json")
+            self.assertTrue([ word_codec.encode(w) for w in loaded["cat"] ] == [ values, values ])
+            self.assertTrue(type(loaded["cat"][0].ExplainationExample[0]) is dict)
+            
+    def test_shared_lists(self):
+        words = [ Word(), Word() ]
+        
+        for (word, type) in zip(words, (WORD_TYPES.NOUN, WORD_TYPES.VERB)):
+            word.LabelName = "cat"
+            word.Type = type
+            
+        words[0].Translation_FR = words[1].Translation_FR = ["chat"]
+        words[0].AlternativeFormsOther = words[1].AlternativeFormsOther = ["kat"]
+        words[1].Translation_DE = ["Katze"]
+        
+        encoded = word_codec.encode_words_shared(words)
+        self.assertTrue(encoded["@shared"] == [ ["kat"], ["chat"] ])
+        self.assertTrue(word_codec.encode_words_shared(words[:1]) == word_codec.encode_words(words[:1]))
+        
+        treemap = make_treemap(items={"cat": words, "dog": [Word()]})
+        save_to_json(treemap, "test/test-shared.json", shared=True)
+        save_to_ndjson(treemap.items(), "test/test-shared.ndjson", shared=True)
+        
+        for loaded in (load_from_json("test/test-shared.json"), dict(iter_ndjson("test/test-shared.ndjson"))):
+            self.assertTrue([ word_codec.encode(w) for w in loaded["cat"] ] == word_codec.encode_words(words))
+            self.assertTrue(loaded["cat"][0].Translation_FR is loaded["cat"][1].Translation_FR)
+            self.assertTrue(loaded["cat"][1].Translation_DE == ["Katze"])
+            self.assertTrue(len(loaded["dog"]) == 1)
+
+    #@unittest.skip("skip")
+    def test_iter_json(self):
+        treemap = make_treemap()
+        
+        for i in range(50):
+            word = Word()
+            word.LabelName = "word%02d" % i
+            word.ExplainationExample = [ {"cln": "expl", "raw": "expl ]\n\\\"} " * (i % 3)} ]
+            word.Translation_FR = [ "fr %d" % i ]
+            treemap[word.LabelName] = [word, word] if i % 2 else []
+            
+        expected = [ (label, word_codec.encode_words(words)) for (label, words) in treemap.items() ]
+        
+        for (packed, shared) in ((False, False), (True, False), (True, True)):
+            save_to_json(treemap, "test/test-iter.json", packed=packed, shared=shared)
+            
+            for buffer_size in (7, JSON_BUFFER_SIZE):
+                loaded = [ (label, word_codec.encode_words(words)) for (label, words) in iter_json("test/test-iter.json", buffer_size=buffer_size) ]
+                self.assertTrue(loaded == expected)
+                
+                loaded = [ label for (label, words) in iter_json("test/test-iter.json", labels=["word07", "word30", "cat"], buffer_size=buffer_size) ]
+                self.assertTrue(loaded == [ "word07", "word30" ])
+                
+                loaded = [ label for (label, words) in iter_json("test/test-iter.json", lo="word10", hi="word13", buffer_size=buffer_size) ]
+                self.assertTrue(loaded == [ "word10", "word11", "word12", "word13" ])
+                
+        save_to_json(make_treemap(), "test/test-iter.json")
+        self.assertTrue(list(iter_json("test/test-iter.json")) == [])
+
+    #@unittest.skip("skip")
+    def test_sqlite(self):
+        treemap = make_treemap()
+        
+        for i in range(30):
+            words = []
+            
+            for t in (WORD_TYPES.NOUN, WORD_TYPES.VERB)[: 1 + i % 2]:
+                word = Word()
+                word.LabelName = "word%02d" % i
+                word.LanguageCode = "en"
+                word.Type = t
+                word.ExplainationExample = [ {"cln": "expl %d" % i, "raw": "# expl %d" % i} ] if i % 3 else EMPTY
+                word.Translation_FR = [ "fr %d" % i, "fr2 %d" % i ]
+                word.Translation_DE = [] if i % 5 else None
+                word.Synonyms = [ "syn %d" % i ]
+                word.IsVerbPast = (t == WORD_TYPES.VERB)
+                word.MaleVariant = "male %d" % i if i % 4 == 0 else None
+                words.append(word)
+                
+            treemap[words[0].LabelName] = words
+            
+        # parsed words: PluralVariant of the {{en-noun}} is list
+        treemap["cat"] = get_words("cat", "==English==\n===Noun===\n{{en-noun}}\n# a small domestic animal\n")
+        self.assertTrue(treemap["cat"][0].PluralVariant == ["cats"])
+        
+        filename = os.path.join(TEST_FOLDER, "test.sqlite")
+        self.assertTrue(save_to_sqlite(treemap, filename, batch_size=7) == 46)
+        
+        with SQLiteLoader(filename) as db:
+            for (label, words) in treemap.items():
+                self.assertTrue([ word_codec.encode(w) for w in db[label] ] == word_codec.encode_words(words))
+                
+            self.assertTrue(db["word03"][0].ExplainationExample is EMPTY)
+            self.assertTrue(db["word04"][0].MaleVariant == "male 4" and db["cat"][0].PluralVariant == ["cats"])
+            self.assertTrue("word01" in db and "dog" not in db and db.get("dog") is None)
+            self.assertTrue(db.conn.execute("SELECT count(*) FROM translations WHERE lang = 'fr'").fetchone()[0] == 90)
+            self.assertTrue(db.conn.execute("SELECT count(*) FROM words WHERE type = ?", (WORD_TYPES.VERB,)).fetchone()[0] == 15)
+            
+        # failed insert: old database kept, temporary file removed
+        bad = Word()
+        bad.LabelName = {"not": "str"}
+        
+        with self.assertRaises(sqlite3.Error):
+            save_to_sqlite([ ("word00", treemap["word00"]), ("zzz", [bad]) ], filename, batch_size=1)
+            
+        self.assertFalse(os.path.exists(filename + ".tmp"))
+        
+        with SQLiteLoader(filename) as db:
+            self.assertTrue("word29" in db and "zzz" not in db)
+
+    #@unittest.skip("skip")
+    def test_partitions(self):
+        folder = os.path.join(TEST_FOLDER, "test-partitions")
+        treemap = make_treemap()
+        
+        for i in range(200):
+            word = Word()
+            word.LabelName = "word%03d" % i
+            word.ExplainationExample = [ {"cln": "expl", "raw": "expl " * (i % 10)} ]
+            treemap[word.LabelName] = [word]
+        
+        manifest = save_to_partitions(treemap, folder, partitions=4, processes=2)
+        partitions = manifest["partitions"]
+        self.assertTrue(len(partitions) == 4 and sum(p["count"] for p in partitions) == 200)
+        self.assertTrue(partitions[0]["first"] == "word000" and partitions[-1]["last"] == "word199")
+        self.assertTrue(all( a["last"] < b["first"] for (a, b) in zip(partitions, partitions[1:]) ))
+        self.assertTrue(max(p["size"] for p in partitions) < 2 * min(p["size"] for p in partitions))
+        
+        loaded = load_from_partitions(folder, processes=2)
+        self.assertTrue([ (label, word_codec.encode_words(words)) for (label, words) in loaded.items() ] == [ (label, word_codec.encode_words(words)) for (label, words) in treemap.items() ])
+        self.assertFalse(os.path.exists(os.path.join(folder, PARTITIONS_MANIFEST + ".tmp")))
+        
+        # writers without fork: words passed through spill files
+        spawned = save_to_partitions(treemap, folder, partitions=4, processes=2, start_method="spawn")
+        self.assertTrue(spawned == manifest)
+        self.assertFalse(any( name.endswith(".spill") for name in os.listdir(folder) ))
+        self.assertTrue(list(load_from_partitions(folder, processes=1).keys()) == list(treemap.keys()))
+        
+        # range: other partitions not opened
+        os.remove(os.path.join(folder, partitions[-1]["file"]))
+        loaded = load_from_partitions(folder, "word010", "word020", processes=1)
+        self.assertTrue(list(loaded.keys()) == [ "word%03d" % i for i in range(10, 21) ])
+
+    #@unittest.skip("skip")
+    def test_memory_budget(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        pages = [ ("word" + str(i % 250), "==English==\n===Noun===\n# expl " + str(i)) for i in range(300) ]
+        create_test_dump(dump_file, pages)
+        
+        # in memory
+        treemap = Wikidict().parse_dump(dump_file)
+        self.assertTrue(len(treemap) == 250)
+        
+        for packed in (False, True):
+            save_to_json(treemap, "test/test-memory.json", packed=packed)
+            
+            # json.dump() compatible
+            if not packed:
+                with open("test/test-memory2.json", "w", encoding="UTF-8") as f:
+                    json.dump(dict(treemap.items()), f, cls=WordsEncoder, sort_keys=False, indent=4, ensure_ascii=False)
+                self.assertTrue(get_contents("test/test-memory.json") == get_contents("test/test-memory2.json"))
+            
+            # budget
+            wd = Wikidict()
+            wd.set_memory_budget(4096, TEST_FOLDER)
+            wd.parse_dump(dump_file)
+            self.assertTrue(len(wd.treemap) == 0)
+            self.assertTrue(len(wd.sorter.runs) > 5)
+            
+            save_to_json(wd.items(), "test/test-memory2.json", packed=packed)
+            self.assertTrue(get_contents("test/test-memory.json") == get_contents("test/test-memory2.json"))
+            self.assertTrue(len(wd.sorter.runs) == 0)
+            
+        save_to_json(make_treemap(), "test/test-memory.json")
+        self.assertTrue(get_contents("test/test-memory.json") == "{}")
+
+    def test_conjugation_order(self):
+        root = wikoo.parse("{{en-verb}}\n{{en-conj|walk|walkt|walked|walking|walks}}\n")
+        self.assertTrue(get_conjugations(root, "walk") == [ "walks", "walking", "walked", "walk", "walkt" ])
+        self.assertTrue(get_conjugations(wikoo.parse("{{en-conj|do|did|done|doing|does}}"), "do") == [ "do", "did", "done", "doing", "does" ])
+        self.assertTrue(get_conjugations(wikoo.parse("{{other}}"), "walk") is None)
+        self.assertTrue([ get_conjugation_types("take", form) for form in [ "take", "takes", "taking", "took", "taken" ] ] == [ 
+            (), ("present",), ("participle",), ("past", "past participle"), ("past participle",) ])
+        self.assertTrue(unique([ "b", "a", "b", None, "c", "a" ]) == [ "b", "a", None, "c" ])
+        
+    def test_bloom(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        pages = [ ("word" + str(i), "==English==\n===Noun===\n# expl " + str(i)) for i in range(1000) ]
+        create_test_dump(dump_file, pages)
+        
+        wd = Wikidict()
+        wd.set_bloom_error_rate(0.01)
+        wd.parse_dump(dump_file)
+        self.assertTrue(wd.bloom.count == 1000)
+        self.assertTrue(all( label in wd.bloom for label in wd.treemap ))
+        
+        others = [ "other" + str(i) for i in range(10000) ]
+        false_positives = sum( label in wd.bloom for label in others )
+        self.assertTrue(false_positives < 300)
+        
+        filename = os.path.join(TEST_FOLDER, "test.bloom")
+        wd.bloom.save(filename)
+        bloom = BloomFilter.load(filename)
+        self.assertTrue((bloom.size, bloom.hashes, bloom.count) == (wd.bloom.size, wd.bloom.hashes, 1000))
+        self.assertTrue(all( label in bloom for label in wd.treemap ))
+        self.assertTrue(sum( label in bloom for label in others ) == false_positives)
+        bloom.close()
+        
+        # stale, after new labels
+        wd.add_words("extra", [])
+        self.assertTrue(wd.bloom is None)
+        
+        # disabled
+        wd.set_bloom_error_rate(None)
+        wd.parse_dump(dump_file)
+        self.assertTrue(wd.bloom is None)
+
+    #@unittest.skip("skip")
+    def test_checkpoint(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        checkpoint_file = os.path.join(TEST_FOLDER, "test-dump.checkpoint")
+        pages = [ ("word" + str(i), "==English==\n===Noun===\n# expl " + str(i)) for i in range(300) ]
+        create_test_dump(dump_file, pages, pages_per_stream=50)
+        
+        # full
+        wd = Wikidict()
+        full = wd.parse_dump(dump_file)
+        
+        # crash on page 175
+        class Crash(Exception):
+            pass
+            
+        parsed = []
+        parse = TextParser.parse
+        
+        def crashed_parse(self, label, text):
+            if len(parsed) == 175:
+                raise Crash()
+            parsed.append(label)
+            return parse(self, label, text)
+
+        TextParser.parse = crashed_parse
+        try:
+            wd = Wikidict()
+            wd.set_checkpoint(checkpoint_file, pages=20)
+            
+            with self.assertRaises(Crash):
+                wd.parse_dump(dump_file)
+                
+        finally:
+            TextParser.parse = parse
+            
+        self.assertTrue(os.path.exists(checkpoint_file))
+        
+        # resume
+        parsed = []
+        TextParser.parse = lambda self, label, text: parsed.append(label) or parse(self, label, text)
+        try:
+            wd = Wikidict()
+            wd.set_checkpoint(checkpoint_file, pages=20)
+            resumed = wd.parse_dump(dump_file)
+            
+        finally:
+            TextParser.parse = parse
+
+        self.assertTrue(parsed[0] == "word160")
+        self.assertTrue(list(resumed.keys()) == list(full.keys()))
+        self.assertTrue(all( [ word_codec.encode(w) for w in resumed[k] ] == [ word_codec.encode(w) for w in full[k] ] for k in full.keys() ))
+        self.assertFalse(os.path.exists(checkpoint_file))
+
+    #@unittest.skip("skip")
+    def test_manifest(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        manifest_file = os.path.join(TEST_FOLDER, "test-dump.manifest")
+        pages = [ ("word" + str(i), "==English==\n===Noun===\n# expl " + str(i)) for i in range(100) ]
+        create_test_dump(dump_file, pages)
+        
+        if os.path.exists(manifest_file):
+            os.remove(manifest_file)
+        
+        wd = Wikidict()
+        wd.set_manifest(manifest_file)
+        wd.parse_dump(dump_file)
+        self.assertTrue( (wd.reused, wd.reparsed) == (0, 100) )
+        
+        # limited run: manifest kept
+        wd = Wikidict()
+        wd.set_manifest(manifest_file)
+        wd.set_limit(10)
+        wd.parse_dump(dump_file)
+        self.assertTrue(len(load_from_pickle(manifest_file)) == 100)
+        
+        # next dump version
+        pages[5] = ("word5", "==English==\n===Verb===\n# changed")
+        create_test_dump(dump_file, pages)
+        
+        wd = Wikidict()
+        wd.set_manifest(manifest_file)
+        treemap = wd.parse_dump(dump_file)
+        self.assertTrue( (wd.reused, wd.reparsed) == (99, 1) )
+        
+        full = Wikidict().parse_dump(dump_file)
+        self.assertTrue(all( [ word_codec.encode(w) for w in treemap[k] ] == [ word_codec.encode(w) for w in full[k] ] for k in full.keys() ))
+
+    #@unittest.skip("skip")
+    def test_apply_incremental(self):
+        dump_file = os.path.join(TEST_FOLDER, "test-dump.xml.bz2")
+        incr_file = os.path.join(TEST_FOLDER, "test-dump-incr.xml.bz2")
+        store_file = os.path.join(TEST_FOLDER, "test-dump.pickled")
+        pages = [ ("word" + str(i), "==English==\n===Noun===\n# expl " + str(i)) for i in range(50) ]
+        create_test_dump(dump_file, pages)
+        
+        # yesterday
+        save_to_pickle(Wikidict().parse_dump(dump_file), store_file)
+        
+        if os.path.exists(store_file + ".changelog"):
+            os.remove(store_file + ".changelog")
+        
+        # today
+        changed = [ ("word7", "==English==\n===Verb===\n# changed"), ("new", "==English==\n===Noun===\n# new") ]
+        create_test_dump(incr_file, changed)
+        Wikidict().apply_incremental(incr_file, store_file)
+        
+        pages[7] = changed[0]
+        pages.append(changed[1])
+        create_test_dump(dump_file, pages)
+        full = Wikidict().parse_dump(dump_file)
+        
+        treemap = load_from_pickle(store_file)
+        self.assertTrue(list(treemap.keys()) == list(full.keys()))
+        self.assertTrue(all( [ word_codec.encode(w) for w in treemap[k] ] == [ word_codec.encode(w) for w in full[k] ] for k in full.keys() ))
+        self.assertTrue(get_contents(store_file + ".changelog").split("\n")[1:3] == ["changed 1000 word7", "added 1001 new"])
+
     #@unittest.skip("skip")
     def test_get_related(self):
         text = get_contents("./test/horse.txt")
@@ -2254,7 +5032,7 @@ class TestStringMethods(unittest.TestCase):
         text = get_contents("./test/horse.txt")
         
         # treemap
-        treemap = sorteddict()
+        treemap = make_treemap()
         treemap[label] = text_parser.parse(label, text)
         
         # save to json
@@ -2276,7 +5054,7 @@ class TestStringMethods(unittest.TestCase):
         text = get_contents("./test/horse.txt")
         
         # treemap
-        treemap = sorteddict()
+        treemap = make_treemap()
         treemap[label] = text_parser.parse(label, text)
 
         # save to pickle
@@ -2358,7 +5136,7 @@ def one_file(label = "cat"):
     words = text_parser.parse(label, text)
     
     # pack
-    treemap = sorteddict()
+    treemap = make_treemap()
     treemap[label] = words
     
     # save to json
@@ -2390,6 +5168,7 @@ def main():
     # save to json
     create_storage("test")
     #save_to_json(wd.treemap, os.path.join(TEST_FOLDER, 'result.json'))
+    #save_to_partitions(wd.treemap, os.path.join(TEST_FOLDER, 'result'))
 
     # save to pickle
     pickle_file = os.path.join(TEST_FOLDER, "data.pickled")